@@ -0,0 +1,98 @@
+"""Benchmark concurrent execute-lean throughput against a real Docker daemon.
+
+Runs the same batch of Lean snippets twice through a pooled DockerManager:
+once sequentially and once with all requests in flight at the same time.
+With Docker calls dispatched off the event loop the concurrent run should
+finish in roughly ``ceil(requests / pool_size)`` times the latency of a
+single execution instead of ``requests`` times.
+
+Usage:
+    python benchmarks/concurrency_benchmark.py --requests 16 --pool-size 8
+"""
+
+import argparse
+import asyncio
+import logging
+import statistics
+import time
+from typing import List
+
+from lean_docker_mcp.config import load_config
+from lean_docker_mcp.docker_manager import DockerManager
+
+SNIPPET = """
+def fib : Nat → Nat
+  | 0 => 0
+  | 1 => 1
+  | n + 2 => fib n + fib (n + 1)
+
+#eval fib {n}
+"""
+
+
+def _snippets(count: int) -> List[str]:
+    """Build distinct snippets so no request can be short-circuited."""
+    return [SNIPPET.format(n=20 + (i % 5)) + f"\n-- request {i}\n" for i in range(count)]
+
+
+async def _run_sequential(manager: DockerManager, snippets: List[str]) -> List[float]:
+    """Execute the snippets one after another and return per-request latencies."""
+    latencies = []
+    for code in snippets:
+        start = time.perf_counter()
+        await manager.execute_transient(code)
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+async def _run_concurrent(manager: DockerManager, snippets: List[str]) -> List[float]:
+    """Execute all snippets at once and return per-request latencies."""
+
+    async def timed(code: str) -> float:
+        start = time.perf_counter()
+        await manager.execute_transient(code)
+        return time.perf_counter() - start
+
+    return list(await asyncio.gather(*(timed(code) for code in snippets)))
+
+
+async def main() -> None:
+    """Run the benchmark and print a summary."""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=16, help="Number of snippets per run")
+    parser.add_argument("--pool-size", type=int, default=8, help="Container pool size")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+
+    config = load_config()
+    config.docker.pool_enabled = True
+    config.docker.pool_size = args.pool_size
+    manager = DockerManager(config)
+    if not manager.docker_available:
+        raise SystemExit("Docker is not available; start the daemon and build the image first")
+
+    await manager.initialize_pool()
+    snippets = _snippets(args.requests)
+
+    # Warm up every pooled container once so both runs start from the same state
+    await _run_concurrent(manager, _snippets(args.pool_size))
+
+    start = time.perf_counter()
+    sequential = await _run_sequential(manager, snippets)
+    sequential_wall = time.perf_counter() - start
+
+    start = time.perf_counter()
+    concurrent = await _run_concurrent(manager, snippets)
+    concurrent_wall = time.perf_counter() - start
+
+    print(f"requests={args.requests} pool_size={args.pool_size} executor_workers={manager.executor_max_workers}")
+    print(f"sequential: wall={sequential_wall:.2f}s median={statistics.median(sequential):.3f}s")
+    print(f"concurrent: wall={concurrent_wall:.2f}s median={statistics.median(concurrent):.3f}s")
+    print(f"speedup:    {sequential_wall / concurrent_wall:.2f}x")
+
+    manager.shutdown()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
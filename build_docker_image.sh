@@ -10,16 +10,19 @@ DEFAULT_IMAGE_NAME="lean-docker-mcp"
 # Parse command-line arguments
 image_name=$DEFAULT_IMAGE_NAME
 tag=$DEFAULT_TAG
+mathlib_ref=""
 
 while [[ "$#" -gt 0 ]]; do
     case $1 in
         -t|--tag) tag="$2"; shift ;;
         -n|--name) image_name="$2"; shift ;;
+        -m|--mathlib) mathlib_ref="$2"; shift ;;
         -h|--help)
             echo "Usage: $0 [options]"
             echo "Options:"
             echo "  -t, --tag TAG    Specify the Docker image tag (default: $DEFAULT_TAG)"
             echo "  -n, --name NAME  Specify the Docker image name (default: $DEFAULT_IMAGE_NAME)"
+            echo "  -m, --mathlib REF  Add a prebuilt Mathlib workspace at this mathlib4 tag or commit"
             echo "  -h, --help       Display this help message"
             exit 0
             ;;
@@ -40,6 +43,13 @@ fi
 # Build the Docker image - context should be at the directory level of the Dockerfile
 docker build -t "$image_name:$tag" -f "$dockerfile_path" src/lean_docker_mcp
 
+# Layer the Mathlib workspace on top and give the result the same name
+if [ -n "$mathlib_ref" ]; then
+    echo "Adding Mathlib $mathlib_ref to $image_name:$tag"
+    docker build -t "$image_name:$tag" -f src/lean_docker_mcp/Dockerfile.mathlib \
+        --build-arg BASE_IMAGE="$image_name:$tag" --build-arg MATHLIB_REF="$mathlib_ref" src/lean_docker_mcp
+fi
+
 echo "Image $image_name:$tag built successfully!"
 echo
 echo "You can run a test container with:"
@@ -13,6 +13,7 @@ from typing import List, Optional
 
 from . import config, docker_manager, server
 from .config import load_config
+from .docker_manager import MATHLIB_REF_LABEL
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
@@ -37,6 +38,25 @@ def check_docker_image_exists(image_name: str) -> bool:
         return False
 
 
+def get_docker_image_label(image_name: str, label: str) -> Optional[str]:
+    """Get the value of a label of a local Docker image, or None if it is not set."""
+    try:
+        result = subprocess.run(
+            ["docker", "image", "inspect", "--format", f'{{{{ index .Config.Labels "{label}" }}}}', image_name],
+            check=False,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            universal_newlines=True,
+        )
+        value = result.stdout.strip()
+        if result.returncode == 0 and value and value != "<no value>":
+            return value
+        return None
+    except Exception as e:
+        logger.error(f"Error inspecting Docker image: {e}")
+        return None
+
+
 def get_docker_images(base_name: str) -> List[str]:
     """Get list of Docker images with the given base name."""
     try:
@@ -78,12 +98,20 @@ def cleanup_old_images(base_name: str, current_version: str) -> None:
         logger.warning(f"Error cleaning up old images: {e}")
 
 
-def ensure_docker_image(image_name: Optional[str] = None) -> None:
-    """Ensure the Docker image exists with the correct version, building it if necessary."""
+def ensure_docker_image(image_name: Optional[str] = None, mathlib_ref: Optional[str] = None) -> None:
+    """Ensure the Docker image exists with the correct version, building it if necessary.
+
+    Args:
+        image_name: Image to ensure; defaults to the configured image, tagged with the package version
+        mathlib_ref: mathlib4 tag or commit the image must contain a prebuilt workspace for;
+            defaults to the configured docker.mathlib_ref when image_name is not given
+    """
     if image_name is None:
         # Load configuration to get the default image name
         config_obj = load_config()
         base_image_name = config_obj.docker.image
+        if mathlib_ref is None:
+            mathlib_ref = config_obj.docker.mathlib_ref
 
         # Extract base name without tag
         if ":" in base_image_name:
@@ -100,8 +128,15 @@ def ensure_docker_image(image_name: Optional[str] = None) -> None:
         latest_image_name = image_name
         base_name = image_name.split(":")[0] if ":" in image_name else image_name
 
+    build_args = ["--mathlib", mathlib_ref] if mathlib_ref else []
+
     # Check if the versioned image exists
-    if not check_docker_image_exists(versioned_image_name):
+    image_exists = check_docker_image_exists(versioned_image_name)
+    if image_exists and mathlib_ref and get_docker_image_label(versioned_image_name, MATHLIB_REF_LABEL) != mathlib_ref:
+        logger.info(f"Docker image {versioned_image_name} does not contain Mathlib {mathlib_ref}. Rebuilding it...")
+        image_exists = False
+
+    if not image_exists:
         logger.info(f"Docker image {versioned_image_name} not found. Building it now...")
         
         # Build the Docker image using the build_docker_image.sh script
@@ -119,7 +154,7 @@ def ensure_docker_image(image_name: Optional[str] = None) -> None:
                 try:
                     logger.info(f"Found build script at {script_path}")
                     subprocess.run(
-                        [script_path, "--tag", __version__, "--name", base_name],
+                        [script_path, "--tag", __version__, "--name", base_name] + build_args,
                         check=True,
                         stdout=subprocess.PIPE,
                         stderr=subprocess.PIPE,
@@ -157,6 +192,20 @@ def ensure_docker_image(image_name: Optional[str] = None) -> None:
                         stdout=subprocess.PIPE,
                         stderr=subprocess.PIPE,
                     )
+                    if mathlib_ref:
+                        # Layer the prebuilt Mathlib workspace on top of the base image
+                        subprocess.run(
+                            [
+                                "docker", "build", "-t", versioned_image_name,
+                                "-f", os.path.join(os.path.dirname(dockerfile_path), "Dockerfile.mathlib"),
+                                "--build-arg", f"BASE_IMAGE={versioned_image_name}",
+                                "--build-arg", f"MATHLIB_REF={mathlib_ref}",
+                                os.path.dirname(dockerfile_path),
+                            ],
+                            check=True,
+                            stdout=subprocess.PIPE,
+                            stderr=subprocess.PIPE,
+                        )
                     logger.info(f"Successfully built Docker image: {versioned_image_name}")
                     
                     # Tag as latest
@@ -168,11 +217,11 @@ def ensure_docker_image(image_name: Optional[str] = None) -> None:
                     )
                 except Exception as e:
                     logger.warning(f"Failed to build Docker image from Dockerfile: {e}")
-                    logger.warning(f"Please build the Docker image manually using: docker build -t {versioned_image_name} -f {dockerfile_path} .")
+                    logger.warning(f"Please build the Docker image manually using: docker build -t {versioned_image_name} -f {dockerfile_path} {os.path.dirname(dockerfile_path)}")
             else:
                 logger.warning(f"Build script not found at {script_path}")
                 logger.warning(f"Dockerfile not found at {dockerfile_path}")
-                logger.warning(f"Please build the Docker image manually using: docker build -t {versioned_image_name} -f src/lean_docker_mcp/Dockerfile .")
+                logger.warning(f"Please build the Docker image manually using: docker build -t {versioned_image_name} -f src/lean_docker_mcp/Dockerfile src/lean_docker_mcp")
     else:
         logger.info(f"Docker image {versioned_image_name} already exists.")
         
@@ -0,0 +1,158 @@
+"""Autoscaling policy for the container pool.
+
+The pool's target size follows demand: Little's law turns the observed request arrival
+rate and container hold time into the number of containers that are busy on average, and
+requests that had to wait for a container push the target up further. Growth is capped
+by the host memory that is still available, and the pool shrinks one step at a time so a
+short lull doesn't throw away warm containers.
+"""
+
+import logging
+import math
+import re
+import time
+from typing import Any, Dict, Optional, Union
+
+logger = logging.getLogger(__name__)
+
+MEMINFO_PATH = "/proc/meminfo"
+
+_MEMORY_UNITS = {"": 1, "b": 1, "k": 1024, "m": 1024 ** 2, "g": 1024 ** 3}
+
+
+def parse_memory_limit(value: Union[str, int, None]) -> Optional[int]:
+    """Convert a Docker memory limit such as ``"256m"`` to bytes.
+
+    Args:
+        value: The limit as given to Docker (a byte count or a string with a b/k/m/g suffix)
+
+    Returns:
+        The limit in bytes, or None if it cannot be parsed
+    """
+    if value is None:
+        return None
+    if isinstance(value, int):
+        return value
+    match = re.fullmatch(r"\s*(\d+)\s*([bkmg]?)b?\s*", str(value).lower())
+    if not match:
+        return None
+    return int(match.group(1)) * _MEMORY_UNITS[match.group(2)]
+
+
+def available_memory_bytes() -> Optional[int]:
+    """Return the host's available memory from ``/proc/meminfo``, or None where it can't be read."""
+    try:
+        with open(MEMINFO_PATH, "r") as f:
+            for line in f:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    return None
+
+
+class PoolAutoscaler:
+    """Computes the target pool size from observed load."""
+
+    def __init__(
+        self,
+        min_size: int,
+        max_size: int,
+        container_memory_bytes: Optional[int] = None,
+        min_free_memory_bytes: int = 0,
+        smoothing: float = 0.3,
+        wait_threshold: float = 0.05,
+        headroom: float = 1.25,
+    ):
+        """Initialize the autoscaler.
+
+        Args:
+            min_size: Smallest pool size
+            max_size: Largest pool size
+            container_memory_bytes: Memory limit of one container, used to cap growth
+            min_free_memory_bytes: Host memory that must stay available after growing
+            smoothing: Weight of the newest sample in the moving averages
+            wait_threshold: Average acquisition wait in seconds above which the pool grows
+            headroom: Spare capacity kept on top of the average number of busy containers
+        """
+        self.min_size = max(min_size, 0)
+        self.max_size = max(max_size, self.min_size)
+        self.container_memory_bytes = container_memory_bytes
+        self.min_free_memory_bytes = min_free_memory_bytes
+        self.smoothing = smoothing
+        self.wait_threshold = wait_threshold
+        self.headroom = headroom
+
+        self.arrival_rate = 0.0  # Requests per second
+        self.wait_time = 0.0  # Seconds spent waiting for a container
+        self.service_time = 0.0  # Seconds a container is held per request
+        self._arrivals = 0
+        self._last_update: Optional[float] = None
+
+    def clamp(self, size: int) -> int:
+        """Limit a pool size to the configured bounds."""
+        return min(max(size, self.min_size), self.max_size)
+
+    def record_arrival(self) -> None:
+        """Record a request asking for a container, before it knows whether it has to wait."""
+        self._arrivals += 1
+
+    def record_acquire(self, wait_seconds: float) -> None:
+        """Record a request that obtained a container after waiting ``wait_seconds``."""
+        self.wait_time = self._average(self.wait_time, wait_seconds)
+
+    def record_release(self, held_seconds: float) -> None:
+        """Record how long a request held its container."""
+        self.service_time = self._average(self.service_time, held_seconds)
+
+    def target_size(self, current: int, now: Optional[float] = None, available_memory: Optional[int] = None) -> int:
+        """Update the arrival rate and return the pool size to scale to.
+
+        Args:
+            current: The current target pool size
+            now: Monotonic timestamp of this update (defaults to ``time.monotonic()``)
+            available_memory: Available host memory in bytes, or None if unknown
+
+        Returns:
+            The new target pool size
+        """
+        now = time.monotonic() if now is None else now
+        if self._last_update is not None and now > self._last_update:
+            rate = self._arrivals / (now - self._last_update)
+            self.arrival_rate = self._average(self.arrival_rate, rate)
+            if self._arrivals == 0:
+                # Nobody waited during an idle interval
+                self.wait_time = self._average(self.wait_time, 0.0)
+        self._arrivals = 0
+        self._last_update = now
+
+        # Little's law: average number of containers busy at once
+        target = math.ceil(self.arrival_rate * self.service_time * self.headroom)
+        if self.wait_time > self.wait_threshold:
+            target = max(target, current + max(1, current // 4))
+        if target < current:
+            target = max(target, current - max(1, current // 10))
+
+        if available_memory is not None and self.container_memory_bytes:
+            spare = available_memory - self.min_free_memory_bytes
+            if spare < 0:
+                # The host is short on memory: give containers back regardless of demand
+                target = min(target, current - 1)
+            elif target > current:
+                target = min(target, current + spare // self.container_memory_bytes)
+
+        return self.clamp(target)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return the autoscaler's bounds and load estimates."""
+        return {
+            "min_size": self.min_size,
+            "max_size": self.max_size,
+            "arrival_rate": round(self.arrival_rate, 3),
+            "wait_time": round(self.wait_time, 3),
+            "service_time": round(self.service_time, 3),
+        }
+
+    def _average(self, average: float, sample: float) -> float:
+        """Fold a sample into an exponentially weighted moving average."""
+        return self.smoothing * sample + (1 - self.smoothing) * average
@@ -0,0 +1,222 @@
+"""Content-addressed cache for Lean execution results."""
+
+import hashlib
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# Commands that run code while the file is elaborated, which may read the clock, random
+# numbers or files
+_ELABORATION_IO = re.compile(r"#eval\b|\brun_(?:cmd|elab|meta)\b")
+
+# Stores between two prunes of the on-disk tier
+DISK_PRUNE_INTERVAL = 100
+
+
+def make_cache_key(code: str, image_id: str, lean_version: str, limits: Dict[str, Any]) -> str:
+    """Compute the cache key for an execution.
+
+    Args:
+        code: The Lean source code
+        image_id: Digest of the Docker image the code runs in
+        lean_version: Version string reported by ``lean --version``
+        limits: Resource limits that can change the outcome (memory, CPU, timeout)
+
+    Returns:
+        A hex SHA-256 digest identifying the execution
+    """
+    material = json.dumps(
+        {"code": code, "image": image_id, "lean": lean_version, "limits": limits},
+        sort_keys=True,
+    )
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+def is_cacheable(result: Dict[str, Any]) -> bool:
+    """Return whether an execution result is a deterministic Lean outcome.
+
+    Results that carry an ``error_type`` (validation failures, Docker problems,
+    timeouts) describe the environment rather than the code and are not cached.
+    """
+    return "exit_code" in result and "error_type" not in result
+
+
+def is_deterministic(code: str, check_only: bool = False) -> bool:
+    """Return whether the result of running ``code`` depends only on the code.
+
+    Programs with ``main`` (unless they are only checked) and code that evaluates
+    expressions during elaboration (``#eval``, ``run_cmd``) may perform IO, so their
+    results are neither cached nor shared between requests.
+    """
+    if "def main" in code and not check_only:
+        return False
+    return _ELABORATION_IO.search(code) is None
+
+
+class ResultCache:
+    """Two-tier result cache: an in-memory LRU backed by an optional SQLite file."""
+
+    def __init__(self, max_entries: int = 1024, path: Optional[str] = None, max_disk_entries: int = 100000):
+        """Initialize the cache.
+
+        The on-disk tier is only read and written by :meth:`get` and :meth:`put`; callers
+        on an event loop run those in an executor and use ``memory_only`` lookups inline.
+
+        Args:
+            max_entries: Maximum number of results kept in memory
+            path: Optional SQLite file for results that should survive restarts
+            max_disk_entries: Maximum number of results kept on disk; the oldest are pruned
+        """
+        self.max_entries = max_entries
+        self.max_disk_entries = max_disk_entries
+        self.path = path
+        self._memory: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()  # Guards the memory tier and counters
+        self._db_lock = threading.Lock()  # Guards the SQLite connection, so memory lookups never wait on disk I/O
+        self._db: Optional[sqlite3.Connection] = None
+
+        self.hits = 0
+        self.misses = 0
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.stores = 0
+        self.evictions = 0
+        self.disk_evictions = 0
+
+        if path:
+            try:
+                directory = os.path.dirname(os.path.abspath(path))
+                os.makedirs(directory, exist_ok=True)
+                self._db = sqlite3.connect(path, check_same_thread=False)
+                self._db.execute("CREATE TABLE IF NOT EXISTS results (key TEXT PRIMARY KEY, result TEXT NOT NULL, created_at REAL NOT NULL)")
+                self._db.execute("CREATE INDEX IF NOT EXISTS results_created_at ON results (created_at)")
+                self._db.commit()
+                logger.info(f"Using on-disk result cache at {path}")
+            except sqlite3.Error as e:
+                logger.warning(f"Could not open result cache database {path}, using memory only: {e}")
+                self._db = None
+
+    @property
+    def persistent(self) -> bool:
+        """Whether the cache has an on-disk tier."""
+        return self._db is not None
+
+    def get(self, key: str, memory_only: bool = False) -> Optional[Dict[str, Any]]:
+        """Look up a cached result.
+
+        Args:
+            key: The cache key from :func:`make_cache_key`
+            memory_only: Only look in memory; a miss is then not counted, so the caller can
+                go on to a full lookup
+
+        Returns:
+            A copy of the cached result, or None on a miss
+        """
+        with self._lock:
+            result = self._memory.get(key)
+            if result is not None:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                self.memory_hits += 1
+                return dict(result)
+            if memory_only:
+                return None
+
+        row = None
+        if self._db is not None:
+            with self._db_lock:
+                try:
+                    row = self._db.execute("SELECT result FROM results WHERE key = ?", (key,)).fetchone()
+                except sqlite3.Error as e:
+                    logger.warning(f"Error reading result cache: {e}")
+
+        with self._lock:
+            if row is not None:
+                result = json.loads(row[0])
+                self._remember(key, result)
+                self.hits += 1
+                self.disk_hits += 1
+                return dict(result)
+            self.misses += 1
+            return None
+
+    def put(self, key: str, result: Dict[str, Any]) -> None:
+        """Store a result in both tiers.
+
+        Args:
+            key: The cache key from :func:`make_cache_key`
+            result: The execution result to store
+        """
+        with self._lock:
+            self._remember(key, dict(result))
+            self.stores += 1
+            prune = self.stores % DISK_PRUNE_INTERVAL == 0
+
+        if self._db is not None:
+            with self._db_lock:
+                try:
+                    self._db.execute(
+                        "INSERT OR REPLACE INTO results (key, result, created_at) VALUES (?, ?, ?)",
+                        (key, json.dumps(result), time.time()),
+                    )
+                    if prune:
+                        self._prune_disk()
+                    self._db.commit()
+                except sqlite3.Error as e:
+                    logger.warning(f"Error writing result cache: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        """Return hit/miss counters and sizes for sizing the cache."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            stats = {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "stores": self.stores,
+                "evictions": self.evictions,
+                "memory_entries": len(self._memory),
+                "max_entries": self.max_entries,
+            }
+        if self._db is not None:
+            stats["disk_evictions"] = self.disk_evictions
+            stats["max_disk_entries"] = self.max_disk_entries
+            with self._db_lock:
+                try:
+                    stats["disk_entries"] = self._db.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+                except sqlite3.Error:
+                    pass
+        return stats
+
+    def close(self) -> None:
+        """Close the on-disk tier."""
+        with self._db_lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+    def _prune_disk(self) -> None:
+        """Delete the oldest on-disk results beyond ``max_disk_entries``. Call with the database lock held."""
+        cursor = self._db.execute(
+            "DELETE FROM results WHERE key IN (SELECT key FROM results ORDER BY created_at DESC, rowid DESC LIMIT -1 OFFSET ?)",
+            (self.max_disk_entries,),
+        )
+        self.disk_evictions += max(cursor.rowcount, 0)
+
+    def _remember(self, key: str, result: Dict[str, Any]) -> None:
+        """Insert into the in-memory LRU, evicting the least recently used entry if full."""
+        self._memory[key] = result
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+            self.evictions += 1
@@ -31,6 +31,30 @@ class DockerConfig:
     pool_max_age: int = 300  # Maximum age of a container in seconds (5 minutes)
     max_concurrent_creations: int = 5  # Maximum number of containers to create concurrently
     pool_enabled: bool = True  # Enable/disable container pooling overall
+    pool_maintenance_interval: float = 5.0  # Seconds between background pool replenish/retire passes
+    pool_prewarm_seconds: int = 30  # Start a replacement this long before a pooled container reaches pool_max_age
+    pool_wait_timeout: float = 5.0  # Seconds a request waits for a pooled container before creating one on demand
+    pool_min_size: int = 0  # Autoscaling lower bound for the pool size
+    pool_max_size: int = 0  # Autoscaling upper bound; 0 keeps the pool fixed at pool_size
+    pool_min_free_memory_mb: int = 512  # Stop growing the pool when host available memory would drop below this
+    executor_max_workers: int = 0  # Threads for blocking Docker calls; 0 sizes it from pool_size
+    batch_max_parallel: int = 0  # Items of an execute-lean-batch call running at once; 0 uses the pool size
+    batch_max_items: int = 1024  # Largest number of snippets accepted by execute-lean-batch
+    # Persistent Lean REPL workers in pooled containers
+    repl_enabled: bool = False  # Run #eval/theorem checks through a long-lived REPL instead of a fresh lean process
+    repl_command: str = "repl"  # Command that starts the leanprover-community REPL inside the container
+    repl_preload_imports: List[str] = field(default_factory=list)  # Modules imported once per REPL, e.g. ["Mathlib"]
+    repl_max_commands: int = 500  # Restart a REPL after this many commands to bound its memory use
+    repl_start_timeout: int = 300  # Seconds allowed for a REPL to start and load its preloaded imports
+    # Native executables for programs with a main function
+    native_compile: bool = False  # Compile main to a native binary instead of interpreting it with lean -r
+    native_cache_volume: str = "lean-docker-mcp-native-cache"  # Docker volume holding compiled binaries by source hash
+    # Shared package workspace
+    packages_volume: str = ""  # Docker volume or host path of a built lake workspace (e.g. Mathlib), mounted read-only
+    mathlib_ref: str = ""  # mathlib4 tag or commit to prebuild into the image (Dockerfile.mathlib); empty for bare Lean
+    # Registered preambles compiled once to oleans
+    preambles_enabled: bool = False  # Allow register-preamble; mounts preamble_volume into every container
+    preamble_volume: str = "lean-docker-mcp-preambles"  # Docker volume holding the compiled preambles
 
 
 @dataclass
@@ -41,22 +65,36 @@ class LeanConfig:
     blocked_imports: List[str] = field(default_factory=lambda: ["System.IO.Process", "System.FilePath"])
 
 
+@dataclass
+class CacheConfig:
+    """Execution result cache configuration."""
+
+    enabled: bool = True
+    max_entries: int = 4096  # Results kept in the in-memory LRU tier
+    path: Optional[str] = None  # SQLite file for the on-disk tier; None keeps the cache in memory only
+    max_disk_entries: int = 100000  # Results kept in the on-disk tier before the oldest are pruned
+    coalesce_inflight: bool = True  # Identical executions already running share one result
+
+
 @dataclass
 class Configuration:
     """Main configuration class."""
 
     docker: DockerConfig
     lean: LeanConfig
+    cache: CacheConfig = field(default_factory=CacheConfig)
 
     @classmethod
     def from_dict(cls, config_dict: Dict) -> "Configuration":
         """Create a Configuration object from a dictionary."""
         docker_config = DockerConfig(**config_dict.get("docker", {}))
         lean_config = LeanConfig(**config_dict.get("lean", {}))
+        cache_config = CacheConfig(**config_dict.get("cache", {}))
         
         return cls(
             docker=docker_config,
             lean=lean_config,
+            cache=cache_config,
         )
 
 
@@ -127,6 +165,16 @@ def load_config(config_path: Optional[str] = None) -> Configuration:
         except ValueError:
             logger.warning(f"Invalid value for LEAN_DOCKER_MCP_POOL_MAX_AGE: {env_pool_max_age}")
     
+    # Autoscaling bounds
+    for env_name, key in (("LEAN_DOCKER_MCP_POOL_MIN_SIZE", "pool_min_size"), ("LEAN_DOCKER_MCP_POOL_MAX_SIZE", "pool_max_size")):
+        env_value = os.environ.get(env_name)
+        if env_value:
+            try:
+                config_dict["docker"][key] = int(env_value)
+                logger.info(f"Using {key}={env_value} from environment variable")
+            except ValueError:
+                logger.warning(f"Invalid value for {env_name}: {env_value}")
+
     # Max concurrent creations
     env_max_concurrent = os.environ.get("LEAN_DOCKER_MCP_MAX_CONCURRENT_CREATIONS")
     if env_max_concurrent:
@@ -135,6 +183,49 @@ def load_config(config_path: Optional[str] = None) -> Configuration:
             logger.info(f"Using max_concurrent_creations={env_max_concurrent} from environment variable")
         except ValueError:
             logger.warning(f"Invalid value for LEAN_DOCKER_MCP_MAX_CONCURRENT_CREATIONS: {env_max_concurrent}")
+
+    # Persistent REPL workers
+    env_repl_enabled = os.environ.get("LEAN_DOCKER_MCP_REPL_ENABLED")
+    if env_repl_enabled is not None:
+        config_dict["docker"]["repl_enabled"] = env_repl_enabled.lower() in ("true", "1", "yes")
+        logger.info(f"Using repl_enabled={config_dict['docker']['repl_enabled']} from environment variable")
+
+    env_repl_preload = os.environ.get("LEAN_DOCKER_MCP_REPL_PRELOAD_IMPORTS")
+    if env_repl_preload is not None:
+        config_dict["docker"]["repl_preload_imports"] = [module.strip() for module in env_repl_preload.split(",") if module.strip()]
+        logger.info(f"Using repl_preload_imports={config_dict['docker']['repl_preload_imports']} from environment variable")
+
+    # Native executable cache
+    env_native_compile = os.environ.get("LEAN_DOCKER_MCP_NATIVE_COMPILE")
+    if env_native_compile is not None:
+        config_dict["docker"]["native_compile"] = env_native_compile.lower() in ("true", "1", "yes")
+        logger.info(f"Using native_compile={config_dict['docker']['native_compile']} from environment variable")
+
+    # Shared package workspace
+    env_packages_volume = os.environ.get("LEAN_DOCKER_MCP_PACKAGES_VOLUME")
+    if env_packages_volume is not None:
+        config_dict["docker"]["packages_volume"] = env_packages_volume
+        logger.info(f"Using packages_volume={env_packages_volume} from environment variable")
+
+    env_mathlib_ref = os.environ.get("LEAN_DOCKER_MCP_MATHLIB_REF")
+    if env_mathlib_ref is not None:
+        config_dict["docker"]["mathlib_ref"] = env_mathlib_ref
+        logger.info(f"Using mathlib_ref={env_mathlib_ref} from environment variable")
+
+    # Registered preambles
+    env_preambles_enabled = os.environ.get("LEAN_DOCKER_MCP_PREAMBLES_ENABLED")
+    if env_preambles_enabled is not None:
+        config_dict["docker"]["preambles_enabled"] = env_preambles_enabled.lower() in ("true", "1", "yes")
+        logger.info(f"Using preambles_enabled={config_dict['docker']['preambles_enabled']} from environment variable")
+
+    # Executor threads for blocking Docker calls
+    env_executor_workers = os.environ.get("LEAN_DOCKER_MCP_EXECUTOR_MAX_WORKERS")
+    if env_executor_workers:
+        try:
+            config_dict["docker"]["executor_max_workers"] = int(env_executor_workers)
+            logger.info(f"Using executor_max_workers={env_executor_workers} from environment variable")
+        except ValueError:
+            logger.warning(f"Invalid value for LEAN_DOCKER_MCP_EXECUTOR_MAX_WORKERS: {env_executor_workers}")
             
     # Other Docker settings from environment
     env_memory_limit = os.environ.get("LEAN_DOCKER_MCP_MEMORY_LIMIT")
@@ -155,5 +246,31 @@ def load_config(config_path: Optional[str] = None) -> Configuration:
         except ValueError:
             logger.warning(f"Invalid value for LEAN_DOCKER_MCP_TIMEOUT: {env_timeout}")
 
+    # Result cache settings
+    if "cache" not in config_dict:
+        config_dict["cache"] = {}
+
+    env_cache_enabled = os.environ.get("LEAN_DOCKER_MCP_CACHE_ENABLED")
+    if env_cache_enabled is not None:
+        config_dict["cache"]["enabled"] = env_cache_enabled.lower() in ("true", "1", "yes")
+
+    env_cache_size = os.environ.get("LEAN_DOCKER_MCP_CACHE_SIZE")
+    if env_cache_size:
+        try:
+            config_dict["cache"]["max_entries"] = int(env_cache_size)
+        except ValueError:
+            logger.warning(f"Invalid value for LEAN_DOCKER_MCP_CACHE_SIZE: {env_cache_size}")
+
+    env_cache_disk_size = os.environ.get("LEAN_DOCKER_MCP_CACHE_DISK_SIZE")
+    if env_cache_disk_size:
+        try:
+            config_dict["cache"]["max_disk_entries"] = int(env_cache_disk_size)
+        except ValueError:
+            logger.warning(f"Invalid value for LEAN_DOCKER_MCP_CACHE_DISK_SIZE: {env_cache_disk_size}")
+
+    env_cache_path = os.environ.get("LEAN_DOCKER_MCP_CACHE_PATH")
+    if env_cache_path:
+        config_dict["cache"]["path"] = os.path.expanduser(env_cache_path)
+
     # Create the configuration object
     return Configuration.from_dict(config_dict) 
\ No newline at end of file
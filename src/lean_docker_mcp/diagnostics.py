@@ -0,0 +1,155 @@
+"""Structured Lean diagnostics.
+
+The runner invokes ``lean --json``, which prints every message as a JSON object on its own
+line, while a program run with ``-r`` prints its output as plain lines in between. The Lean
+REPL reports messages with the same fields. Both are turned into diagnostics with a
+position, end position, severity and message, and rendered back to the text the ``lean``
+command line would have printed.
+
+Every diagnostic is classified once, when it is parsed: errors by their kind, ``sorry``
+usage, linter warnings and the info messages printed by ``#eval``. The per-result summary
+is computed from those kinds, so callers never have to scan the text.
+"""
+
+import json
+from typing import Any, Dict, List, Optional, Tuple
+
+
+# Error kinds, matched against the start of the first line of an error message
+_ERROR_KINDS = (
+    ("unknown identifier", "unknown_identifier"),
+    ("unknown constant", "unknown_constant"),
+    ("type mismatch", "type_mismatch"),
+    ("application type mismatch", "type_mismatch"),
+    ("unsolved goals", "unsolved_goals"),
+    ("unexpected", "syntax_error"),
+    ("expected", "syntax_error"),
+    ("(deterministic) timeout", "deterministic_timeout"),
+)
+
+
+def classify_message(severity: str, message: str) -> str:
+    """Return the kind of a Lean message.
+
+    Args:
+        severity: The message severity (error, warning or info)
+        message: The message text
+
+    Returns:
+        An error kind such as "unknown_identifier" or "unsolved_goals" (or "error" when none
+        applies), "sorry" or "linter" for those warnings, "warning", or "info"
+    """
+    if severity == "error":
+        first_line = message.lstrip().split("\n", 1)[0]
+        for prefix, kind in _ERROR_KINDS:
+            if first_line.startswith(prefix):
+                return kind
+        if "syntax error" in message:
+            return "syntax_error"
+        if "expected type" in message:
+            return "type_error"
+        return "error"
+    if severity == "warning":
+        if "declaration uses 'sorry'" in message:
+            return "sorry"
+        if "this linter can be disabled" in message:
+            return "linter"
+        return "warning"
+    return "info"
+
+
+def make_diagnostic(message: Dict[str, Any], line_offset: int = 0) -> Dict[str, Any]:
+    """Convert a Lean JSON message or REPL message to a diagnostic.
+
+    Args:
+        message: The message object, with ``severity``, ``pos``, ``endPos`` and ``data``
+        line_offset: Lines preceding the checked text in the file, added to reported line numbers
+
+    Returns:
+        A dictionary with severity, kind, line, column, end_line, end_column and message
+    """
+    severity = message.get("severity", "info")
+    if severity == "information":
+        severity = "info"
+    data = message.get("data", "")
+    pos = message.get("pos") or {}
+    end_pos = message.get("endPos") or {}
+    return {
+        "severity": severity,
+        "kind": classify_message(severity, data),
+        "line": pos.get("line", 0) + line_offset,
+        "column": pos.get("column", 0),
+        "end_line": end_pos["line"] + line_offset if "line" in end_pos else None,
+        "end_column": end_pos.get("column"),
+        "message": data,
+    }
+
+
+def summarize_diagnostics(diagnostics: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Count diagnostics by severity and kind and collect the positions of ``sorry`` usage.
+
+    Args:
+        diagnostics: Diagnostics as returned by :func:`make_diagnostic`
+
+    Returns:
+        A dictionary with error, warning, info, sorry and linter counts, the count of every
+        kind, and the positions of the declarations that use ``sorry``
+    """
+    counts = {"error": 0, "warning": 0, "info": 0}
+    kinds: Dict[str, int] = {}
+    sorry_positions: List[Dict[str, int]] = []
+    for diagnostic in diagnostics:
+        counts[diagnostic["severity"]] = counts.get(diagnostic["severity"], 0) + 1
+        kinds[diagnostic["kind"]] = kinds.get(diagnostic["kind"], 0) + 1
+        if diagnostic["kind"] == "sorry":
+            sorry_positions.append({"line": diagnostic["line"], "column": diagnostic["column"]})
+    return {
+        "errors": counts["error"],
+        "warnings": counts["warning"],
+        "infos": counts["info"],
+        "sorries": kinds.get("sorry", 0),
+        "linter_warnings": kinds.get("linter", 0),
+        "kinds": kinds,
+        "sorry_positions": sorry_positions,
+    }
+
+
+def parse_json_message(line: str) -> Optional[Dict[str, Any]]:
+    """Return the diagnostic for a line printed by ``lean --json``, or None for any other line."""
+    if not line.startswith("{"):
+        return None
+    try:
+        message = json.loads(line)
+    except ValueError:
+        return None
+    if not isinstance(message, dict) or "severity" not in message or "data" not in message:
+        return None
+    return make_diagnostic(message)
+
+
+def render_diagnostic(diagnostic: Dict[str, Any], file_name: str = "Script.lean") -> str:
+    """Render a diagnostic the way the ``lean`` command line prints it."""
+    if diagnostic["severity"] in ("error", "warning"):
+        return f"{file_name}:{diagnostic['line']}:{diagnostic['column']}: {diagnostic['severity']}: {diagnostic['message']}"
+    return diagnostic["message"]
+
+
+def parse_lean_output(output: str) -> Tuple[str, List[Dict[str, Any]]]:
+    """Split the output of ``lean --json`` into readable text and diagnostics.
+
+    Args:
+        output: The text between the runner's output markers
+
+    Returns:
+        A tuple of (the output with every message rendered as text, the diagnostics in order)
+    """
+    lines = []
+    diagnostics = []
+    for line in output.splitlines():
+        diagnostic = parse_json_message(line)
+        if diagnostic is None:
+            lines.append(line)
+        else:
+            diagnostics.append(diagnostic)
+            lines.append(render_diagnostic(diagnostic))
+    return "\n".join(lines).strip(), diagnostics
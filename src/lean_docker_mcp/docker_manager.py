@@ -1,23 +1,36 @@
 """Module for managing Docker containers to execute Lean4 code securely."""
 
 import asyncio
+import base64
+import binascii
+import functools
+import hashlib
 import json
 import logging
 import os
 import re
 import tempfile
-import uuid
+import textwrap
 import time
-from typing import Any, Dict, List, Optional, Tuple, Set
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple, Set, TypeVar
 
 import docker
-from docker.errors import NotFound
+from docker.errors import ContainerError, NotFound
 
-from .config import Configuration, load_config
+from .autoscaler import PoolAutoscaler, available_memory_bytes, parse_memory_limit
+from .cache import ResultCache, is_cacheable, is_deterministic, make_cache_key
+from .config import CacheConfig, Configuration, load_config
+from .exec_stream import ExecTimeoutError, exec_with_stdin
+from .diagnostics import classify_message, make_diagnostic, parse_json_message, parse_lean_output, render_diagnostic, summarize_diagnostics
+from .proof_check import append_axiom_queries, declared_theorems, proof_verdict
+from .repl import LeanReplError, LeanReplTimeout, LeanReplUnavailable, LeanReplWorker, parse_goal, proof_states, split_imports
 
 # Set up logging
 logger = logging.getLogger(__name__)
 
+T = TypeVar("T")
+
 
 class DockerExecutionError(Exception):
     """Exception raised when Docker execution encounters an error."""
@@ -109,7 +122,7 @@ class LeanCodeValidator:
         # Check if all imports are in the allowed list
         if self.config.lean.allowed_imports:
             for import_name in imports:
-                if import_name not in self.config.lean.allowed_imports:
+                if import_name not in self.config.lean.allowed_imports and not self._is_preamble_import(import_name):
                     return False, f"Import '{import_name}' is not in the allowed list"
         
         # Check for potentially unsafe System imports
@@ -122,6 +135,10 @@ class LeanCodeValidator:
             
         return True, None
         
+    def _is_preamble_import(self, import_name: str) -> bool:
+        """Return whether an import loads a registered preamble (see DockerManager.register_preamble)."""
+        return getattr(self.config.docker, "preambles_enabled", False) and import_name.startswith("Preamble.")
+
     def parse_lean_error(self, output: str) -> Optional[LeanCompilationError]:
         """Parse Lean compilation error output and convert to structured error.
         
@@ -145,20 +162,9 @@ class LeanCodeValidator:
                 col_num = int(match.group(2))
                 message = match.group(3).strip()
                 
-                # Determine error type based on message content
-                error_type = "unknown"
-                if "unknown identifier" in message:
-                    error_type = "unknown_identifier"
-                elif "type mismatch" in message:
-                    error_type = "type_mismatch"
-                elif "syntax error" in message:
-                    error_type = "syntax_error"
-                elif "expected type" in message:
-                    error_type = "type_error"
-                
                 return LeanCompilationError(
                     message=message,
-                    error_type=error_type,
+                    error_type=self._classify_error(message),
                     line=line_num,
                     column=col_num
                 )
@@ -169,6 +175,109 @@ class LeanCodeValidator:
             error_type="compilation_error"
         )
 
+    def error_from_diagnostic(self, diagnostic: Dict[str, Any]) -> LeanCompilationError:
+        """Convert an error diagnostic reported by Lean to a structured error.
+
+        Args:
+            diagnostic: A diagnostic as returned by ``parse_lean_output``
+
+        Returns:
+            A LeanCompilationError for the diagnostic
+        """
+        return LeanCompilationError(
+            message=diagnostic["message"],
+            error_type="unknown" if diagnostic["kind"] == "error" else diagnostic["kind"],
+            line=diagnostic["line"],
+            column=diagnostic["column"],
+        )
+
+    def _classify_error(self, message: str) -> str:
+        """Determine the error type based on the message content."""
+        kind = classify_message("error", message)
+        return "unknown" if kind == "error" else kind
+
+
+# Runner installed in the image (src/lean_docker_mcp/run_lean.sh). Given no file it reads
+# the Lean source from stdin, runs Lean in a private scratch directory and removes it (and
+# any leftover child processes) on exit; given a file it runs Lean on that file in place.
+# Lean's output and exit code come back between ---LEAN_*--- markers.
+RUNNER_PATH = "/usr/local/bin/run_lean.sh"
+
+# Interface version of the runner, recorded by the image's runner_version label
+RUNNER_VERSION = "11"
+RUNNER_VERSION_LABEL = "lean_docker_mcp.runner_version"
+
+# Label recording the mathlib4 ref of an image built with Dockerfile.mathlib
+MATHLIB_REF_LABEL = "lean_docker_mcp.mathlib_ref"
+
+# Where the native executable cache volume is mounted (docker.native_compile)
+NATIVE_CACHE_DIR = "/home/leanuser/.cache/lean-native"
+
+# Where a store container mounts the shared volume it writes to
+STORE_DIR = "/store"
+
+# Copies /incoming/data to $0 (relative to STORE_DIR) with mode $1, then points the
+# symlink $2, if given, at $3. Runs as root in a container that runs no submitted code.
+STORE_SCRIPT = """set -e
+cd /store
+if [ -f /incoming/data ]; then
+    mkdir -p "$(dirname "$0")"
+    cp /incoming/data "$0.$$"
+    chmod "$1" "$0.$$"
+    mv -f "$0.$$" "$0"
+fi
+if [ -n "$2" ]; then
+    mkdir -p "$(dirname "$2")"
+    ln -sfn "$3" "$2.$$"
+    mv -fT "$2.$$" "$2"
+fi
+"""
+
+# Where the shared read-only package workspace is mounted (docker.packages_volume)
+PACKAGES_DIR = "/opt/lean-packages"
+
+# Where the registered preamble volume is mounted (docker.preambles_enabled)
+PREAMBLE_DIR = "/home/leanuser/.cache/lean-preambles"
+
+# Preamble names become the module Preamble.<name>
+PREAMBLE_NAME_PATTERN = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+
+# Reset for containers whose execution ended abnormally, so the runner's own cleanup may
+# not have run. It runs as root: leftover Lean processes are killed (the container's init
+# process ignores the signal) and scratch directories are removed.
+POOLED_RESET_SCRIPT = r"""
+pkill -9 -u leanuser 2>/dev/null
+rm -rf /tmp/lean_*
+test -d /tmp
+"""
+
+# Exit codes of `timeout` when it had to stop Lean (TERM, or KILL after the grace period)
+TIMEOUT_EXIT_CODES = (124, 137)
+
+# Seconds the host waits beyond the in-container timeout before abandoning an exec
+EXEC_DEADLINE_GRACE = 10
+
+# Candidates per container before a shared-header batch spreads over another container
+HEADER_BATCH_MIN_ITEMS = 8
+
+
+def _build_output(output: str) -> Optional[bytes]:
+    """Return the executable or olean a runner exec built, or None if it built nothing."""
+    start = output.find("---LEAN_BUILD_OUTPUT_START---")
+    end = output.find("---LEAN_BUILD_OUTPUT_END---")
+    if start < 0 or end < 0:
+        return None
+    try:
+        return base64.b64decode(output[start + len("---LEAN_BUILD_OUTPUT_START---"):end].strip(), validate=True) or None
+    except binascii.Error:
+        return None
+
+
+def _write_file(path: str, data: bytes) -> None:
+    """Write ``data`` to a new file at ``path``."""
+    with open(path, "wb") as f:
+        f.write(data)
+
 
 class DockerManager:
     """Manages Docker containers for executing Lean4 code."""
@@ -177,6 +286,7 @@ class DockerManager:
         """Initialize the Docker manager with the given configuration."""
         self.config = config or load_config()
         self.docker_available = False
+        self.image_id: Optional[str] = None
         
         # Handle the case where Docker is not available gracefully
         try:
@@ -186,7 +296,20 @@ class DockerManager:
             # Ensure the required Docker image exists locally. All image build logic now lives in
             # lean_docker_mcp.__init__.ensure_docker_image(), so we *only* check for existence here.
             try:
-                self.client.images.get(self.config.docker.image)
+                image = self.client.images.get(self.config.docker.image)
+                self.image_id = image.id
+                runner_version = (image.labels or {}).get(RUNNER_VERSION_LABEL)
+                if runner_version != RUNNER_VERSION:
+                    logger.warning(
+                        f"Docker image {self.config.docker.image} has runner version {runner_version}, "
+                        f"expected {RUNNER_VERSION}. Rebuild the image so it contains {RUNNER_PATH}."
+                    )
+                mathlib_ref = getattr(self.config.docker, "mathlib_ref", "")
+                if mathlib_ref and (image.labels or {}).get(MATHLIB_REF_LABEL) != mathlib_ref:
+                    logger.warning(
+                        f"Docker image {self.config.docker.image} has no prebuilt Mathlib {mathlib_ref}. "
+                        "Rebuild it with build_docker_image.sh --mathlib or lean_docker_mcp.ensure_docker_image()."
+                    )
             except NotFound:
                 # Image is missing – we do *not* attempt to build it here anymore.
                 logger.warning(
@@ -202,6 +325,8 @@ class DockerManager:
             self.client = None
             
         self.persistent_containers: Dict[str, str] = {}  # session_id -> container_id
+        self.session_repls: Dict[str, LeanReplWorker] = {}  # session_id -> REPL holding its environments
+        self._session_locks: Dict[str, asyncio.Lock] = {}  # A REPL answers one command at a time
         self.validator = LeanCodeValidator(self.config)
         
         # Container pooling functionality
@@ -225,10 +350,408 @@ class DockerManager:
             self.pool_enabled = False
         
         self.container_creation_timestamps: Dict[str, float] = {}  # container_id -> creation_timestamp
+        self._acquired_at: Dict[str, float] = {}  # container_id -> monotonic time it was handed out
+
+        # Optional autoscaling of pool_size between pool_min_size and pool_max_size
+        self.autoscaler: Optional[PoolAutoscaler] = None
+        pool_max_size = getattr(self.config.docker, "pool_max_size", 0)
+        if self.pool_enabled and isinstance(pool_max_size, int) and pool_max_size > 0:
+            self.autoscaler = PoolAutoscaler(
+                min_size=getattr(self.config.docker, "pool_min_size", 0),
+                max_size=pool_max_size,
+                container_memory_bytes=parse_memory_limit(self.config.docker.memory_limit),
+                min_free_memory_bytes=getattr(self.config.docker, "pool_min_free_memory_mb", 512) * 1024 * 1024,
+            )
+            self.pool_size = self.autoscaler.clamp(self.pool_size)
         
         # Container acquisition semaphore to limit concurrent container creations
         self.container_semaphore = asyncio.Semaphore(self.max_concurrent_creations)
 
+        # Background pool maintenance: replenishing, prewarming and retiring aged containers
+        self.pool_maintenance_interval = getattr(self.config.docker, "pool_maintenance_interval", 5.0)
+        self.pool_prewarm_seconds = getattr(self.config.docker, "pool_prewarm_seconds", 30)
+        self.pool_wait_timeout = getattr(self.config.docker, "pool_wait_timeout", 5.0)
+        self._pool_available = asyncio.Condition(self.pool_lock)  # Notified when a container enters the pool
+        self._pool_wakeup = asyncio.Event()
+        self._pool_creating = 0
+        self._pool_waiters = 0  # Requests waiting for a container to enter the pool
+        self._maintenance_task: Optional[asyncio.Task] = None
+        self._background_tasks: Set[asyncio.Task] = set()
+        self.retired_count = 0
+
+        # Containers released after an abnormal execution are reset by a background worker
+        self._dirty_containers: asyncio.Queue = asyncio.Queue()
+        self._reset_task: Optional[asyncio.Task] = None
+        self.reset_count = 0
+
+        # Content-addressed cache of deterministic execution results
+        cache_config = getattr(self.config, "cache", None) or CacheConfig()
+        self.result_cache: Optional[ResultCache] = None
+        if cache_config.enabled:
+            self.result_cache = ResultCache(
+                max_entries=cache_config.max_entries,
+                path=cache_config.path,
+                max_disk_entries=getattr(cache_config, "max_disk_entries", 100000),
+            )
+        self._lean_version: Optional[str] = None
+
+        # Identical executions in flight share one run
+        self.coalesce_inflight = getattr(cache_config, "coalesce_inflight", True)
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self.coalesced_count = 0
+
+        # Persistent Lean REPL workers, keyed by pooled container ID
+        self.repl_enabled = getattr(self.config.docker, "repl_enabled", False)
+        self.repl_workers: Dict[str, LeanReplWorker] = {}
+        self._repl_failed: Set[str] = set()  # Pooled containers whose REPL could not be started
+
+        # Programs with a main function run as native executables cached on a shared volume
+        self.native_compile = getattr(self.config.docker, "native_compile", False)
+
+        # Prebuilt packages such as Mathlib are shared by all containers from one read-only volume
+        self.packages_volume = getattr(self.config.docker, "packages_volume", "")
+
+        # Registered preambles compiled to oleans on a shared volume: name -> content key
+        self.preambles_enabled = getattr(self.config.docker, "preambles_enabled", False)
+        self.preambles: Dict[str, str] = {}
+        # Preambles registered before a restart are read back from the volume once
+        self._preambles_loaded = False
+        self._preambles_lock = asyncio.Lock()
+
+        # The Docker SDK is synchronous, so every call into it is dispatched to a bounded
+        # thread pool. Without this a single long-running exec would block the event loop
+        # and serialize all requests regardless of the pool size.
+        executor_max_workers = getattr(self.config.docker, "executor_max_workers", 0)
+        if not isinstance(executor_max_workers, int) or executor_max_workers <= 0:
+            executor_max_workers = self._default_executor_workers()
+        self.executor_max_workers = executor_max_workers
+        self._executor = ThreadPoolExecutor(max_workers=executor_max_workers, thread_name_prefix="lean-docker")
+
+    def _default_executor_workers(self) -> int:
+        """Size the Docker executor so every pooled container can run an exec at once."""
+        pool_size = self.pool_size if isinstance(self.pool_size, int) else 0
+        if self.autoscaler is not None:
+            pool_size = self.autoscaler.max_size
+        max_creations = self.max_concurrent_creations if isinstance(self.max_concurrent_creations, int) else 5
+        # One worker per pooled container, plus room for concurrent creations and
+        # housekeeping calls (container lookups, removals) issued alongside executions.
+        return max(pool_size, 1) + max_creations + 4
+
+    async def _run_blocking(self, func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        """Run a blocking Docker SDK call in the executor without blocking the event loop.
+
+        Args:
+            func: The blocking callable to run
+            *args: Positional arguments for the callable
+            **kwargs: Keyword arguments for the callable
+
+        Returns:
+            The return value of the callable
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, functools.partial(func, *args, **kwargs))
+
+    async def _run_with_deadline(self, func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        """Run a blocking execution call, giving up once the execution timeout has clearly passed.
+
+        Lean is stopped inside the container when the timeout expires; this deadline only
+        fires if the container or the Docker daemon stops responding.
+
+        Raises:
+            asyncio.TimeoutError: If the call has not finished by the deadline
+        """
+        deadline = self.config.docker.timeout + 2 * EXEC_DEADLINE_GRACE
+        return await asyncio.wait_for(self._run_blocking(func, *args, **kwargs), timeout=deadline)
+
+    def _timeout_result(self, lean_output: str = "") -> Dict[str, Any]:
+        """Build the result for an execution stopped by the execution timeout.
+
+        Args:
+            lean_output: Any output Lean printed before it was stopped
+
+        Returns:
+            An error result with ``error_type`` "timeout"
+        """
+        lean_output, diagnostics = parse_lean_output(lean_output)
+        return {
+            "stdout": lean_output,
+            "error": f"Execution timed out after {self.config.docker.timeout} seconds",
+            "error_type": "timeout",
+            "status": "error",
+            "diagnostics": diagnostics,
+            "diagnostic_summary": summarize_diagnostics(diagnostics),
+        }
+
+    def _runner_environment(self, check_only: bool = False, native_key: Optional[str] = None) -> Dict[str, str]:
+        """Return the environment variables for an exec of the image's runner."""
+        environment = {"LEAN_TIMEOUT": str(self.config.docker.timeout)}
+        if check_only:
+            environment["LEAN_CHECK_ONLY"] = "1"
+        if native_key is not None:
+            environment["LEAN_NATIVE_KEY"] = native_key
+            environment["LEAN_NATIVE_CACHE"] = NATIVE_CACHE_DIR
+        if self.packages_volume:
+            environment["LEAN_PACKAGES"] = PACKAGES_DIR
+        if self.preambles_enabled:
+            environment["LEAN_PREAMBLES"] = self._preamble_root()
+        return environment
+
+    def _preamble_root(self) -> str:
+        """Return the preamble directory of the current image.
+
+        Preambles are compiled per image, so a rebuilt image never loads oleans built by
+        another Lean and its preambles have to be registered again.
+        """
+        image = self.image_id or self.config.docker.image
+        return f"{PREAMBLE_DIR}/{hashlib.sha256(image.encode('utf-8')).hexdigest()[:16]}"
+
+    async def _load_preambles(self) -> None:
+        """Read the preambles registered by earlier server runs back from the preamble volume.
+
+        Registrations only live in memory, but their links stay on the volume. Without them a
+        persistent result cache would key code importing a preamble as if nothing were
+        registered. Preambles registered by this run take precedence; a failed lookup is
+        not retried.
+        """
+        if self._preambles_loaded or not self.preambles_enabled or not self.docker_available:
+            return
+        async with self._preambles_lock:
+            if self._preambles_loaded:
+                return
+            self._preambles_loaded = True
+            try:
+                output = await self._run_with_deadline(
+                    self.client.containers.run,
+                    image=self.config.docker.image,
+                    command=[
+                        "/bin/sh", "-c",
+                        'cd "$0/lib/Preamble" 2>/dev/null || exit 0; for link in *.olean; do [ -L "$link" ] && echo "$link $(readlink "$link")"; done; exit 0',
+                        self._preamble_root(),
+                    ],
+                    volumes={self.config.docker.preamble_volume: {"bind": PREAMBLE_DIR, "mode": "ro"}},
+                    network_disabled=True,
+                    remove=True,
+                    detach=False,
+                )
+            except Exception as e:
+                logger.warning(f"Could not read the registered preambles: {str(e)}")
+                return
+
+            for line in output.decode("utf-8", errors="replace").splitlines():
+                # <Name>.olean ../../objects/<key>/Preamble/<Name>.olean
+                link, _, target = line.partition(" ")
+                name = link[: -len(".olean")]
+                parts = target.split("/")
+                if PREAMBLE_NAME_PATTERN.match(name) and "objects" in parts[:-1]:
+                    self.preambles.setdefault(name, parts[parts.index("objects") + 1])
+            logger.info(f"Loaded {len(self.preambles)} registered preambles")
+
+    async def _native_key(self, code: str, check_only: bool = False) -> Optional[str]:
+        """Return the native executable cache key for a program, or None if it is interpreted.
+
+        The key covers the source, the image and the Lean version, so a binary is only
+        reused for the exact program and toolchain it was built from.
+        """
+        if not self.native_compile or check_only or "def main" not in code:
+            return None
+        return make_cache_key(code, self.image_id or self.config.docker.image, await self.get_lean_version(), {"native": True})
+
+    def _container_volumes(self) -> Optional[Dict[str, Dict[str, str]]]:
+        """Return the shared volumes mounted into every execution container."""
+        volumes = {}
+        if self.native_compile:
+            # Read-only, so a snippet can't replace an executable that other requests run
+            volumes[self.config.docker.native_cache_volume] = {"bind": NATIVE_CACHE_DIR, "mode": "ro"}
+        if self.packages_volume:
+            # Read-only, so every container maps the same olean files and shares their page cache
+            volumes[self.packages_volume] = {"bind": PACKAGES_DIR, "mode": "ro"}
+        if self.preambles_enabled:
+            # Read-only like the native cache, so a snippet can't change what others import
+            volumes[self.config.docker.preamble_volume] = {"bind": PREAMBLE_DIR, "mode": "ro"}
+        return volumes or None
+
+    async def _store_in_volume(
+        self, volume: str, path: str, data: Optional[bytes], mode: str = "644", link: Optional[str] = None
+    ) -> None:
+        """Write a build output to a shared volume from a container that runs no submitted code.
+
+        Execution containers mount the shared volumes read-only, so this is the only way
+        files get into them.
+
+        Args:
+            volume: The Docker volume to write to
+            path: Destination of ``data``, relative to the volume root
+            data: The file content, or None to only update ``link``
+            mode: Permission bits of the stored file
+            link: Optional symlink, relative to the volume root, to point at ``path``
+        """
+        with tempfile.TemporaryDirectory() as incoming:
+            if data is not None:
+                await self._run_blocking(_write_file, os.path.join(incoming, "data"), data)
+            target = os.path.relpath(path, os.path.dirname(link)) if link else ""
+            await self._run_with_deadline(
+                self.client.containers.run,
+                image=self.config.docker.image,
+                command=["/bin/sh", "-c", STORE_SCRIPT, path, mode, link or "", target],
+                user="root",
+                # Only system binaries: the image's PATH also has directories leanuser can write
+                environment={"PATH": "/usr/sbin:/usr/bin:/sbin:/bin"},
+                volumes={
+                    volume: {"bind": STORE_DIR, "mode": "rw"},
+                    incoming: {"bind": "/incoming", "mode": "ro"},
+                },
+                network_disabled=True,
+                remove=True,
+                detach=False,
+            )
+
+    async def _store_native_binary(self, binary: bytes, native_key: str) -> None:
+        """Add an executable the runner just compiled to the native cache in the background."""
+
+        async def store() -> None:
+            try:
+                await self._store_in_volume(self.config.docker.native_cache_volume, native_key, binary, mode="755")
+            except Exception as e:
+                # The next run of the program compiles it again
+                logger.warning(f"Could not store native executable {native_key[:12]}: {str(e)}")
+
+        task = asyncio.create_task(store())
+        self._background_tasks.add(task)
+        task.add_done_callback(self._background_tasks.discard)
+
+    async def _store_preamble(self, olean: Optional[bytes], module: str, key: str) -> None:
+        """Store a preamble olean the runner just compiled, if any, and link it as ``Preamble.<module>``.
+
+        Raises:
+            DockerExecutionError: If the preamble volume could not be updated
+        """
+        root = os.path.relpath(self._preamble_root(), PREAMBLE_DIR)
+        try:
+            await self._store_in_volume(
+                self.config.docker.preamble_volume,
+                f"{root}/objects/{key}/Preamble/{module}.olean",
+                olean,
+                link=f"{root}/lib/Preamble/{module}.olean",
+            )
+        except Exception as e:
+            raise DockerExecutionError(f"Could not store preamble {module}: {str(e)}")
+
+    async def _store_build_outputs(
+        self,
+        output: str,
+        exit_code: Optional[int],
+        native_key: Optional[str],
+        extra_environment: Optional[Dict[str, str]],
+    ) -> None:
+        """Copy what a runner exec built into the shared volumes.
+
+        Args:
+            output: The runner's complete output, carrying what it built
+            exit_code: The runner's exit code
+            native_key: The native cache key the run used, if any
+            extra_environment: Extra runner environment, naming the preamble being compiled
+        """
+        built = _build_output(output)
+        if native_key is not None and built is not None:
+            await self._store_native_binary(built, native_key)
+        module = (extra_environment or {}).get("LEAN_PREAMBLE_MODULE")
+        if module is not None and exit_code == 0:
+            await self._store_preamble(built, module, extra_environment["LEAN_PREAMBLE_KEY"])
+
+    def _is_timeout(self, exit_code: Optional[int], elapsed: float) -> bool:
+        """Return whether a runner exit was caused by the in-container timeout."""
+        return exit_code in TIMEOUT_EXIT_CODES and elapsed >= self.config.docker.timeout
+
+    def shutdown(self) -> None:
+        """Stop pool maintenance, release the executor threads used for Docker calls and close the result cache."""
+        for task in (self._maintenance_task, self._reset_task):
+            if task is not None:
+                task.cancel()
+        self._maintenance_task = None
+        self._reset_task = None
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        if self.result_cache is not None:
+            self.result_cache.close()
+
+    async def get_lean_version(self) -> str:
+        """Return the Lean version in the execution image, querying it once.
+
+        Returns:
+            The output of ``lean --version``, or "unknown" if it could not be determined
+        """
+        if self._lean_version is None:
+            try:
+                output = await self._run_blocking(
+                    self.client.containers.run,
+                    image=self.config.docker.image,
+                    command=["lean", "--version"],
+                    network_disabled=True,
+                    remove=True,
+                )
+                self._lean_version = output.decode("utf-8").strip()
+            except Exception as e:
+                logger.warning(f"Could not determine Lean version: {e}")
+                return "unknown"
+        return self._lean_version
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Return runtime statistics for the manager.
+
+        Returns:
+            A dictionary with result cache counters, in-flight coalescing counters and pool occupancy
+        """
+        return {
+            "lean_version": self._lean_version,
+            "cache": self.result_cache.stats() if self.result_cache is not None else {"enabled": False},
+            "inflight": {
+                "executing": len(self._inflight),
+                "coalesced": self.coalesced_count,
+            },
+            "pool": {
+                "available": len(self.container_pool),
+                "in_use": len(self.in_use_containers),
+                "creating": self._pool_creating,
+                "resetting": self._dirty_containers.qsize(),
+                "reset": self.reset_count,
+                "retired": self.retired_count,
+                "size": self.pool_size,
+                "autoscaling": self.autoscaler.stats() if self.autoscaler is not None else {"enabled": False},
+            },
+            "preambles": sorted(self.preambles),
+        }
+
+    async def _cache_get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Look up a cached result, reading the on-disk tier in the executor."""
+        cached = self.result_cache.get(key, memory_only=self.result_cache.persistent)
+        if cached is None and self.result_cache.persistent:
+            cached = await self._run_blocking(self.result_cache.get, key)
+        return cached
+
+    async def _cache_put(self, key: str, result: Dict[str, Any]) -> None:
+        """Store a result, writing the on-disk tier in the executor."""
+        if self.result_cache.persistent:
+            await self._run_blocking(self.result_cache.put, key, result)
+        else:
+            self.result_cache.put(key, result)
+
+    async def _result_cache_key(self, code: str, check_only: bool = False) -> str:
+        """Compute the result cache key for code run with the current image and limits."""
+        limits = {
+            "memory_limit": self.config.docker.memory_limit,
+            "cpu_limit": self.config.docker.cpu_limit,
+            "timeout": self.config.docker.timeout,
+        }
+        if check_only:
+            limits["check_only"] = True
+        if self.packages_volume:
+            limits["packages_volume"] = self.packages_volume
+        imported = {module[len("Preamble."):] for module in split_imports(code)[0] if module.startswith("Preamble.")}
+        if self.preambles_enabled and imported:
+            # Code importing a preamble depends on the registered content; other code doesn't
+            await self._load_preambles()
+            limits["preambles"] = {name: self.preambles.get(name, "unregistered") for name in sorted(imported)}
+        return make_cache_key(code, self.image_id or self.config.docker.image, await self.get_lean_version(), limits)
+
     def _prepare_lean_code(self, code: str) -> str:
         """Prepare Lean code for execution by checking if it needs a main function wrapper."""
         # Check if code already has a main function definition
@@ -246,7 +769,7 @@ class DockerManager:
         return code
 
     async def initialize_pool(self) -> None:
-        """Initialize the container pool."""
+        """Initialize the container pool and start its background maintenance."""
         if not self.pool_enabled:
             logger.info("Container pooling is disabled, skipping initialization")
             return
@@ -281,12 +804,146 @@ class DockerManager:
                 if successful_creations < self.pool_size:
                     logger.warning(f"Only created {successful_creations} out of {self.pool_size} requested containers")
 
+        # From here on the maintenance task tops the pool up and retires aged containers
+        self.start_pool_maintenance()
+
+    def start_pool_maintenance(self) -> None:
+        """Start the background task that replenishes the pool and retires aged containers."""
+        if self._pool_maintenance_running():
+            return
+        self._pool_wakeup = asyncio.Event()
+        self._maintenance_task = asyncio.create_task(self._pool_maintenance_loop())
+        logger.debug("Started container pool maintenance")
+
+    async def stop_pool_maintenance(self) -> None:
+        """Stop the pool maintenance and reset tasks and wait for them to exit."""
+        tasks = [self._maintenance_task, self._reset_task]
+        self._maintenance_task = None
+        self._reset_task = None
+        for task in tasks:
+            if task is not None and not task.done():
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+
+    def _pool_maintenance_running(self) -> bool:
+        """Return whether the pool maintenance task is active."""
+        return self._maintenance_task is not None and not self._maintenance_task.done()
+
+    async def _pool_maintenance_loop(self) -> None:
+        """Run pool maintenance periodically, or sooner when a request finds the pool empty."""
+        while True:
+            try:
+                await self._maintain_pool()
+            except Exception as e:
+                logger.error(f"Error maintaining container pool: {str(e)}")
+
+            try:
+                await asyncio.wait_for(self._pool_wakeup.wait(), timeout=self.pool_maintenance_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._pool_wakeup.clear()
+
+    async def _maintain_pool(self) -> None:
+        """Retire aged idle containers and create replacements, without holding the pool lock for Docker calls."""
+        if self.autoscaler is not None:
+            target = self.autoscaler.target_size(self.pool_size, available_memory=available_memory_bytes())
+            # Requests that are already waiting are demand the arrival rate hasn't caught up with,
+            # so with no idle containers left every waiter gets a container created for it
+            target = max(target, self.autoscaler.clamp(len(self.in_use_containers) + self._pool_waiters))
+            if target != self.pool_size:
+                logger.info(f"Scaling container pool from {self.pool_size} to {target} containers")
+                self.pool_size = target
+
+        now = time.time()
+        prewarm_age = self.pool_max_age - self.pool_prewarm_seconds
+
+        async with self.pool_lock:
+            expired = [c for c in self.container_pool if self._container_age(c, now) > self.pool_max_age]
+            for container_id in expired:
+                self.container_pool.remove(container_id)
+
+            # After scaling down, retire the oldest idle containers above the target size
+            excess = len(self.container_pool) + len(self.in_use_containers) - self.pool_size
+            while excess > 0 and self.container_pool:
+                expired.append(self.container_pool.pop(0))
+                excess -= 1
+
+            for container_id in expired:
+                self.container_creation_timestamps.pop(container_id, None)
+
+            # Containers close to their maximum age don't count towards the pool size, so
+            # their replacements are warm by the time they are retired.
+            healthy = sum(
+                1
+                for container_id in self.container_pool + list(self.in_use_containers)
+                if self._container_age(container_id, now) <= prewarm_age
+            )
+            needed = min(
+                self.pool_size - healthy - self._pool_creating,
+                self.max_concurrent_creations - self._pool_creating,
+            )
+            needed = max(needed, 0)
+            self._pool_creating += needed
+
+        if expired:
+            logger.info(f"Retiring {len(expired)} containers from pool")
+            await self._remove_containers(expired)
+
+        if needed:
+            logger.debug(f"Replenishing pool with {needed} containers")
+            await asyncio.gather(*[self._add_new_pooled_container() for _ in range(needed)])
+
+    def _container_age(self, container_id: str, now: float) -> float:
+        """Return how long ago a pooled container was created."""
+        return now - self.container_creation_timestamps.get(container_id, now)
+
+    async def _add_new_pooled_container(self) -> None:
+        """Create a container and make it available to waiting requests."""
+        try:
+            container_id = await self._create_pooled_container()
+        except Exception:
+            # Already logged by _create_pooled_container; the next maintenance pass retries
+            async with self.pool_lock:
+                self._pool_creating -= 1
+            return
+
+        async with self._pool_available:
+            self._pool_creating -= 1
+            self.container_pool.append(container_id)
+            self.container_creation_timestamps[container_id] = time.time()
+            self._pool_available.notify()
+
+    async def _remove_containers(self, container_ids: List[str]) -> None:
+        """Force-remove containers that have left the pool."""
+
+        async def remove(container_id: str) -> None:
+            self._close_repl_worker(container_id)
+            self._repl_failed.discard(container_id)
+            try:
+                container = await self._run_blocking(self.client.containers.get, container_id)
+                await self._run_blocking(container.remove, force=True)
+                self.retired_count += 1
+            except Exception as e:
+                logger.warning(f"Error removing container {container_id[:12]}: {str(e)}")
+
+        await asyncio.gather(*[remove(container_id) for container_id in container_ids])
+
+    def _remove_containers_in_background(self, container_ids: List[str]) -> None:
+        """Schedule container removal so the caller doesn't wait on Docker."""
+        task = asyncio.create_task(self._remove_containers(container_ids))
+        self._background_tasks.add(task)
+        task.add_done_callback(self._background_tasks.discard)
+
     async def _create_pooled_container(self) -> str:
         """Create a new container for the pool."""
         try:
             async with self.container_semaphore:
                 # Create a container in a paused state that we can use later
-                container = self.client.containers.run(
+                container = await self._run_blocking(
+                    self.client.containers.run,
                     image=self.config.docker.image,
                     command=["sleep", "3600"],  # Sleep for 1 hour
                     detach=True,
@@ -294,102 +951,181 @@ class DockerManager:
                     cpu_quota=int(self.config.docker.cpu_limit * 100000),
                     network_disabled=self.config.docker.network_disabled,
                     read_only=False,  # Make container read-only for security
+                    volumes=self._container_volumes(),
                     labels={
                         "lean_docker_mcp.pooled": "true",
                         "lean_docker_mcp.created": str(time.time())
                     }
                 )
                 logger.debug(f"Created pooled container {container.id[:12]}")
-                return container.id
         except Exception as e:
             logger.error(f"Error creating pooled container: {str(e)}")
             raise DockerExecutionError(f"Failed to create container for pool: {str(e)}")
 
+        # Load the REPL's preloaded imports now so the first request doesn't pay for them
+        if self.repl_enabled:
+            await self._get_repl_worker(container.id)
+        return container.id
+
+    def _pop_available_container(self) -> Optional[str]:
+        """Take an idle container from the pool, skipping aged ones. Call with the pool lock held."""
+        now = time.time()
+        while self.container_pool:
+            container_id = self.container_pool.pop()
+            if self._container_age(container_id, now) <= self.pool_max_age:
+                return container_id
+            self.container_creation_timestamps.pop(container_id, None)
+            self._remove_containers_in_background([container_id])
+        return None
+
     async def _get_container_from_pool(self) -> str:
-        """Get a container from the pool or create a new one if needed."""
-        container_id = None
-        
-        async with self.pool_lock:
-            # Clean up old containers in the pool
-            current_time = time.time()
-            removed_count = 0
-            
-            for container_id in list(self.container_pool):
-                if container_id in self.container_creation_timestamps:
-                    age = current_time - self.container_creation_timestamps[container_id]
-                    if age > self.pool_max_age:
-                        self.container_pool.remove(container_id)
-                        try:
-                            container = self.client.containers.get(container_id)
-                            container.remove(force=True)
-                            del self.container_creation_timestamps[container_id]
-                            removed_count += 1
-                        except Exception as e:
-                            logger.warning(f"Error removing old container {container_id[:12]}: {str(e)}")
-            
-            if removed_count > 0:
-                logger.info(f"Removed {removed_count} aged-out containers from pool")
-                
-            # Get a container from the pool
-            if self.container_pool:
-                container_id = self.container_pool.pop()
+        """Get a container from the pool or create a new one if needed.
+
+        Acquisition makes no Docker calls: the maintenance task keeps the pool topped up,
+        and a request that finds it empty waits for the next container to become
+        available. Only if none arrives within ``pool_wait_timeout`` (or maintenance is
+        not running) is a container created on demand.
+        """
+        started = time.monotonic()
+        if self.autoscaler is not None:
+            self.autoscaler.record_arrival()
+        async with self._pool_available:
+            container_id = self._pop_available_container()
+            if container_id is None and self._pool_maintenance_running():
+                self._pool_waiters += 1
+                self._pool_wakeup.set()
+                try:
+                    await asyncio.wait_for(
+                        self._pool_available.wait_for(lambda: self.container_pool),
+                        timeout=self.pool_wait_timeout,
+                    )
+                except asyncio.TimeoutError:
+                    pass
+                finally:
+                    self._pool_waiters -= 1
+                container_id = self._pop_available_container()
+
+            if container_id:
                 self.in_use_containers.add(container_id)
                 logger.debug(f"Retrieved container {container_id[:12]} from pool")
-                
-        # If no container available in pool, create a new one
-        if not container_id:
-            logger.info("No containers available in pool, creating new one")
-            container_id = await self._create_pooled_container()
-            async with self.pool_lock:
-                self.in_use_containers.add(container_id)
-                self.container_creation_timestamps[container_id] = time.time()
-                
-        return container_id
+                self._record_acquire(container_id, started)
+                return container_id
 
-    async def _return_container_to_pool(self, container_id: str) -> None:
-        """Return a container to the pool for reuse or clean it up if the pool is full."""
+        logger.info("No containers available in pool, creating new one")
+        container_id = await self._create_pooled_container()
         async with self.pool_lock:
-            # Remove from in-use set
-            if container_id in self.in_use_containers:
-                self.in_use_containers.remove(container_id)
-            
+            self.in_use_containers.add(container_id)
+            self.container_creation_timestamps[container_id] = time.time()
+            if self.autoscaler is not None:
+                # Grow the target so the new container is kept when it is returned
+                self.pool_size = max(self.pool_size, self.autoscaler.clamp(len(self.in_use_containers)))
+        self._record_acquire(container_id, started)
+        return container_id
+
+    def _record_acquire(self, container_id: str, started: float) -> None:
+        """Note when a container was handed out and feed the wait time to the autoscaler."""
+        now = time.monotonic()
+        self._acquired_at[container_id] = now
+        if self.autoscaler is not None:
+            self.autoscaler.record_acquire(now - started)
+
+    async def _return_container_to_pool(self, container_id: str, dirty: bool = False) -> None:
+        """Return a container to the pool for reuse, or retire it if it is aged or the pool is full.
+
+        Args:
+            container_id: ID of the container being released
+            dirty: Whether the execution ended abnormally. Dirty containers are queued
+                for a background reset instead of going straight back to the pool, so
+                the caller never waits for the reset.
+        """
+        acquired_at = self._acquired_at.pop(container_id, None)
+        if self.autoscaler is not None and acquired_at is not None:
+            self.autoscaler.record_release(time.monotonic() - acquired_at)
+
+        if dirty:
+            self._dirty_containers.put_nowait(container_id)
+            if self._reset_task is None or self._reset_task.done():
+                self._reset_task = asyncio.create_task(self._reset_worker_loop())
+            return
+
+        async with self._pool_available:
+            self.in_use_containers.discard(container_id)
+
+            # Executions clean up after themselves inside the exec, so no reset is needed here
+            age = self._container_age(container_id, time.time())
+            if age <= self.pool_max_age and len(self.container_pool) < self.pool_size:
+                self.container_pool.append(container_id)
+                self._pool_available.notify()
+                logger.debug(f"Returned container {container_id[:12]} to pool")
+                return
+
+            self.container_creation_timestamps.pop(container_id, None)
+
+        logger.debug(f"Retiring container {container_id[:12]} instead of returning it to the pool")
+        self._remove_containers_in_background([container_id])
+
+    async def _reset_worker_loop(self) -> None:
+        """Reset dirty containers one at a time and move healthy ones back to the pool."""
+        while True:
+            container_id = await self._dirty_containers.get()
             try:
-                # Check container still exists and is healthy
-                container = self.client.containers.get(container_id)
-                
-                # Reset container state if needed (stop running processes, clean temporary files)
-                # This is important to ensure isolation between executions
-                try:
-                    container.exec_run("pkill -9 -u leanuser", user="root")
-                    container.exec_run("rm -rf /home/leanuser/project/*", user="root")
-                except Exception as e:
-                    logger.warning(f"Error resetting container state: {str(e)}")
-                
-                # If pool isn't full, add it back to the pool
-                if len(self.container_pool) < self.pool_size:
-                    self.container_pool.append(container_id)
-                    # Reset the creation timestamp to extend lifetime
-                    self.container_creation_timestamps[container_id] = time.time()
-                    logger.debug(f"Returned container {container_id[:12]} to pool")
-                else:
-                    # Pool is full, remove this container
-                    container.remove(force=True)
-                    if container_id in self.container_creation_timestamps:
-                        del self.container_creation_timestamps[container_id]
-                    logger.debug(f"Pool is full, removed container {container_id[:12]}")
+                healthy = await self._reset_container(container_id)
             except Exception as e:
-                logger.warning(f"Error returning container {container_id[:12]} to pool: {str(e)}")
-                # Try to force remove if there's an issue
-                try:
-                    self.client.containers.get(container_id).remove(force=True)
-                except:
-                    pass
-                
-                if container_id in self.container_creation_timestamps:
-                    del self.container_creation_timestamps[container_id]
+                logger.warning(f"Error resetting container {container_id[:12]}: {str(e)}")
+                healthy = False
+
+            if healthy:
+                self.reset_count += 1
+                await self._return_container_to_pool(container_id)
+            else:
+                async with self.pool_lock:
+                    self.in_use_containers.discard(container_id)
+                    self.container_creation_timestamps.pop(container_id, None)
+                await self._remove_containers([container_id])
+
+    async def _reset_container(self, container_id: str) -> bool:
+        """Kill leftover processes and scratch files in a container.
+
+        Args:
+            container_id: ID of the dirty container
+
+        Returns:
+            True if the container is healthy and can be reused
+        """
+        # The REPL may be in the middle of the abandoned command, so start a fresh one
+        await self._run_blocking(self._close_repl_worker, container_id, True)
+        exec_result = await self._run_blocking(
+            exec_with_stdin,
+            self.client.api,
+            container_id,
+            ["bash", "-c", POOLED_RESET_SCRIPT],
+            b"",
+            user="root",
+            timeout=EXEC_DEADLINE_GRACE,
+        )
+        return exec_result.exit_code == 0
+
+    async def execute_transient(
+        self,
+        code: str,
+        on_output: Optional[Callable[[str], Awaitable[None]]] = None,
+        stop_on_error: bool = False,
+        check_only: bool = False,
+    ) -> Dict[str, Any]:
+        """Execute Lean4 code in a new container that doesn't persist state.
 
-    async def execute_transient(self, code: str) -> Dict[str, Any]:
-        """Execute Lean4 code in a new container that doesn't persist state."""
+        Args:
+            code: The Lean4 code to execute
+            on_output: Optional coroutine called with each line of Lean output while the code
+                runs. Streamed runs bypass the result cache and in-flight coalescing.
+            stop_on_error: With ``on_output``, stop at the first error line instead of waiting
+                for Lean to finish; the result then has ``error_type`` "stopped_on_error"
+            check_only: Only elaborate the code, never running ``main``, and return a proof
+                verdict with the axioms each theorem depends on (see ``proof_check``)
+
+        Returns:
+            A dictionary containing the execution results
+        """
         try:
             # Validate the code first
             is_valid, error_message = self.validator.validate(code)
@@ -410,179 +1146,710 @@ class DockerManager:
                     "status": "error",
                 }
 
-            # Use pooled execution if enabled
-            if self.pool_enabled:
-                return await self._execute_transient_pooled(code)
-            else:
-                return await self._execute_transient_original(code)
+            if check_only:
+                theorems = declared_theorems(code)
+                result = await self._execute_validated(append_axiom_queries(code, theorems), on_output, stop_on_error, check_only=True)
+                return proof_verdict(result, code, theorems)
+            return await self._execute_validated(code, on_output, stop_on_error)
                 
         except Exception as e:
             if not isinstance(e, DockerExecutionError):
                 raise DockerExecutionError(f"Error executing code in Docker: {str(e)}")
             raise
 
-    async def _execute_transient_pooled(self, code: str) -> Dict[str, Any]:
-        """Execute Lean4 code using a container from the pool.
-        
+    async def _execute_validated(
+        self,
+        code: str,
+        on_output: Optional[Callable[[str], Awaitable[None]]],
+        stop_on_error: bool,
+        check_only: bool = False,
+    ) -> Dict[str, Any]:
+        """Execute validated code, through the result cache unless it is streamed or runs ``main``."""
+        if on_output is not None:
+            return await self._run_transient_streaming(code, on_output, stop_on_error, check_only)
+
+        # Compiling and checking is deterministic, so those results can be served from
+        # the cache or shared with identical requests already in flight. Programs with a
+        # main function or #eval commands may depend on IO and always run on their own.
+        if not is_deterministic(code, check_only) or (self.result_cache is None and not self.coalesce_inflight):
+            return await self._run_transient(code, check_only=check_only)
+
+        cache_key = await self._result_cache_key(code, check_only)
+        if self.result_cache is not None:
+            cached = await self._cache_get(cache_key)
+            if cached is not None:
+                cached["cached"] = True
+                return cached
+
+        if self.coalesce_inflight:
+            return await self._run_transient_coalesced(cache_key, code, check_only)
+        return await self._run_transient(code, cache_key, check_only)
+
+    async def register_preamble(self, name: str, code: str) -> Dict[str, Any]:
+        """Compile a preamble once so that later code can import it instead of inlining it.
+
+        The preamble becomes the module ``Preamble.<name>``, compiled to an olean on the
+        shared preamble volume and keyed by its content, so registering the same source
+        again only relinks the existing olean. Execution containers mount the volume
+        read-only; the olean is written by :meth:`_store_in_volume`.
+
         Args:
-            code: The Lean4 code to execute
-            
+            name: Preamble name, a Lean identifier
+            code: The preamble source: imports, helper definitions and lemmas. ``open`` and
+                ``set_option`` lines only apply inside the preamble itself
+
         Returns:
-            A dictionary containing the execution results
+            A dictionary with the compilation status and diagnostics, the module name and the
+            import line that loads it
         """
-        container_id = None
+        if not self.preambles_enabled:
+            return {
+                "stdout": "",
+                "error": "Preambles are disabled. Set docker.preambles_enabled to register them.",
+                "error_type": "preambles_disabled",
+                "status": "error",
+            }
+        if not PREAMBLE_NAME_PATTERN.match(name):
+            return {
+                "stdout": "",
+                "error": f"Validation error: preamble name {name!r} is not a Lean identifier",
+                "error_type": "validation_error",
+                "status": "error",
+            }
+        is_valid, error_message = self.validator.validate(code)
+        if not is_valid:
+            return {
+                "stdout": "",
+                "error": f"Validation error: {error_message}",
+                "error_type": "validation_error",
+                "status": "error",
+            }
+        if not self.docker_available:
+            return {
+                "stdout": "",
+                "error": "Docker is not available. Please make sure Docker is running and restart the server.",
+                "error_type": "docker_unavailable",
+                "status": "error",
+            }
+
+        key = make_cache_key(code, self.image_id or self.config.docker.image, await self.get_lean_version(), {"preamble": name})
+        compile_environment = {"LEAN_PREAMBLE_MODULE": name, "LEAN_PREAMBLE_KEY": key}
         try:
-            # Get a container from the pool
-            container_id = await self._get_container_from_pool()
-            container = self.client.containers.get(container_id)
-            
-            # Create temporary directory to mount inside the container
-            with tempfile.TemporaryDirectory() as temp_dir:
-                # Create Lean file with the code
-                script_path = os.path.join(temp_dir, "Script.lean")
-                lean_runner_path = os.path.join(temp_dir, "run_lean.sh")
-                
-                # Write the Lean code to a file
-                with open(script_path, "w") as f:
-                    f.write(code)
-                
-                # Create a wrapper script to run Lean and capture different streams
-                with open(lean_runner_path, "w") as f:
-                    script_content = """#!/bin/bash
-# Wrapper script to execute Lean and capture output streams
-
-echo "Running Lean in $(pwd)"
-echo "Lean version: $(lean --version)"
-echo "Content of Script.lean:"
-cat Script.lean
-echo "---"
-
-# Decide whether the file defines a main function
-if grep -q 'def[[:space:]]\+main' Script.lean; then
-    # Run Lean with -r to execute the main function
-    lean_output=$(lean -r Script.lean 2>&1 | grep -v "warning: failed to query latest release")
-    exit_code=$?
-else
-    # Compile only – this will trigger evaluation of any `#eval` directives
-    lean_output=$(lean Script.lean 2>&1 | grep -v "warning: failed to query latest release")
-    exit_code=$?
-fi
+            if self.pool_enabled:
+                result = await self._execute_transient_pooled(code, check_only=True, extra_environment=compile_environment)
+            else:
+                result = await self._execute_transient_original(code, check_only=True, extra_environment=compile_environment)
+        except Exception as e:
+            if not isinstance(e, DockerExecutionError):
+                raise DockerExecutionError(f"Error compiling preamble {name}: {str(e)}")
+            raise
 
-# Write structured result with clear markers for parsing
-echo "---LEAN_OUTPUT_START---"
-echo "$lean_output"
-echo "---LEAN_OUTPUT_END---"
-echo "---LEAN_EXIT_CODE_START---"
-echo "$exit_code"
-echo "---LEAN_EXIT_CODE_END---"
-exit $exit_code
-"""
-                    f.write(script_content)
-                
-                # Make the wrapper script executable
-                os.chmod(lean_runner_path, 0o755)
-                
-                # Copy files to container
-                exec_id = str(uuid.uuid4())
-                target_dir = f"/tmp/app_{exec_id}"
-                
-                # Create target directory in container
-                mkdir_cmd = container.exec_run(
-                    cmd=["mkdir", "-p", target_dir],
-                )
-                
-                if mkdir_cmd.exit_code != 0:
-                    raise DockerExecutionError(f"Failed to create directory in container: {mkdir_cmd.output.decode('utf-8')}")
-                
-                # Use docker cp to copy files to container
-                import subprocess
-                cp_script = subprocess.run(
-                    ["docker", "cp", script_path, f"{container.id}:{target_dir}/Script.lean"],
-                    capture_output=True
-                )
-                
-                if cp_script.returncode != 0:
-                    raise DockerExecutionError(f"Failed to copy script to container: {cp_script.stderr.decode('utf-8')}")
-                
-                cp_runner = subprocess.run(
-                    ["docker", "cp", lean_runner_path, f"{container.id}:{target_dir}/run_lean.sh"],
-                    capture_output=True
-                )
-                
-                if cp_runner.returncode != 0:
-                    raise DockerExecutionError(f"Failed to copy runner to container: {cp_runner.stderr.decode('utf-8')}")
-                
-                # Make the runner executable in the container
-                chmod_cmd = container.exec_run(
-                    cmd=["chmod", "+x", f"{target_dir}/run_lean.sh"],
-                )
-                
-                # Run the Lean code
-                exec_result = container.exec_run(
-                    cmd=[f"{target_dir}/run_lean.sh"],
-                    workdir=target_dir,
-                    user="leanuser",
-                )
-                
-                # Clean up the temporary files
-                container.exec_run(
-                    cmd=["rm", "-rf", target_dir],
-                )
-                
-                # Decode the output
-                output = exec_result.output.decode("utf-8")
-                exit_code = exec_result.exit_code
-                
-                # Parse the structured output
-                lean_output = ""
-                parsed_exit_code = exit_code
-                
-                # Extract the Lean output
-                output_start = output.find("---LEAN_OUTPUT_START---")
-                output_end = output.find("---LEAN_OUTPUT_END---")
-                if output_start >= 0 and output_end >= 0:
-                    lean_output = output[output_start + len("---LEAN_OUTPUT_START---"):output_end].strip()
-                
-                # Extract the exit code
-                exit_code_start = output.find("---LEAN_EXIT_CODE_START---")
-                exit_code_end = output.find("---LEAN_EXIT_CODE_END---")
-                if exit_code_start >= 0 and exit_code_end >= 0:
-                    exit_code_str = output[exit_code_start + len("---LEAN_EXIT_CODE_START---"):exit_code_end].strip()
+        module = f"Preamble.{name}"
+        if result["status"] == "success":
+            self.preambles[name] = key
+            logger.info(f"Registered preamble {module} ({key[:12]})")
+        return dict(result, name=name, module=module, key=key, import_line=f"import {module}")
+
+    async def execute_batch(
+        self,
+        codes: List[str],
+        max_parallel: Optional[int] = None,
+        on_result: Optional[Callable[[int, Dict[str, Any]], Awaitable[None]]] = None,
+        header: Optional[str] = None,
+    ) -> List[Dict[str, Any]]:
+        """Execute many independent Lean4 snippets across the container pool.
+
+        Every snippet goes through :meth:`execute_transient`, so validation, caching and
+        in-flight coalescing apply per item. A failing item never fails the batch.
+
+        Args:
+            codes: The Lean4 snippets to execute
+            max_parallel: Maximum snippets executing at once; defaults to ``batch_max_parallel``
+                or, if that is 0, to the pool size
+            on_result: Optional coroutine called with (index, result) as each item completes
+            header: Optional preamble shared by every snippet (imports, ``open`` lines, the
+                theorem statement). Each item is checked as ``header + "\n" + snippet``; with
+                REPL workers the header is elaborated once per container instead of per item.
+
+        Returns:
+            One result per snippet, in input order, each with its ``index``
+        """
+        if not max_parallel or max_parallel <= 0:
+            max_parallel = self._default_batch_parallelism()
+        semaphore = asyncio.Semaphore(max_parallel)
+        results: List[Dict[str, Any]] = [{} for _ in codes]
+
+        async def finish(index: int, result: Dict[str, Any]) -> None:
+            result["index"] = index
+            results[index] = result
+            if on_result is not None:
+                try:
+                    await on_result(index, result)
+                except Exception as e:
+                    logger.warning(f"Error reporting batch item {index}: {str(e)}")
+
+        async def run_item(index: int, code: str) -> None:
+            async with semaphore:
+                try:
+                    result = await self.execute_transient(code)
+                except Exception as e:
+                    logger.error(f"Error executing batch item {index}: {str(e)}")
+                    result = {
+                        "stdout": "",
+                        "error": str(e),
+                        "error_type": "execution_error",
+                        "status": "error",
+                    }
+            await finish(index, result)
+
+        remaining = list(range(len(codes)))
+        if header is not None:
+            bodies = codes
+            codes = [f"{header}\n{body}" for body in bodies]
+            if self.docker_available and self.pool_enabled and self.repl_enabled:
+                remaining = await self._check_against_header(header, bodies, codes, max_parallel, finish)
+
+        await asyncio.gather(*[run_item(index, codes[index]) for index in remaining])
+        return results
+
+    async def _check_against_header(
+        self,
+        header: str,
+        bodies: List[str],
+        codes: List[str],
+        max_parallel: int,
+        finish: Callable[[int, Dict[str, Any]], Awaitable[None]],
+    ) -> List[int]:
+        """Check batch items against a header elaborated once per container by its REPL.
+
+        A header ending in ``by`` leaves a proof open: it is elaborated once with ``sorry`` and
+        every snippet runs as a tactic against the resulting proof state. Any other header must
+        consist of complete commands, and every snippet runs as a command in its environment.
+
+        Args:
+            header: The shared preamble
+            bodies: The per-item snippets without the header
+            codes: The full per-item sources (header and snippet)
+            max_parallel: Maximum number of containers to use
+            finish: Coroutine recording the result of an item
+
+        Returns:
+            Indices of items that still need to run through :meth:`execute_transient`
+            (programs with ``main``, invalid code, or items the REPL could not check)
+        """
+        line_offset = header.count("\n") + 1
+        open_proof = re.search(r"\bby\s*$", header) is not None
+        queue: List[int] = []
+        cache_keys: Dict[int, str] = {}
+        handled: Set[int] = set()
+
+        for index, code in enumerate(codes):
+            if "def main" in bodies[index] or not self.validator.validate(code)[0]:
+                continue
+            if self.result_cache is not None and is_deterministic(code):
+                cache_keys[index] = await self._result_cache_key(code)
+                cached = await self._cache_get(cache_keys[index])
+                if cached is not None:
+                    cached["cached"] = True
+                    handled.add(index)
+                    await finish(index, cached)
+                    continue
+            queue.append(index)
+
+        async def check_in_container() -> None:
+            container_id = await self._get_container_from_pool()
+            try:
+                worker = await self._get_repl_worker(container_id)
+                if worker is None:
+                    return
+                timeout = self.config.docker.timeout
+                try:
+                    # An open proof is elaborated with a placeholder so the REPL hands back its goal
+                    response = await self._run_with_deadline(
+                        worker.run_command, f"{header} sorry" if open_proof else header, timeout=timeout
+                    )
+                except (LeanReplError, asyncio.TimeoutError) as e:
+                    logger.warning(f"Could not elaborate batch header in container {container_id[:12]}: {e}")
+                    await self._run_blocking(self._close_repl_worker, container_id, True)
+                    return
+                if "env" not in response or any(m.get("severity") == "error" for m in response.get("messages", [])):
+                    # Let each item report the header's errors in full through the lean runner
+                    return
+                sorries = response.get("sorries", [])
+                if open_proof and len(sorries) != 1:
+                    return
+
+                while queue:
+                    index = queue.pop(0)
+                    if open_proof:
+                        request = {"tactic": textwrap.dedent(bodies[index]).strip(), "proofState": sorries[0]["proofState"]}
+                    else:
+                        request = {"cmd": bodies[index], "env": response["env"]}
                     try:
-                        parsed_exit_code = int(exit_code_str)
-                    except ValueError:
-                        parsed_exit_code = exit_code
-                
-                # Check for Lean-specific errors and parse them if present
-                is_success = parsed_exit_code == 0 and "error:" not in lean_output.lower()
-                
-                result = {
-                    "stdout": lean_output,
-                    "exit_code": parsed_exit_code,
-                    "status": "success" if is_success else "error",
-                }
-                
-                # If there was an error, add more detailed error information
-                if not is_success:
-                    lean_error = self.validator.parse_lean_error(lean_output)
-                    if lean_error:
-                        result["error"] = lean_error.message
-                        result["error_info"] = lean_error.to_dict()
+                        step = await self._run_with_deadline(worker.send, request, timeout=timeout)
+                    except (LeanReplTimeout, asyncio.TimeoutError):
+                        await self._run_blocking(self._close_repl_worker, container_id, True)
+                        handled.add(index)
+                        await finish(index, self._timeout_result())
+                        return
+                    except LeanReplError as e:
+                        logger.warning(f"Lean REPL failed in container {container_id[:12]} during batch: {e}")
+                        await self._run_blocking(self._close_repl_worker, container_id, True)
+                        return
+
+                    if open_proof:
+                        result = self._closing_tactic_result(step, line_offset=line_offset)
                     else:
-                        result["error"] = "Lean execution error" if parsed_exit_code != 0 else "Unknown error in Lean output"
-                
-                return result
+                        result = self._repl_result(step, line_offset=line_offset)
+                    if index in cache_keys and self.result_cache is not None and is_cacheable(result):
+                        await self._cache_put(cache_keys[index], result)
+                    handled.add(index)
+                    await finish(index, result)
+
+                if worker.commands_run >= self.config.docker.repl_max_commands:
+                    self._close_repl_worker(container_id)
+            finally:
+                await self._return_container_to_pool(container_id)
+
+        if queue:
+            # Each container pays for the header once, so only spread out for larger groups
+            containers = max(1, min(max_parallel, len(queue) // HEADER_BATCH_MIN_ITEMS))
+            await asyncio.gather(*[check_in_container() for _ in range(containers)])
+
+        return [index for index in range(len(codes)) if index not in handled]
+
+    def _default_batch_parallelism(self) -> int:
+        """Return how many batch items run at once when the caller doesn't say."""
+        configured = getattr(self.config.docker, "batch_max_parallel", 0)
+        if isinstance(configured, int) and configured > 0:
+            return configured
+        if self.autoscaler is not None:
+            return self.autoscaler.max_size
+        if self.pool_enabled and self.pool_size > 0:
+            return self.pool_size
+        return self.max_concurrent_creations
+
+    async def _run_transient_streaming(
+        self,
+        code: str,
+        on_output: Callable[[str], Awaitable[None]],
+        stop_on_error: bool,
+        check_only: bool = False,
+    ) -> Dict[str, Any]:
+        """Execute code while forwarding its output as it is produced.
+
+        Without pooling the output can only be forwarded once the container has exited.
+        """
+        if self.pool_enabled:
+            return await self._execute_transient_pooled(code, on_output=on_output, stop_on_error=stop_on_error, check_only=check_only)
+
+        result = await self._execute_transient_original(code, check_only)
+        for line in result.get("stdout", "").splitlines():
+            await on_output(line)
+        return result
+
+    async def _run_transient(self, code: str, cache_key: Optional[str] = None, check_only: bool = False) -> Dict[str, Any]:
+        """Execute code with the configured transient strategy and cache the result.
+
+        Args:
+            code: The validated Lean4 code to execute
+            cache_key: Result cache key, or None if the result must not be cached
+            check_only: Only elaborate the code, never running ``main``
+
+        Returns:
+            A dictionary containing the execution results
+        """
+        # Use pooled execution if enabled
+        if self.pool_enabled:
+            result = await self._execute_transient_pooled(code, check_only=check_only)
+        else:
+            result = await self._execute_transient_original(code, check_only)
+
+        if cache_key is not None and self.result_cache is not None and is_cacheable(result):
+            await self._cache_put(cache_key, result)
+        return result
+
+    async def _run_transient_coalesced(self, key: str, code: str, check_only: bool = False) -> Dict[str, Any]:
+        """Execute code, sharing the result with identical requests that arrive meanwhile.
+
+        The first caller for a key runs the code; later callers with the same key await
+        its result instead of taking another container.
+
+        Args:
+            key: The result cache key identifying the execution
+            code: The validated Lean4 code to execute
+            check_only: Only elaborate the code, never running ``main``
+
+        Returns:
+            A dictionary containing the execution results
+        """
+        while key in self._inflight:
+            inflight = self._inflight[key]
+            try:
+                result = await asyncio.shield(inflight)
+            except asyncio.CancelledError:
+                # The request we were waiting on was cancelled; run it ourselves unless
+                # it was this caller that got cancelled
+                if inflight.cancelled():
+                    continue
+                raise
+            self.coalesced_count += 1
+            return dict(result, coalesced=True)
+
+        future: asyncio.Future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            result = await self._run_transient(code, key, check_only)
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            # Mark the exception as retrieved; waiters (if any) re-raise it themselves
+            future.exception()
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            del self._inflight[key]
+
+    async def _execute_transient_pooled(
+        self,
+        code: str,
+        on_output: Optional[Callable[[str], Awaitable[None]]] = None,
+        stop_on_error: bool = False,
+        check_only: bool = False,
+        extra_environment: Optional[Dict[str, str]] = None,
+    ) -> Dict[str, Any]:
+        """Execute Lean4 code using a container from the pool.
+        
+        Args:
+            code: The Lean4 code to execute
+            on_output: Optional coroutine called with each line of Lean output as it is produced
+            stop_on_error: With ``on_output``, abandon the run at the first error line
+            check_only: Only elaborate the code, never running ``main``
+            extra_environment: Additional runner environment, which also bypasses the REPL
+            
+        Returns:
+            A dictionary containing the execution results
+        """
+        container_id = None
+        dirty = False
+        try:
+            # Get a container from the pool
+            container_id = await self._get_container_from_pool()
+
+            # Programs with a main function need the lean runner unless they are only being
+            # checked; everything else can be elaborated by the container's REPL against its
+            # already-loaded environment. Streamed runs also use the runner, since the REPL
+            # only answers once finished.
+            if self.repl_enabled and (check_only or "def main" not in code) and on_output is None and not extra_environment:
+                result = await self._execute_with_repl(container_id, code)
+                if result is not None:
+                    return result
+            
+            # A single exec hands the source to the image's runner on stdin; the runner
+            # cleans up after itself, so the container needs no separate reset round trip.
+            native_key = await self._native_key(code, check_only)
+            started = time.monotonic()
+            exec_args = (
+                exec_with_stdin,
+                self.client.api,
+                container_id,
+                [RUNNER_PATH],
+                code.encode("utf-8"),
+            )
+            exec_kwargs = {
+                "user": "leanuser",
+                "environment": dict(self._runner_environment(check_only, native_key), **(extra_environment or {})),
+                "timeout": self.config.docker.timeout + EXEC_DEADLINE_GRACE,
+            }
+            try:
+                if on_output is None:
+                    exec_result = await self._run_with_deadline(*exec_args, **exec_kwargs)
+                else:
+                    exec_result, streamed = await self._run_streaming(exec_args, exec_kwargs, on_output, stop_on_error)
+                    if exec_result is None:
+                        # Stopped at the first error; the reset worker kills the rest of the run
+                        dirty = True
+                        result = self._build_result("\n".join(streamed), 1)
+                        result["error_type"] = "stopped_on_error"
+                        return result
+            except (ExecTimeoutError, asyncio.TimeoutError):
+                logger.warning(f"Execution in container {container_id[:12]} did not finish before its deadline")
+                dirty = True
+                return self._timeout_result()
+            elapsed = time.monotonic() - started
+            
+            # Decode the output
+            output = exec_result.output.decode("utf-8")
+            exit_code = exec_result.exit_code
+            
+            # Parse the structured output
+            lean_output = ""
+            parsed_exit_code = exit_code
+            
+            # Extract the Lean output
+            output_start = output.find("---LEAN_OUTPUT_START---")
+            output_end = output.find("---LEAN_OUTPUT_END---")
+            if output_start >= 0 and output_end >= 0:
+                lean_output = output[output_start + len("---LEAN_OUTPUT_START---"):output_end].strip()
+            
+            # Extract the exit code
+            exit_code_start = output.find("---LEAN_EXIT_CODE_START---")
+            exit_code_end = output.find("---LEAN_EXIT_CODE_END---")
+            if exit_code_start >= 0 and exit_code_end >= 0:
+                exit_code_str = output[exit_code_start + len("---LEAN_EXIT_CODE_START---"):exit_code_end].strip()
+                try:
+                    parsed_exit_code = int(exit_code_str)
+                except ValueError:
+                    parsed_exit_code = exit_code
+
+            if self._is_timeout(parsed_exit_code, elapsed):
+                return self._timeout_result(lean_output)
+            await self._store_build_outputs(output, parsed_exit_code, native_key, extra_environment)
+            return self._build_result(lean_output, parsed_exit_code)
                 
+        except asyncio.CancelledError:
+            # The exec keeps running in its thread after the request is cancelled
+            dirty = True
+            raise
+
         except Exception as e:
             logger.error(f"Error in pooled execution: {str(e)}")
+            # The runner may not have cleaned up after itself
+            dirty = True
             raise DockerExecutionError(f"Error executing Lean code in pooled container: {str(e)}")
-        
+
         finally:
             # Return the container to the pool if we got one
             if container_id:
-                await self._return_container_to_pool(container_id)
+                await self._return_container_to_pool(container_id, dirty=dirty)
+
+    async def _run_streaming(
+        self,
+        exec_args: Tuple[Any, ...],
+        exec_kwargs: Dict[str, Any],
+        on_output: Callable[[str], Awaitable[None]],
+        stop_on_error: bool,
+    ) -> Tuple[Optional[Any], List[str]]:
+        """Run the Lean runner exec, forwarding Lean's output line by line as it arrives.
+
+        Args:
+            exec_args: Positional arguments for :meth:`_run_with_deadline`
+            exec_kwargs: Keyword arguments for the exec
+            on_output: Coroutine called with each line printed by Lean, with messages rendered as text
+            stop_on_error: Whether to stop waiting for the exec at the first error message
+
+        Returns:
+            A tuple of (the exec output, or None if the run was stopped early, the raw lines received)
+        """
+        loop = asyncio.get_running_loop()
+        chunks: asyncio.Queue = asyncio.Queue()
+
+        def forward(data: bytes) -> None:
+            loop.call_soon_threadsafe(chunks.put_nowait, data)
+
+        exec_task = asyncio.ensure_future(self._run_with_deadline(*exec_args, on_output=forward, **exec_kwargs))
+        # Wake the reader once the exec is done; earlier callbacks are already queued
+        exec_task.add_done_callback(lambda _: loop.call_soon(chunks.put_nowait, None))
+
+        lines: List[str] = []
+        pending = ""
+        in_output = False
+        stopped = False
+        while not stopped:
+            data = await chunks.get()
+            if data is None:
+                break
+            pending += data.decode("utf-8", errors="replace")
+            *complete, pending = pending.split("\n")
+            for line in complete:
+                if line == "---LEAN_OUTPUT_START---":
+                    in_output = True
+                elif line == "---LEAN_OUTPUT_END---":
+                    in_output = False
+                elif in_output:
+                    lines.append(line)
+                    diagnostic = parse_json_message(line)
+                    try:
+                        await on_output(line if diagnostic is None else render_diagnostic(diagnostic))
+                    except Exception as e:
+                        logger.warning(f"Error forwarding Lean output: {str(e)}")
+                    if stop_on_error and diagnostic is not None and diagnostic["severity"] == "error":
+                        stopped = True
+                        break
+
+        if stopped and not exec_task.done():
+            exec_task.cancel()
+            return None, lines
+        return await exec_task, lines
+
+    def _build_result(self, lean_output: str, exit_code: int, diagnostics: Optional[List[Dict[str, Any]]] = None) -> Dict[str, Any]:
+        """Build the execution result dictionary from Lean's output and exit code.
+
+        Args:
+            lean_output: The text printed by the runner's ``lean --json``, or already rendered
+                text when ``diagnostics`` is given
+            exit_code: The exit code of the Lean process
+            diagnostics: The messages Lean reported, if they were obtained separately
+
+        Returns:
+            A dictionary containing the execution results
+        """
+        if diagnostics is None:
+            lean_output, diagnostics = parse_lean_output(lean_output)
+        summary = summarize_diagnostics(diagnostics)
+        is_success = exit_code == 0 and summary["errors"] == 0
+
+        result = {
+            "stdout": lean_output,
+            "exit_code": exit_code,
+            "status": "success" if is_success else "error",
+            "diagnostics": diagnostics,
+            "diagnostic_summary": summary,
+        }
+
+        # If there was an error, add more detailed error information
+        if not is_success:
+            if summary["errors"]:
+                first_error = next(diagnostic for diagnostic in diagnostics if diagnostic["severity"] == "error")
+                lean_error = self.validator.error_from_diagnostic(first_error)
+            else:
+                # Output that is not from Lean's message log, e.g. the runner failing to start
+                lean_error = self.validator.parse_lean_error(lean_output)
+            if lean_error:
+                result["error"] = lean_error.message
+                result["error_info"] = lean_error.to_dict()
+            else:
+                result["error"] = "Lean execution error" if exit_code != 0 else "Unknown error in Lean output"
+
+        return result
+
+    async def _get_repl_worker(self, container_id: str) -> Optional[LeanReplWorker]:
+        """Return the container's REPL worker, starting one if needed.
+
+        Args:
+            container_id: ID of the pooled container
+
+        Returns:
+            A running worker, or None if the REPL could not be started
+        """
+        worker = self.repl_workers.get(container_id)
+        if worker is not None and worker.alive:
+            return worker
+        if container_id in self._repl_failed:
+            return None
+
+        worker = LeanReplWorker(
+            self.client.api,
+            container_id,
+            # The runner sets up the same LEAN_PATH as for lean before it execs the REPL
+            command=f"{RUNNER_PATH} --exec {self.config.docker.repl_command}",
+            environment=self._runner_environment(),
+            preload_imports=self.config.docker.repl_preload_imports,
+        )
+        try:
+            await self._run_blocking(worker.start, timeout=self.config.docker.repl_start_timeout)
+        except LeanReplUnavailable as e:
+            # The image was built without the REPL, so no container will ever have one
+            logger.warning(f"Lean REPL is not installed in the image, disabling REPL execution: {e}")
+            self.repl_enabled = False
+            return None
+        except Exception as e:
+            # E.g. a slow preload import; only this container falls back to the lean runner
+            logger.warning(f"Could not start Lean REPL in container {container_id[:12]}, using the lean runner there: {e}")
+            self._repl_failed.add(container_id)
+            return None
+
+        self.repl_workers[container_id] = worker
+        return worker
+
+    def _close_repl_worker(self, container_id: str, kill: bool = False) -> None:
+        """Stop tracking a container's REPL worker and close its connection."""
+        worker = self.repl_workers.pop(container_id, None)
+        if worker is not None:
+            worker.close(kill=kill)
+
+    async def _execute_with_repl(self, container_id: str, code: str) -> Optional[Dict[str, Any]]:
+        """Elaborate Lean code with the container's persistent REPL.
+
+        Args:
+            container_id: ID of the pooled container
+            code: The Lean4 code to execute
+
+        Returns:
+            A dictionary containing the execution results, or None if the REPL is unusable
+            and the caller should fall back to the lean runner
+        """
+        worker = await self._get_repl_worker(container_id)
+        if worker is None:
+            return None
+
+        try:
+            response = await self._run_with_deadline(worker.run_command, code, timeout=self.config.docker.timeout)
+        except (LeanReplTimeout, asyncio.TimeoutError):
+            # Killing the REPL stops the runaway elaboration; a fresh one starts on the next request
+            await self._run_blocking(self._close_repl_worker, container_id, True)
+            return self._timeout_result()
+        except LeanReplError as e:
+            logger.warning(f"Lean REPL failed in container {container_id[:12]}, falling back to lean runner: {e}")
+            await self._run_blocking(self._close_repl_worker, container_id, True)
+            if isinstance(e, LeanReplUnavailable):
+                self.repl_enabled = False
+            return None
+
+        # Every command keeps its environment alive in the REPL, so restart it periodically
+        if worker.commands_run >= self.config.docker.repl_max_commands:
+            self._close_repl_worker(container_id)
+
+        return self._repl_result(response)
+
+    def _repl_result(self, response: Dict[str, Any], line_offset: int = 0) -> Dict[str, Any]:
+        """Build the execution result for a REPL response.
+
+        Args:
+            response: The decoded REPL response
+            line_offset: Lines preceding the command in the file the caller submitted
 
-    async def _execute_transient_original(self, code: str) -> Dict[str, Any]:
+        Returns:
+            A dictionary containing the execution results
+        """
+        if "message" in response and "env" not in response:
+            # The REPL rejected the command itself, e.g. an unparsable header
+            messages = [{"severity": "error", "pos": {"line": 1, "column": 0}, "data": response["message"]}]
+        else:
+            messages = response.get("messages", [])
+
+        diagnostics = [make_diagnostic(message, line_offset) for message in messages]
+        has_error = any(diagnostic["severity"] == "error" for diagnostic in diagnostics)
+        lean_output = "\n".join(render_diagnostic(diagnostic) for diagnostic in diagnostics).strip()
+        return self._build_result(lean_output, 1 if has_error else 0, diagnostics)
+
+    def _closing_tactic_result(self, response: Dict[str, Any], line_offset: int = 0) -> Dict[str, Any]:
+        """Build the execution result for a tactic that has to finish a proof on its own.
+
+        Args:
+            response: The decoded REPL response to the tactic
+            line_offset: Lines preceding the tactic in the file the caller submitted
+
+        Returns:
+            A dictionary containing the execution results
+        """
+        messages = list(response.get("messages", []))
+        position = {"line": 1, "column": 0}
+        if response.get("goals"):
+            # Lean reports these against the declaration once the tactic block ends
+            goals = "\n\n".join(response["goals"])
+            messages.append({"severity": "error", "pos": position, "data": f"unsolved goals\n{goals}"})
+        if response.get("sorries"):
+            messages.append({"severity": "warning", "pos": position, "data": "declaration uses 'sorry'"})
+        return self._repl_result(dict(response, messages=messages), line_offset=line_offset)
+
+    async def _execute_transient_original(
+        self, code: str, check_only: bool = False, extra_environment: Optional[Dict[str, str]] = None
+    ) -> Dict[str, Any]:
         """Original implementation of transient execution without pooling."""
         # Check if the code contains only #eval expressions without a main function
         # If so, wrap it in a main function to avoid the "unknown declaration 'main'" error
@@ -593,61 +1860,43 @@ exit $exit_code
             # Create Lean file with the code
             script_path = os.path.join(temp_dir, "Script.lean")
             
-            # Create a wrapper script to capture output and errors
-            lean_runner_path = os.path.join(temp_dir, "run_lean.sh")
-            
             # Write the Lean code to a file
             with open(script_path, "w") as f:
                 f.write(modified_code)
-            
-            # Create a wrapper script to run Lean and capture different streams
-            with open(lean_runner_path, "w") as f:
-                script_content = """#!/bin/bash
-# Wrapper script to execute Lean and capture output streams
-
-echo "Running Lean in $(pwd)"
-echo "Lean version: $(lean --version)"
-echo "Content of Script.lean:"
-cat Script.lean
-echo "---"
-
-# Decide whether the file defines a main function
-if grep -q 'def[[:space:]]\+main' Script.lean; then
-    # Run Lean with -r to execute the main function
-    lean_output=$(lean -r Script.lean 2>&1 | grep -v "warning: failed to query latest release")
-    exit_code=$?
-else
-    # Compile only – this will trigger evaluation of any `#eval` directives
-    lean_output=$(lean Script.lean 2>&1 | grep -v "warning: failed to query latest release")
-    exit_code=$?
-fi
 
-# Write structured result with clear markers for parsing
-echo "---LEAN_OUTPUT_START---"
-echo "$lean_output"
-echo "---LEAN_OUTPUT_END---"
-echo "---LEAN_EXIT_CODE_START---"
-echo "$exit_code"
-echo "---LEAN_EXIT_CODE_END---"
-exit $exit_code
-"""
-                f.write(script_content)
-            
-            # Make the wrapper script executable
-            os.chmod(lean_runner_path, 0o755)
+            volumes = {temp_dir: {"bind": "/app", "mode": "rw"}}
+            volumes.update(self._container_volumes() or {})
+            native_key = await self._native_key(modified_code, check_only)
+            environment = dict(self._runner_environment(check_only, native_key), **(extra_environment or {}))
 
-            # Run container synchronously with the script
-            container_output = self.client.containers.run(
-                image=self.config.docker.image,
-                command=["timeout", str(self.config.docker.timeout), "/app/run_lean.sh"],
-                volumes={temp_dir: {"bind": "/app", "mode": "rw"}},
-                working_dir="/app",  # Execute in the mounted volume
-                mem_limit=self.config.docker.memory_limit,
-                cpu_quota=int(self.config.docker.cpu_limit * 100000),
-                network_disabled=self.config.docker.network_disabled,
-                remove=True,  # Run synchronously
-                detach=False,
-            )
+            # Run container synchronously with the image's runner. The exit code is reported
+            # between the runner's markers; a non-zero container exit would make containers.run raise.
+            started = time.monotonic()
+            try:
+                container_output = await self._run_with_deadline(
+                    self.client.containers.run,
+                    image=self.config.docker.image,
+                    command=[
+                        "timeout", "-k", "2", str(self.config.docker.timeout),
+                        "bash", "-c", f'{RUNNER_PATH} "$0"; exit 0', "/app/Script.lean",
+                    ],
+                    environment=environment,
+                    volumes=volumes,
+                    working_dir="/app",  # Execute in the mounted volume
+                    mem_limit=self.config.docker.memory_limit,
+                    cpu_quota=int(self.config.docker.cpu_limit * 100000),
+                    network_disabled=self.config.docker.network_disabled,
+                    remove=True,  # Run synchronously
+                    detach=False,
+                )
+            except ContainerError as e:
+                if e.exit_status in TIMEOUT_EXIT_CODES:
+                    return self._timeout_result()
+                raise
+            except asyncio.TimeoutError:
+                logger.warning("Transient container did not finish before its deadline")
+                return self._timeout_result()
+            elapsed = time.monotonic() - started
 
             # Decode the output
             output = container_output.decode("utf-8")
@@ -672,25 +1921,10 @@ exit $exit_code
                 except ValueError:
                     exit_code = -1
 
-            # Check for Lean-specific errors and parse them if present
-            is_success = exit_code == 0 and "error:" not in lean_output.lower()
-            
-            result = {
-                "stdout": lean_output,
-                "exit_code": exit_code,
-                "status": "success" if is_success else "error",
-            }
-            
-            # If there was an error, add more detailed error information
-            if not is_success:
-                lean_error = self.validator.parse_lean_error(lean_output)
-                if lean_error:
-                    result["error"] = lean_error.message
-                    result["error_info"] = lean_error.to_dict()
-                else:
-                    result["error"] = "Lean execution error" if exit_code != 0 else "Unknown error in Lean output"
-            
-            return result
+            if self._is_timeout(exit_code, elapsed):
+                return self._timeout_result(lean_output)
+            await self._store_build_outputs(output, exit_code, native_key, extra_environment)
+            return self._build_result(lean_output, exit_code)
 
     async def execute_persistent(self, session_id: str, code: str) -> Dict[str, Any]:
         """Execute Lean4 code in a persistent container that retains state between calls.
@@ -722,6 +1956,242 @@ exit $exit_code
                 "session_id": session_id,
             }
             
+        container_id = await self._ensure_persistent_container(session_id)
+
+        # Execute the code in the container
+        try:
+            # One exec hands the source to the image's runner on stdin, so there is no
+            # argument length limit or shell quoting, and nothing to clean up afterwards.
+            # A session whose container has gone makes the exec raise NotFound.
+            started = time.monotonic()
+            try:
+                exec_result = await self._run_with_deadline(
+                    exec_with_stdin,
+                    self.client.api,
+                    container_id,
+                    [RUNNER_PATH],
+                    code.encode("utf-8"),
+                    user="leanuser",
+                    workdir="/home/leanuser/project",
+                    environment=self._runner_environment(),
+                    timeout=self.config.docker.timeout + EXEC_DEADLINE_GRACE,
+                )
+            except (ExecTimeoutError, asyncio.TimeoutError):
+                logger.warning(f"Execution in session {session_id} did not finish before its deadline")
+                return dict(self._timeout_result(), session_id=session_id)
+            elapsed = time.monotonic() - started
+
+            # Capture the output
+            output = exec_result.output.decode("utf-8")
+            exit_code = exec_result.exit_code
+            
+            # Parse the structured output
+            lean_output = ""
+            parsed_exit_code = exit_code  # Default to the exit code of the exec
+            
+            # Extract the Lean output
+            output_start = output.find("---LEAN_OUTPUT_START---")
+            output_end = output.find("---LEAN_OUTPUT_END---")
+            if output_start >= 0 and output_end >= 0:
+                lean_output = output[output_start + len("---LEAN_OUTPUT_START---"):output_end].strip()
+            
+            # Extract the exit code from the output
+            exit_code_start = output.find("---LEAN_EXIT_CODE_START---")
+            exit_code_end = output.find("---LEAN_EXIT_CODE_END---")
+            if exit_code_start >= 0 and exit_code_end >= 0:
+                exit_code_str = output[exit_code_start + len("---LEAN_EXIT_CODE_START---"):exit_code_end].strip()
+                try:
+                    parsed_exit_code = int(exit_code_str)
+                except ValueError:
+                    parsed_exit_code = exit_code  # Fall back to the original exit code
+
+            if self._is_timeout(parsed_exit_code, elapsed):
+                return dict(self._timeout_result(lean_output), session_id=session_id)
+
+            # Include the session ID in the response
+            return dict(self._build_result(lean_output, parsed_exit_code), session_id=session_id)
+
+        except Exception as e:
+            if isinstance(e, NotFound):
+                # Container no longer exists, remove from tracked containers
+                if session_id in self.persistent_containers:
+                    del self.persistent_containers[session_id]
+                raise DockerExecutionError(f"Session {session_id} has expired or was deleted")
+            else:
+                raise DockerExecutionError(f"Error executing Lean code: {str(e)}")
+
+    async def execute_repl_command(self, session_id: str, code: str, env: Optional[int] = None) -> Dict[str, Any]:
+        """Run a command in a session's Lean REPL and return the environment it produced.
+
+        Every command leaves an immutable environment in the REPL, identified by the
+        returned ``env`` id, and every ``sorry`` leaves a proof state. A later command can
+        continue from any earlier environment, so branching from a deep point of a search
+        costs one command instead of re-elaborating everything before it.
+
+        Args:
+            session_id: A unique identifier for the session
+            code: The Lean4 command(s) to elaborate; imports are only allowed without ``env``
+            env: Environment id to continue from, or None to start from the imports in ``code``
+
+        Returns:
+            A dictionary with the execution results, the new ``env`` id and the
+            ``proof_states`` opened by ``sorry``
+        """
+        is_valid, error_message = self.validator.validate(code)
+        if not is_valid:
+            return {
+                "stdout": "",
+                "error": f"Validation error: {error_message}",
+                "error_type": "validation_error",
+                "status": "error",
+                "session_id": session_id,
+            }
+
+        if not self.docker_available:
+            return {
+                "stdout": "",
+                "error": "Docker is not available. Please make sure Docker is running and restart the server.",
+                "error_type": "docker_unavailable",
+                "status": "error",
+                "session_id": session_id,
+            }
+
+        timeout = self.config.docker.timeout
+        if env is None:
+            response = await self._call_session_repl(session_id, lambda worker: worker.run_command(code, timeout=timeout))
+        else:
+            response = await self._call_session_repl(
+                session_id, lambda worker: worker.send({"cmd": code, "env": env}, timeout=timeout)
+            )
+        if response is None:
+            return dict(self._timeout_result(), session_id=session_id)
+
+        result = self._repl_result(response)
+        result.update(session_id=session_id, env=response.get("env"), proof_states=proof_states(response))
+        return result
+
+    async def execute_tactic(self, session_id: str, proof_state: int, tactic: str) -> Dict[str, Any]:
+        """Apply one tactic to a proof state of a session's Lean REPL.
+
+        Only the tactic is elaborated, so a step costs the same at any depth of the proof.
+
+        Args:
+            session_id: The session whose REPL holds the proof state
+            proof_state: Proof state id returned by ``execute_repl_command`` or an earlier tactic
+            tactic: The tactic to run, e.g. ``intro n`` or ``simp [Nat.add_comm]``
+
+        Returns:
+            A dictionary with the status, the new ``proof_state`` id, the remaining ``goals``
+            as structured data, whether the goal is ``proved`` and the diagnostics
+        """
+        is_valid, error_message = self.validator.validate(tactic)
+        if not is_valid:
+            return {
+                "stdout": "",
+                "error": f"Validation error: {error_message}",
+                "error_type": "validation_error",
+                "status": "error",
+                "session_id": session_id,
+            }
+
+        worker = self.session_repls.get(session_id)
+        if worker is None or not worker.alive:
+            # Proof state ids belong to one REPL process; a new REPL would not know them
+            return {
+                "stdout": "",
+                "error": f"Session {session_id} has no Lean REPL with proof state {proof_state}. Run execute-lean-repl first.",
+                "error_type": "unknown_proof_state",
+                "status": "error",
+                "session_id": session_id,
+            }
+
+        response = await self._call_session_repl(
+            session_id,
+            lambda worker: worker.send({"tactic": tactic, "proofState": proof_state}, timeout=self.config.docker.timeout),
+        )
+        if response is None:
+            return dict(self._timeout_result(), session_id=session_id)
+
+        if response.get("sorries"):
+            # The REPL reports sorry as a proof state of its own, not as a warning message
+            messages = list(response.get("messages", []))
+            messages.append({"severity": "warning", "pos": {"line": 1, "column": 0}, "data": "declaration uses 'sorry'"})
+            response = dict(response, messages=messages)
+
+        result = self._repl_result(response)
+        goals = [parse_goal(goal) for goal in response.get("goals", [])]
+        result.update(
+            session_id=session_id,
+            proof_state=response.get("proofState"),
+            goals=goals,
+            proved=(
+                result["status"] == "success"
+                and "proofState" in response
+                and not goals
+                and not response.get("sorries")
+            ),
+        )
+        return result
+
+    async def _call_session_repl(
+        self, session_id: str, call: Callable[[LeanReplWorker], Dict[str, Any]]
+    ) -> Optional[Dict[str, Any]]:
+        """Run a blocking call against a session's REPL, one call per session at a time.
+
+        Args:
+            session_id: The session whose REPL to use, started if the session has none
+            call: Function that sends a request to the worker and returns the response
+
+        Returns:
+            The REPL response, or None if the REPL did not answer in time and was killed
+        """
+        lock = self._session_locks.setdefault(session_id, asyncio.Lock())
+        async with lock:
+            worker = await self._get_session_repl(session_id)
+            try:
+                return await self._run_with_deadline(call, worker)
+            except (LeanReplTimeout, asyncio.TimeoutError):
+                # Killing the REPL stops the elaboration and discards every id of the session
+                await self._run_blocking(self._close_session_repl, session_id, True)
+                return None
+            except LeanReplError as e:
+                await self._run_blocking(self._close_session_repl, session_id, True)
+                raise DockerExecutionError(f"Lean REPL of session {session_id} failed: {str(e)}")
+
+    async def _get_session_repl(self, session_id: str) -> LeanReplWorker:
+        """Return the REPL of a session, starting it in the session's container if needed."""
+        worker = self.session_repls.get(session_id)
+        if worker is not None and worker.alive:
+            return worker
+
+        container_id = await self._ensure_persistent_container(session_id)
+        worker = LeanReplWorker(
+            self.client.api,
+            container_id,
+            command=f"{RUNNER_PATH} --exec {self.config.docker.repl_command}",
+            preload_imports=self.config.docker.repl_preload_imports,
+            workdir="/home/leanuser/project",
+            environment=self._runner_environment(),
+        )
+        try:
+            await self._run_blocking(worker.start, timeout=self.config.docker.repl_start_timeout)
+        except NotFound:
+            self.persistent_containers.pop(session_id, None)
+            raise DockerExecutionError(f"Session {session_id} has expired or was deleted")
+        except Exception as e:
+            raise DockerExecutionError(f"Could not start the Lean REPL for session {session_id}: {str(e)}")
+
+        self.session_repls[session_id] = worker
+        return worker
+
+    def _close_session_repl(self, session_id: str, kill: bool = False) -> None:
+        """Stop a session's REPL, if it has one."""
+        worker = self.session_repls.pop(session_id, None)
+        if worker is not None:
+            worker.close(kill=kill)
+
+    async def _ensure_persistent_container(self, session_id: str) -> str:
+        """Return the container of a persistent session, creating it if the session is new."""
         container_id = self.persistent_containers.get(session_id)
 
         # Create a new container if it doesn't exist
@@ -730,7 +2200,8 @@ exit $exit_code
             should_disable_network = self.config.docker.network_disabled
 
             # Always create with network initially enabled, we can disable it after setup if needed
-            container = self.client.containers.run(
+            container = await self._run_blocking(
+                self.client.containers.run,
                 image=self.config.docker.image,
                 command=[
                     "sh",
@@ -742,6 +2213,7 @@ exit $exit_code
                 cpu_quota=int(self.config.docker.cpu_limit * 100000),
                 network_disabled=False,  # Initialize with network enabled for setup
                 read_only=False,  # Need to be writable for persistent sessions
+                volumes=self._container_volumes(),
                 detach=True,
                 labels={
                     "lean_docker_mcp.network_disabled": str(should_disable_network),
@@ -755,152 +2227,20 @@ exit $exit_code
             if should_disable_network:
                 try:
                     # Refresh the container object to get updated network info
-                    container = self.client.containers.get(container_id)
+                    container = await self._run_blocking(self.client.containers.get, container_id)
 
                     # Disconnect from all networks if network should be disabled
                     for network_name in container.attrs.get("NetworkSettings", {}).get("Networks", {}):
                         try:
-                            self.client.networks.get(network_name).disconnect(container)
+                            network = await self._run_blocking(self.client.networks.get, network_name)
+                            await self._run_blocking(network.disconnect, container)
                             logger.info(f"Disabled network {network_name} for container {container_id}")
                         except Exception as e:
                             logger.warning(f"Could not disable network {network_name}: {e}")
                 except Exception as e:
                     logger.warning(f"Could not apply network settings to container {container_id}: {e}")
 
-        # Execute the code in the container
-        try:
-            container = self.client.containers.get(container_id)
-
-            # Create a temporary file with the code
-            exec_id = os.urandom(8).hex()
-            script_filename = f"Script_{exec_id}.lean"
-            wrapper_filename = f"run_lean_{exec_id}.sh"
-
-            # Escape single quotes for shell command
-            safe_code = code.replace("'", "'\"'\"'")
-            
-            # Create the Lean file
-            cmd = f"echo '{safe_code}' > /home/leanuser/project/{script_filename}"
-            script_create_cmd = container.exec_run(
-                cmd=["sh", "-c", cmd],
-                user="leanuser",
-            )
-
-            if script_create_cmd.exit_code != 0:
-                raise DockerExecutionError(f"Failed to create script file: {script_create_cmd.output.decode('utf-8')}")
-
-            # Create a wrapper script to capture output
-            wrapper_script = f"""#!/bin/bash
-# Wrapper script to execute Lean and capture output streams
-
-echo "Running Lean in $(pwd)"
-echo "Lean version: $(lean --version)"
-echo "Content of Script:{script_filename}:"
-cat /home/leanuser/project/{script_filename}
-echo "---"
-
-# Decide whether the file defines a main function
-if grep -q 'def[[:space:]]\+main' /home/leanuser/project/{script_filename}; then
-    # Run Lean with -r to execute the main function
-    lean_output=$(lean -r /home/leanuser/project/{script_filename} 2>&1 | grep -v "warning: failed to query latest release")
-    exit_code=$?
-else
-    # Compile only – this will trigger evaluation of any `#eval` directives
-    lean_output=$(lean /home/leanuser/project/{script_filename} 2>&1 | grep -v "warning: failed to query latest release")
-    exit_code=$?
-fi
-
-# Write structured result with clear markers for parsing
-echo "---LEAN_OUTPUT_START---"
-echo "$lean_output"
-echo "---LEAN_OUTPUT_END---"
-echo "---LEAN_EXIT_CODE_START---"
-echo "$exit_code"
-echo "---LEAN_EXIT_CODE_END---"
-
-# Clean up the script file
-rm -f /home/leanuser/project/{script_filename}
-
-exit $exit_code
-"""
-            # Escape single quotes for shell command
-            safe_wrapper = wrapper_script.replace("'", "'\"'\"'")
-            cmd = f"echo '{safe_wrapper}' > /home/leanuser/project/{wrapper_filename} && chmod +x /home/leanuser/project/{wrapper_filename}"
-            
-            wrapper_create_cmd = container.exec_run(
-                cmd=["sh", "-c", cmd],
-                user="leanuser",
-            )
-
-            if wrapper_create_cmd.exit_code != 0:
-                raise DockerExecutionError(f"Failed to create wrapper script: {wrapper_create_cmd.output.decode('utf-8')}")
-
-            # Execute the wrapper script
-            exec_result = container.exec_run(
-                cmd=[f"/home/leanuser/project/{wrapper_filename}"],
-                workdir="/home/leanuser/project",
-                user="leanuser",
-            )
-
-            # Capture the output
-            output = exec_result.output.decode("utf-8")
-            exit_code = exec_result.exit_code
-
-            # Clean up the wrapper script
-            container.exec_run(
-                cmd=["rm", f"/home/leanuser/project/{wrapper_filename}"],
-                user="leanuser",
-            )
-            
-            # Parse the structured output
-            lean_output = ""
-            parsed_exit_code = exit_code  # Default to the exit code from exec_run
-            
-            # Extract the Lean output
-            output_start = output.find("---LEAN_OUTPUT_START---")
-            output_end = output.find("---LEAN_OUTPUT_END---")
-            if output_start >= 0 and output_end >= 0:
-                lean_output = output[output_start + len("---LEAN_OUTPUT_START---"):output_end].strip()
-            
-            # Extract the exit code from the output
-            exit_code_start = output.find("---LEAN_EXIT_CODE_START---")
-            exit_code_end = output.find("---LEAN_EXIT_CODE_END---")
-            if exit_code_start >= 0 and exit_code_end >= 0:
-                exit_code_str = output[exit_code_start + len("---LEAN_EXIT_CODE_START---"):exit_code_end].strip()
-                try:
-                    parsed_exit_code = int(exit_code_str)
-                except ValueError:
-                    parsed_exit_code = exit_code  # Fall back to the original exit code
-                    
-            # Check for Lean-specific errors and parse them if present
-            is_success = parsed_exit_code == 0 and "error:" not in lean_output.lower()
-            
-            result = {
-                "stdout": lean_output,
-                "exit_code": parsed_exit_code,
-                "status": "success" if is_success else "error",
-                "session_id": session_id,  # Include the session ID in the response
-            }
-            
-            # If there was an error, add more detailed error information
-            if not is_success:
-                lean_error = self.validator.parse_lean_error(lean_output)
-                if lean_error:
-                    result["error"] = lean_error.message
-                    result["error_info"] = lean_error.to_dict()
-                else:
-                    result["error"] = "Lean execution error" if parsed_exit_code != 0 else "Unknown error in Lean output"
-            
-            return result
-
-        except Exception as e:
-            if isinstance(e, NotFound):
-                # Container no longer exists, remove from tracked containers
-                if session_id in self.persistent_containers:
-                    del self.persistent_containers[session_id]
-                raise DockerExecutionError(f"Session {session_id} has expired or was deleted")
-            else:
-                raise DockerExecutionError(f"Error executing Lean code: {str(e)}")
+        return container_id
 
     async def cleanup_session(self, session_id: str) -> Dict[str, Any]:
         """Clean up a persistent session.
@@ -919,10 +2259,13 @@ exit $exit_code
         if not container_id:
             return {"status": "not_found", "message": f"No session found with ID {session_id}"}
 
+        self._close_session_repl(session_id)
+        self._session_locks.pop(session_id, None)
+
         try:
-            container = self.client.containers.get(container_id)
-            container.stop()
-            container.remove()
+            container = await self._run_blocking(self.client.containers.get, container_id)
+            await self._run_blocking(container.stop)
+            await self._run_blocking(container.remove)
             del self.persistent_containers[session_id]
             return {"status": "success", "message": f"Session {session_id} cleaned up successfully"}
         except NotFound:
@@ -941,7 +2284,7 @@ exit $exit_code
         
         for _ in range(max_polls):  # Poll 10 times per second
             try:
-                container_info = client.inspect_container(container_id)
+                container_info = await self._run_blocking(client.inspect_container, container_id)
                 if not container_info["State"]["Running"]:
                     return container_info["State"]["ExitCode"]
             except docker.errors.NotFound:
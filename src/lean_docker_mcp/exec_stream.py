@@ -0,0 +1,126 @@
+"""Low-level helpers for Docker execs that need stdin.
+
+The high-level ``Container.exec_run`` API in the Docker SDK cannot send data to the
+process's stdin, so these helpers drive the exec endpoints directly and read the
+multiplexed stdout/stderr stream from the hijacked socket.
+"""
+
+import logging
+import socket
+import struct
+import time
+from typing import Any, Callable, Dict, List, NamedTuple, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class ExecTimeoutError(Exception):
+    """Exception raised when an exec does not finish before its deadline."""
+
+    pass
+
+
+class ExecOutput(NamedTuple):
+    """Result of an exec with the combined stdout/stderr output."""
+
+    exit_code: Optional[int]
+    output: bytes
+
+
+def _raw_socket(sock: Any) -> Any:
+    """Return the underlying OS socket of a hijacked Docker API response."""
+    return getattr(sock, "_sock", sock)
+
+
+def _recv_exactly(raw: Any, size: int, deadline: Optional[float]) -> bytes:
+    """Read ``size`` bytes from the socket, or fewer if the stream ends first."""
+    chunks = []
+    while size > 0:
+        if deadline is not None:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise ExecTimeoutError("Timed out waiting for exec output")
+            raw.settimeout(remaining)
+        try:
+            chunk = raw.recv(size)
+        except socket.timeout as e:
+            raise ExecTimeoutError("Timed out waiting for exec output") from e
+        if not chunk:
+            break
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b"".join(chunks)
+
+
+def _read_output(raw: Any, deadline: Optional[float], on_output: Optional[Callable[[bytes], None]] = None) -> bytes:
+    """Collect the payloads of a multiplexed stdout/stderr stream until it ends."""
+    output = []
+    while True:
+        header = _recv_exactly(raw, 8, deadline)
+        if len(header) < 8:
+            break
+        _, length = struct.unpack(">BxxxL", header)
+        payload = _recv_exactly(raw, length, deadline)
+        output.append(payload)
+        if on_output is not None and payload:
+            on_output(payload)
+        if len(payload) < length:
+            break
+    return b"".join(output)
+
+
+def exec_with_stdin(
+    api: Any,
+    container_id: str,
+    cmd: List[str],
+    stdin_data: bytes,
+    user: str = "",
+    workdir: Optional[str] = None,
+    environment: Optional[Dict[str, str]] = None,
+    timeout: Optional[float] = None,
+    on_output: Optional[Callable[[bytes], None]] = None,
+) -> ExecOutput:
+    """Run a command in a container, feeding it ``stdin_data`` and collecting its output.
+
+    This is a blocking call; callers on the event loop should dispatch it to an executor.
+
+    Args:
+        api: The low-level Docker API client (``DockerClient.api``)
+        container_id: ID of the running container
+        cmd: Command to execute
+        stdin_data: Bytes written to the process's stdin before it is closed
+        user: User to run the command as
+        workdir: Working directory for the command
+        environment: Extra environment variables for the command
+        timeout: Seconds to wait for the command's output before raising ExecTimeoutError.
+            The process itself is not killed; callers enforce the limit inside the container.
+        on_output: Optional callback receiving each chunk of output as it arrives. It is
+            called from the thread running this function.
+
+    Returns:
+        An ExecOutput with the exit code and the combined stdout/stderr bytes
+    """
+    exec_id = api.exec_create(
+        container_id,
+        cmd,
+        stdin=True,
+        stdout=True,
+        stderr=True,
+        user=user,
+        workdir=workdir,
+        environment=environment,
+    )["Id"]
+
+    deadline = None if timeout is None else time.monotonic() + timeout
+    sock = api.exec_start(exec_id, socket=True)
+    raw = _raw_socket(sock)
+    try:
+        raw.sendall(stdin_data)
+        # Half-close so the process sees EOF on stdin while we keep reading its output
+        raw.shutdown(socket.SHUT_WR)
+        output = _read_output(raw, deadline, on_output)
+    finally:
+        sock.close()
+
+    exit_code = api.exec_inspect(exec_id).get("ExitCode")
+    return ExecOutput(exit_code=exit_code, output=output)
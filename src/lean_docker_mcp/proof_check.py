@@ -0,0 +1,152 @@
+"""Check-only execution: elaborate a file and report the axioms each theorem depends on.
+
+A checked file gets a ``#print axioms`` command appended for every theorem it declares.
+Lean answers each with an info message, which is turned into a per-theorem axiom list.
+The result is reduced to a compact verdict: ``proved`` when the file elaborates without
+errors and every theorem relies only on Lean's standard axioms, ``sorry`` when it elaborates
+but a proof is incomplete, ``nonstandard_axioms`` when a proof relies on any other axiom,
+``unchecked`` when the axioms of some theorem could not be established, and ``error`` otherwise.
+"""
+
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+from .diagnostics import summarize_diagnostics
+
+_THEOREM = re.compile(
+    r"^\s*(?:@\[[^\]]*\]\s*)?(?:(?:private|protected|noncomputable|nonrec)\s+)*(?:theorem|lemma)\s+([^\s:({\[⦃]+)"
+)
+# Start of any theorem declaration, including ones whose name ``_THEOREM`` cannot read
+_THEOREM_KEYWORD = re.compile(
+    r"^\s*(?:@\[[^\]]*\]\s*)?(?:(?:private|protected|noncomputable|nonrec)\s+)*(?:theorem|lemma)\b", re.M
+)
+_SCOPE_START = re.compile(r"^\s*(namespace|section)\b\s*(\S*)")
+_SCOPE_END = re.compile(r"^\s*end\b\s*(\S*)")
+_AXIOMS = re.compile(r"^'(.+)' depends on axioms: \[(.*)\]\s*$", re.S)
+_NO_AXIOMS = re.compile(r"^'(.+)' does not depend on any axioms\s*$")
+
+# Axioms a proof may depend on and still count as proved
+STANDARD_AXIOMS = frozenset({"propext", "Classical.choice", "Quot.sound"})
+
+# Fields of the underlying execution result carried over to the verdict
+_ERROR_FIELDS = ("error", "error_type", "error_info")
+_CACHE_FIELDS = ("cached", "coalesced")
+
+
+def declared_theorems(code: str) -> List[str]:
+    """Return the fully qualified names of the theorems declared in ``code``.
+
+    Namespaces opened with ``namespace`` are tracked line by line; sections don't affect names.
+
+    Args:
+        code: The Lean source
+
+    Returns:
+        Theorem names in declaration order
+    """
+    names = []
+    scopes: List[Tuple[str, str]] = []  # (kind, name) of the open namespaces and sections
+    for line in code.splitlines():
+        match = _THEOREM.match(line)
+        if match:
+            name = match.group(1)
+            if name.startswith("_root_."):
+                names.append(name[len("_root_."):])
+            else:
+                prefix = [scope_name for kind, scope_name in scopes if kind == "namespace"]
+                names.append(".".join(prefix + [name]))
+            continue
+        match = _SCOPE_START.match(line)
+        if match:
+            scopes.append((match.group(1), match.group(2)))
+            continue
+        match = _SCOPE_END.match(line)
+        if match and scopes:
+            scopes.pop()
+    return names
+
+
+def append_axiom_queries(code: str, theorems: List[str]) -> str:
+    """Append a ``#print axioms`` command for every theorem to the source."""
+    if not theorems:
+        return code
+    queries = "\n".join(f"#print axioms {name}" for name in theorems)
+    return f"{code.rstrip()}\n\n{queries}\n"
+
+
+def parse_axioms_message(message: str) -> Optional[Tuple[str, List[str]]]:
+    """Parse Lean's answer to ``#print axioms``.
+
+    Args:
+        message: The text of an info message
+
+    Returns:
+        A tuple of (theorem name, axioms it depends on), or None for any other message
+    """
+    match = _AXIOMS.match(message)
+    if match:
+        return match.group(1), [axiom.strip() for axiom in match.group(2).split(",") if axiom.strip()]
+    match = _NO_AXIOMS.match(message)
+    if match:
+        return match.group(1), []
+    return None
+
+
+def proof_verdict(result: Dict[str, Any], code: str, theorems: List[str]) -> Dict[str, Any]:
+    """Reduce the result of checking ``append_axiom_queries(code, theorems)`` to a verdict.
+
+    Args:
+        result: The execution result of the checked file
+        code: The source as submitted, without the appended queries
+        theorems: The theorems whose axioms were queried
+
+    Returns:
+        A dictionary with the status, verdict, per-theorem axioms and the diagnostics of the
+        submitted source
+    """
+    source_lines = code.rstrip().count("\n") + 1
+    axioms: Dict[str, List[str]] = {}
+    diagnostics = []
+    query_errors = 0
+    for diagnostic in result.get("diagnostics", []):
+        if diagnostic["line"] <= source_lines:
+            diagnostics.append(diagnostic)
+            continue
+        parsed = parse_axioms_message(diagnostic["message"]) if diagnostic["severity"] == "info" else None
+        if parsed is not None:
+            axioms[parsed[0]] = parsed[1]
+        elif diagnostic["severity"] == "error":
+            # A theorem that failed to elaborate has no axioms to print; its own error is reported
+            query_errors += 1
+
+    summary = summarize_diagnostics(diagnostics)
+    entries = [{"name": name, "axioms": axioms.get(name), "uses_sorry": "sorryAx" in axioms.get(name, [])} for name in theorems]
+
+    if summary["errors"] or "error_type" in result or (result.get("status") == "error" and not query_errors):
+        verdict = "error"
+    elif summary["sorries"] or any(entry["uses_sorry"] for entry in entries):
+        verdict = "sorry"
+    elif (
+        not entries
+        or len(_THEOREM_KEYWORD.findall(code)) > len(theorems)
+        or any(entry["axioms"] is None for entry in entries)
+    ):
+        # Nothing was proved, a declaration was not recognized or its axiom query failed
+        verdict = "unchecked"
+    elif any(not STANDARD_AXIOMS.issuperset(entry["axioms"]) for entry in entries):
+        verdict = "nonstandard_axioms"
+    else:
+        verdict = "proved"
+
+    checked = {
+        "status": "error" if verdict == "error" else "success",
+        "verdict": verdict,
+        "theorems": entries,
+        "diagnostics": diagnostics,
+        "diagnostic_summary": summary,
+    }
+    kept_fields = _ERROR_FIELDS + _CACHE_FIELDS if verdict == "error" else _CACHE_FIELDS
+    for field in kept_fields:
+        if field in result:
+            checked[field] = result[field]
+    return checked
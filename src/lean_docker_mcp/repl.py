@@ -0,0 +1,356 @@
+"""Long-lived Lean REPL workers running inside Docker containers.
+
+A worker starts the leanprover-community REPL (https://github.com/leanprover-community/repl)
+in a container and talks to it over the exec's stdin/stdout. Commands are JSON objects
+separated by blank lines and every response is a JSON object followed by a blank line.
+
+Imports such as ``Mathlib`` are elaborated once when the worker starts. The resulting
+environment is immutable, so every command that branches from it sees a clean copy of
+the preloaded environment and no declarations leak between requests.
+"""
+
+import json
+import logging
+import re
+import socket
+import struct
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from .diagnostics import make_diagnostic, render_diagnostic
+
+logger = logging.getLogger(__name__)
+
+# A hypothesis line of a goal: the names, then " :" and the type
+_HYPOTHESIS = re.compile(r"^(.*?) :\s(.*)$", re.S)
+
+# What the shell prints on stderr when the REPL binary doesn't exist
+_COMMAND_NOT_FOUND = re.compile(rb"not found|No such file or directory")
+
+# Docker multiplexed stream identifiers
+STDOUT_STREAM = 1
+STDERR_STREAM = 2
+
+
+class LeanReplError(Exception):
+    """Exception raised when the Lean REPL process fails or violates the protocol."""
+
+    pass
+
+
+class LeanReplTimeout(LeanReplError):
+    """Exception raised when the Lean REPL does not respond before the deadline."""
+
+    pass
+
+
+class LeanReplUnavailable(LeanReplError):
+    """Exception raised when the container has no Lean REPL binary to run."""
+
+    pass
+
+
+def split_imports(code: str) -> Tuple[List[str], str]:
+    """Split the import header from a Lean file.
+
+    Import lines are replaced by empty lines in the returned body so positions reported
+    by Lean for the body match the positions in the original file.
+
+    Args:
+        code: The Lean source code
+
+    Returns:
+        A tuple of (imported module names, body without import lines)
+    """
+    imports = []
+    lines = code.split("\n")
+    for index, line in enumerate(lines):
+        stripped = line.strip()
+        if stripped.startswith("import "):
+            imports.extend(stripped[len("import "):].split())
+            lines[index] = ""
+        elif stripped and not stripped.startswith("--"):
+            # Imports must precede everything else, so the header ends here
+            break
+    return imports, "\n".join(lines)
+
+
+def format_repl_messages(messages: List[Dict[str, Any]], file_name: str = "Script.lean", line_offset: int = 0) -> str:
+    """Render REPL messages the same way the ``lean`` command line prints them.
+
+    Args:
+        messages: The ``messages`` list from a REPL response
+        file_name: File name used in the position prefix
+        line_offset: Lines preceding the command in the file, added to reported line numbers
+
+    Returns:
+        The messages as text
+    """
+    rendered = [render_diagnostic(make_diagnostic(message, line_offset), file_name) for message in messages]
+    return "\n".join(rendered).strip()
+
+
+def parse_goal(goal: str) -> Dict[str, Any]:
+    """Split a goal as printed by Lean into its case name, hypotheses and target.
+
+    Lean prints one hypothesis per line, with variables of the same type grouped
+    (``a b : Nat``), and the target after ``⊢``. Lines that start with whitespace continue
+    the previous hypothesis or the target.
+
+    Args:
+        goal: The goal text, e.g. ``"case succ\nn : Nat\nh : 0 < n\n⊢ 0 < n + 1"``
+
+    Returns:
+        A dictionary with ``case`` (or None), ``hypotheses`` as a list of ``{"names", "type",
+        "value"}`` dictionaries (``value`` is only set for let-bound ones), ``target`` and the
+        original ``pretty`` text
+    """
+    case = None
+    entries: List[str] = []
+    target: Optional[str] = None
+    for line in goal.split("\n"):
+        if target is not None:
+            target += "\n" + line
+        elif line.startswith("⊢"):
+            target = line[1:].strip()
+        elif line.startswith("case ") and not entries:
+            case = line[len("case "):].strip()
+        elif line[:1].isspace() and entries:
+            entries[-1] += "\n" + line
+        elif line.strip():
+            entries.append(line)
+
+    hypotheses = []
+    for entry in entries:
+        match = _HYPOTHESIS.match(entry)
+        names, hypothesis_type = (match.group(1), match.group(2)) if match else ("", entry)
+        # let-bound hypotheses print their value after the type
+        hypothesis_type, separator, value = hypothesis_type.partition(" := ")
+        hypotheses.append({"names": names.split(), "type": hypothesis_type.strip(), "value": value.strip() if separator else None})
+    return {"case": case, "hypotheses": hypotheses, "target": (target or "").strip(), "pretty": goal}
+
+
+def proof_states(response: Dict[str, Any], line_offset: int = 0) -> List[Dict[str, Any]]:
+    """Return the proof states the REPL opened at each ``sorry`` of a command.
+
+    Args:
+        response: The decoded REPL response
+        line_offset: Lines preceding the command in the file, added to reported line numbers
+
+    Returns:
+        One dictionary per ``sorry`` with its ``proof_state`` id, goal and position
+    """
+    states = []
+    for entry in response.get("sorries", []):
+        pos = entry.get("pos") or {}
+        states.append({
+            "proof_state": entry.get("proofState"),
+            "goal": entry.get("goal", ""),
+            "line": pos.get("line", 0) + line_offset,
+            "column": pos.get("column", 0),
+        })
+    return states
+
+
+class LeanReplWorker:
+    """A Lean REPL process attached to a running container."""
+
+    def __init__(
+        self,
+        api: Any,
+        container_id: str,
+        command: str = "repl",
+        preload_imports: Optional[List[str]] = None,
+        user: str = "leanuser",
+        workdir: Optional[str] = None,
+        environment: Optional[Dict[str, str]] = None,
+    ):
+        """Initialize the worker. The process is started by :meth:`start`.
+
+        Args:
+            api: The low-level Docker API client (``DockerClient.api``)
+            container_id: ID of the container to run the REPL in
+            command: Shell command that launches the REPL binary
+            preload_imports: Modules to import once into the base environment
+            user: User to run the REPL as
+            workdir: Working directory for the REPL process
+            environment: Environment variables for the REPL process
+        """
+        self.api = api
+        self.container_id = container_id
+        self.command = command
+        self.preload_imports = list(preload_imports or [])
+        self.user = user
+        self.workdir = workdir
+        self.environment = environment
+
+        self.exec_id: Optional[str] = None
+        self.pid: Optional[int] = None
+        self.base_env: Optional[int] = None
+        self.commands_run = 0
+        self._sock: Any = None
+        self._raw: Any = None
+        self._buffer = b""
+        self._stderr = b""  # Tail of the process's stderr, to explain an early exit
+
+    @property
+    def alive(self) -> bool:
+        """Whether the REPL process has been started and not closed."""
+        return self._raw is not None
+
+    def start(self, timeout: Optional[float] = None) -> None:
+        """Start the REPL process and elaborate the preloaded imports.
+
+        This is a blocking call; callers on the event loop should dispatch it to an executor.
+
+        Args:
+            timeout: Seconds to wait for the REPL to start and load its imports
+        """
+        # Print the in-container PID first so the process can be killed later
+        self.exec_id = self.api.exec_create(
+            self.container_id,
+            ["bash", "-c", f"echo $$; exec {self.command}"],
+            stdin=True,
+            stdout=True,
+            stderr=True,
+            user=self.user,
+            workdir=self.workdir,
+            environment=self.environment,
+        )["Id"]
+        self._sock = self.api.exec_start(self.exec_id, socket=True)
+        self._raw = getattr(self._sock, "_sock", self._sock)
+
+        try:
+            self.pid = int(self._read_until(b"\n", timeout).strip())
+            if self.preload_imports:
+                header = "\n".join(f"import {module}" for module in self.preload_imports)
+                response = self.send({"cmd": header}, timeout=timeout)
+                errors = [m for m in response.get("messages", []) if m.get("severity") == "error"]
+                if errors or "env" not in response:
+                    raise LeanReplError(f"Failed to preload imports {self.preload_imports}: {format_repl_messages(errors) or response}")
+                self.base_env = response["env"]
+        except Exception:
+            self.close(kill=True)
+            raise
+        logger.debug(f"Started Lean REPL in container {self.container_id[:12]} (pid {self.pid}, base env {self.base_env})")
+
+    def send(self, request: Dict[str, Any], timeout: Optional[float] = None) -> Dict[str, Any]:
+        """Send one command to the REPL and wait for its response.
+
+        Args:
+            request: The REPL command object, e.g. ``{"cmd": "...", "env": 0}``
+            timeout: Seconds to wait for the response
+
+        Returns:
+            The decoded response object
+        """
+        if not self.alive:
+            raise LeanReplError("Lean REPL is not running")
+        try:
+            self._raw.sendall(json.dumps(request).encode("utf-8") + b"\n\n")
+            payload = self._read_until(b"\n\n", timeout)
+        except (OSError, socket.timeout) as e:
+            # The process may have exited before reading the request; its stderr says why
+            self._drain_stderr()
+            if _COMMAND_NOT_FOUND.search(self._stderr):
+                raise self._unavailable() from e
+            raise LeanReplError(f"Lean REPL communication failed: {e}") from e
+        self.commands_run += 1
+        try:
+            return json.loads(payload)
+        except json.JSONDecodeError as e:
+            raise LeanReplError(f"Invalid response from Lean REPL: {payload[:200]!r}") from e
+
+    def run_command(self, code: str, timeout: Optional[float] = None) -> Dict[str, Any]:
+        """Elaborate Lean code, branching from the preloaded environment when possible.
+
+        Args:
+            code: The Lean source code
+            timeout: Seconds to wait for the response
+
+        Returns:
+            The decoded REPL response
+        """
+        imports, body = split_imports(code)
+        if self.base_env is not None and set(imports) <= set(self.preload_imports):
+            return self.send({"cmd": body, "env": self.base_env}, timeout=timeout)
+        # Imports that are not preloaded need a fresh environment
+        return self.send({"cmd": code}, timeout=timeout)
+
+    def close(self, kill: bool = False) -> None:
+        """Close the connection to the REPL.
+
+        Closing stdin makes the REPL exit once the current command finishes. With
+        ``kill`` the process is terminated immediately.
+
+        Args:
+            kill: Whether to SIGKILL the REPL process
+        """
+        if kill and self.pid:
+            try:
+                kill_exec = self.api.exec_create(self.container_id, ["kill", "-9", str(self.pid)], user=self.user)
+                self.api.exec_start(kill_exec["Id"])
+            except Exception as e:
+                logger.debug(f"Error killing Lean REPL in container {self.container_id[:12]}: {e}")
+        if self._sock is not None:
+            try:
+                self._sock.close()
+            except Exception:
+                pass
+        self._sock = None
+        self._raw = None
+        self._buffer = b""
+
+    def _read_until(self, delimiter: bytes, timeout: Optional[float]) -> bytes:
+        """Read stdout until ``delimiter`` and return the data before it."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while delimiter not in self._buffer:
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                raise LeanReplTimeout(f"Timed out after {timeout}s waiting for the Lean REPL")
+            stream, data = self._read_frame(remaining)
+            if stream == STDERR_STREAM:
+                logger.debug(f"Lean REPL stderr: {data.decode('utf-8', errors='replace').rstrip()}")
+                self._stderr = (self._stderr + data)[-4096:]
+            else:
+                self._buffer += data
+        payload, self._buffer = self._buffer.split(delimiter, 1)
+        return payload
+
+    def _drain_stderr(self) -> None:
+        """Collect what is left of the stream after the process stopped taking input."""
+        try:
+            while True:
+                stream, data = self._read_frame(0.5)
+                if stream == STDERR_STREAM:
+                    self._stderr = (self._stderr + data)[-4096:]
+        except (LeanReplError, OSError):
+            pass
+
+    def _unavailable(self) -> LeanReplUnavailable:
+        """Return the error for a REPL command the shell could not find."""
+        stderr = self._stderr.decode("utf-8", errors="replace").strip()
+        return LeanReplUnavailable(f"Lean REPL command could not be run: {stderr}")
+
+    def _read_frame(self, timeout: Optional[float]) -> Tuple[int, bytes]:
+        """Read one frame of the multiplexed exec stream."""
+        header = self._recv_exactly(8, timeout)
+        stream, length = struct.unpack(">BxxxL", header)
+        return stream, self._recv_exactly(length, timeout)
+
+    def _recv_exactly(self, size: int, timeout: Optional[float]) -> bytes:
+        """Read exactly ``size`` bytes from the exec socket."""
+        self._raw.settimeout(timeout)
+        chunks = []
+        while size > 0:
+            try:
+                chunk = self._raw.recv(size)
+            except socket.timeout as e:
+                raise LeanReplTimeout(f"Timed out after {timeout}s waiting for the Lean REPL") from e
+            if not chunk:
+                if _COMMAND_NOT_FOUND.search(self._stderr):
+                    raise self._unavailable()
+                raise LeanReplError("Lean REPL process exited")
+            chunks.append(chunk)
+            size -= len(chunk)
+        return b"".join(chunks)
@@ -0,0 +1,196 @@
+#!/bin/bash
+# Lean runner installed in the image as /usr/local/bin/run_lean.sh.
+#
+# Usage: run_lean.sh [FILE]
+#        run_lean.sh --exec COMMAND [ARGS...]
+#        run_lean.sh --version
+#
+# Without FILE the Lean source is read from stdin and written to a private scratch
+# directory that is removed, together with every process Lean left behind, when the
+# script exits. With FILE, Lean runs on that file from the file's directory.
+#
+# Lean's output is written between ---LEAN_OUTPUT_START--- and ---LEAN_OUTPUT_END---
+# as it is produced, so it can be followed while a long-running program is still
+# executing. Lean runs with --json, so every message is a JSON object on its own line
+# and only a program's own output is plain text. Lean's exit code follows between
+# ---LEAN_EXIT_CODE_START--- and ---LEAN_EXIT_CODE_END---.
+#
+# LEAN_TIMEOUT (seconds, default 30) bounds the run; exit code 124 or 137 means Lean was
+# stopped by the timeout. With LEAN_CHECK_ONLY=1 the file is only elaborated, even if it
+# defines main. With LEAN_NATIVE_KEY set, main runs as the native executable
+# $LEAN_NATIVE_CACHE/$LEAN_NATIVE_KEY instead of being interpreted. If the cache has no such
+# executable yet, it is compiled in the scratch directory and run from there. The cache is
+# mounted read-only: the server copies new executables into it from a container that never
+# runs submitted code.
+#
+# LEAN_PACKAGES names the mount point of a built lake workspace shared by all
+# containers, such as a Mathlib project. The build directories of the workspace and of
+# every package it depends on are added to LEAN_PATH, so imports load the shared oleans.
+# LEAN_PROJECT, set by the Mathlib image variant, is a built lake workspace that Lean
+# runs in through `lake env`, so its dependencies resolve to their prebuilt oleans.
+# --exec runs COMMAND (the Lean REPL) with the same search path as Lean.
+#
+# LEAN_PREAMBLES is the directory of registered preambles for the current image; its lib
+# directory, holding Preamble/<Name>.olean, is added to LEAN_PATH. With
+# LEAN_PREAMBLE_MODULE=<Name> and LEAN_PREAMBLE_KEY set, the file is not run but compiled
+# to the module Preamble.<Name>, unless objects/<key> already holds its olean. Like the
+# native cache, the preamble directory is mounted read-only and the server stores the
+# olean and links it into lib.
+#
+# A newly built executable or olean is read before anything else can run in the scratch
+# directory and written base64-encoded between ---LEAN_BUILD_OUTPUT_START--- and
+# ---LEAN_BUILD_OUTPUT_END---, after the exit code, so the server never picks it up from a
+# directory that another execution in the container could write to.
+#
+# RUNNER_VERSION must match RUNNER_VERSION in docker_manager.py and the
+# lean_docker_mcp.runner_version label in the Dockerfile.
+RUNNER_VERSION=11
+
+if [ "$1" = "--version" ]; then
+    echo "$RUNNER_VERSION"
+    exit 0
+fi
+
+# Put the oleans of the shared package workspace on the search path
+if [ -n "$LEAN_PACKAGES" ] && [ -d "$LEAN_PACKAGES" ]; then
+    for package in "$LEAN_PACKAGES" "$LEAN_PACKAGES"/.lake/packages/*; do
+        # Newer Lake versions build oleans into .lake/build/lib/lean, older ones into .lake/build/lib
+        for lib in "$package/.lake/build/lib/lean" "$package/.lake/build/lib"; do
+            if [ -d "$lib" ]; then
+                LEAN_PATH="${LEAN_PATH:+$LEAN_PATH:}$lib"
+                break
+            fi
+        done
+    done
+    export LEAN_PATH
+fi
+
+# Put the registered preambles on the search path
+if [ -n "$LEAN_PREAMBLES" ]; then
+    export LEAN_PATH="$LEAN_PREAMBLES/lib${LEAN_PATH:+:$LEAN_PATH}"
+fi
+
+# Run Lean and the REPL in the image's lake workspace, if it has one
+lake_env=()
+if [ -n "$LEAN_PROJECT" ] && [ -d "$LEAN_PROJECT" ]; then
+    lake_env=(lake -d "$LEAN_PROJECT" env)
+fi
+
+if [ "$1" = "--exec" ]; then
+    shift
+    # Take the search path from lake and exec COMMAND directly, so it keeps this PID
+    if [ ${#lake_env[@]} -gt 0 ]; then
+        LEAN_PATH=$("${lake_env[@]}" printenv LEAN_PATH)
+        export LEAN_PATH
+    fi
+    exec "$@"
+fi
+
+workdir=$(mktemp -d /tmp/lean_XXXXXXXX) || exit 1
+cleanup() {
+    # Kill everything this user started except the entry points of docker execs (parent PID
+    # 0), i.e. the container's REPL, and this runner and its ancestors. Processes started by
+    # Lean may have left the runner's process tree, so killing its children is not enough.
+    local keep=" $$ " pid=$$ victims
+    while [ "$pid" -gt 1 ] 2>/dev/null; do
+        pid=$(ps -o ppid= -p "$pid" | tr -d ' ')
+        keep="$keep$pid "
+    done
+    for _ in 1 2 3; do
+        victims=$(ps -o pid=,ppid= -u "$(id -u)" | awk -v keep="$keep" '$2 != 0 && index(keep, " " $1 " ") == 0 {print $1}')
+        [ -z "$victims" ] && break
+        kill -9 $victims 2>/dev/null
+    done
+    cd /
+    rm -rf "$workdir" /tmp/lean-build
+}
+trap cleanup EXIT
+
+if [ -n "$1" ]; then
+    cd "$(dirname "$1")" || exit 1
+    script=$(basename "$1")
+else
+    cat > "$workdir/Script.lean"
+    cd "$workdir" || exit 1
+    script=Script.lean
+fi
+
+# A new executable or olean for the server to store, base64-encoded
+build_output=""
+
+# Seconds left of LEAN_TIMEOUT, for runs made of several steps
+remaining() {
+    local left=$(( ${LEAN_TIMEOUT:-30} - SECONDS ))
+    echo $(( left > 1 ? left : 1 ))
+}
+
+# Compile the file to a native executable unless the cache already has one, then run it
+run_native() {
+    local binary="${LEAN_NATIVE_CACHE:-/home/leanuser/.cache/lean-native}/$LEAN_NATIVE_KEY"
+    exit_code=0
+    if [ ! -x "$binary" ]; then
+        binary="$workdir/Main"
+        timeout -k 2 "$(remaining)" "${lake_env[@]}" lean --json -c "$workdir/Script.c" "$script" 2>&1 | grep --line-buffered -v "warning: failed to query latest release"
+        exit_code=${PIPESTATUS[0]}
+        if [ "$exit_code" -eq 0 ]; then
+            timeout -k 2 "$(remaining)" "${lake_env[@]}" leanc -O3 -o "$binary" "$workdir/Script.c" 2>&1
+            exit_code=$?
+        fi
+        if [ "$exit_code" -eq 0 ]; then
+            # Read the executable before it runs, so the program can't replace what gets cached
+            build_output=$(base64 -w 0 "$binary")
+        fi
+    fi
+    if [ "$exit_code" -eq 0 ]; then
+        timeout -k 2 "$(remaining)" "$binary" 2>&1
+        exit_code=$?
+    fi
+}
+
+# Compile the file to Preamble.$LEAN_PREAMBLE_MODULE unless that key was compiled before,
+# keeping the olean for the server to store
+compile_preamble() {
+    local olean="$LEAN_PREAMBLES/objects/$LEAN_PREAMBLE_KEY/Preamble/$LEAN_PREAMBLE_MODULE.olean"
+    exit_code=0
+    if [ ! -f "$olean" ]; then
+        # Lean derives the module name from the path below the working directory
+        mkdir -p "$workdir/Preamble"
+        cp "$script" "$workdir/Preamble/$LEAN_PREAMBLE_MODULE.lean"
+        (cd "$workdir" && timeout -k 2 "${LEAN_TIMEOUT:-30}" "${lake_env[@]}" lean --json -o "$workdir/Preamble.olean" "Preamble/$LEAN_PREAMBLE_MODULE.lean") 2>&1 | grep --line-buffered -v "warning: failed to query latest release"
+        exit_code=${PIPESTATUS[0]}
+        if [ "$exit_code" -eq 0 ]; then
+            build_output=$(base64 -w 0 "$workdir/Preamble.olean")
+        fi
+    fi
+}
+
+echo "---LEAN_OUTPUT_START---"
+
+# Decide whether to run the file's main function
+if [ -n "$LEAN_PREAMBLE_MODULE" ]; then
+    compile_preamble
+elif [ "${LEAN_CHECK_ONLY:-0}" != "1" ] && grep -q 'def[[:space:]]\+main' "$script"; then
+    if [ -n "$LEAN_NATIVE_KEY" ]; then
+        run_native
+    else
+        # Run Lean with -r to execute the main function
+        timeout -k 2 "${LEAN_TIMEOUT:-30}" "${lake_env[@]}" lean --json -r "$script" 2>&1 | grep --line-buffered -v "warning: failed to query latest release"
+        exit_code=${PIPESTATUS[0]}
+    fi
+else
+    # Compile only – this will trigger evaluation of any `#eval` directives
+    timeout -k 2 "${LEAN_TIMEOUT:-30}" "${lake_env[@]}" lean --json "$script" 2>&1 | grep --line-buffered -v "warning: failed to query latest release"
+    exit_code=${PIPESTATUS[0]}
+fi
+
+# Write structured result with clear markers for parsing
+echo "---LEAN_OUTPUT_END---"
+echo "---LEAN_EXIT_CODE_START---"
+echo "$exit_code"
+echo "---LEAN_EXIT_CODE_END---"
+if [ -n "$build_output" ]; then
+    echo "---LEAN_BUILD_OUTPUT_START---"
+    echo "$build_output"
+    echo "---LEAN_BUILD_OUTPUT_END---"
+fi
+exit $exit_code
@@ -6,7 +6,7 @@ import logging
 import os
 import sys
 import uuid
-from typing import Any, Dict, List, Optional, cast
+from typing import Any, Awaitable, Callable, Dict, List, Optional, cast
 
 import mcp.server.stdio
 import mcp.types as types
@@ -82,6 +82,22 @@ async def handle_list_tools() -> list[types.Tool]:
                 "type": "object",
                 "properties": {
                     "code": {"type": "string", "description": "Lean4 code to execute"},
+                    "stream": {
+                        "type": "boolean",
+                        "description": "Send each line of Lean output as a log notification while the code runs",
+                    },
+                    "stop_on_error": {
+                        "type": "boolean",
+                        "description": "When streaming, stop at the first error instead of waiting for Lean to finish",
+                    },
+                    "mode": {
+                        "type": "string",
+                        "enum": ["run", "check"],
+                        "description": (
+                            "'run' (default) compiles the code and runs main if it is defined; 'check' only "
+                            "elaborates it and returns a JSON verdict with the axioms each theorem depends on"
+                        ),
+                    },
                 },
                 "required": ["code"],
             },
@@ -98,6 +114,99 @@ async def handle_list_tools() -> list[types.Tool]:
                 "required": ["code"],
             },
         ),
+        types.Tool(
+            name="execute-lean-repl",
+            description=(
+                "Run Lean4 commands in a session's Lean REPL. Returns JSON with an env id for the "
+                "resulting environment and a proof_state id for every sorry; pass an earlier env id "
+                "to branch from that point without elaborating it again"
+            ),
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "code": {"type": "string", "description": "Lean4 commands to elaborate"},
+                    "session_id": {"type": "string", "description": "Session identifier"},
+                    "env": {
+                        "type": "integer",
+                        "description": "Environment id returned by an earlier command of this session to continue from",
+                    },
+                },
+                "required": ["code"],
+            },
+        ),
+        types.Tool(
+            name="execute-lean-tactic",
+            description=(
+                "Apply one tactic to a proof state of an execute-lean-repl session and return the new "
+                "proof_state id and the remaining goals as JSON (hypotheses and target per goal)"
+            ),
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "session_id": {"type": "string", "description": "Session identifier"},
+                    "proof_state": {"type": "integer", "description": "Proof state id to apply the tactic to"},
+                    "tactic": {"type": "string", "description": "The tactic, e.g. intro n"},
+                },
+                "required": ["session_id", "proof_state", "tactic"],
+            },
+        ),
+        types.Tool(
+            name="execute-lean-batch",
+            description=(
+                "Execute many independent Lean4 snippets in parallel across the container pool "
+                "and return a JSON array with one result per snippet"
+            ),
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "codes": {
+                        "type": "array",
+                        "items": {"type": "string"},
+                        "description": "Lean4 snippets to execute",
+                    },
+                    "header": {
+                        "type": "string",
+                        "description": (
+                            "Preamble shared by every snippet (imports, open lines, theorem statement). "
+                            "Each snippet is checked as header followed by the snippet, elaborating the header once where possible"
+                        ),
+                    },
+                    "max_parallel": {
+                        "type": "integer",
+                        "description": "Maximum snippets executing at once (defaults to the pool size)",
+                    },
+                    "stream": {
+                        "type": "boolean",
+                        "description": "Also send each result as a log notification as soon as it completes",
+                    },
+                },
+                "required": ["codes"],
+            },
+        ),
+        types.Tool(
+            name="register-preamble",
+            description=(
+                "Compile a shared preamble (imports, helper definitions and lemmas) once into the module "
+                "Preamble.<name>, so later code can import it instead of repeating it. "
+                "open and set_option lines do not carry over through an import"
+            ),
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "name": {"type": "string", "description": "Preamble name, a Lean identifier such as Common"},
+                    "code": {"type": "string", "description": "Lean4 source of the preamble"},
+                },
+                "required": ["name", "code"],
+            },
+        ),
+        types.Tool(
+            name="get-stats",
+            description="Report result cache hit/miss counters and container pool occupancy",
+            inputSchema={
+                "type": "object",
+                "properties": {},
+            },
+        ),
         types.Tool(
             name="cleanup-session",
             description="Clean up a persistent session and its resources",
@@ -117,6 +226,9 @@ async def handle_call_tool(name: str, arguments: dict | None) -> list[types.Text
     """Handle tool execution requests for Lean4 code execution."""
     logger.info(f"Calling tool: {name}")
 
+    if name == "get-stats":
+        return [types.TextContent(type="text", text=json.dumps(docker_manager.get_stats(), indent=2))]
+
     if not arguments:
         raise ValueError("Missing arguments")
 
@@ -126,14 +238,51 @@ async def handle_call_tool(name: str, arguments: dict | None) -> list[types.Text
 
             if not code:
                 raise ValueError("Missing code")
-
-            result = await docker_manager.execute_transient(code)
+            mode = arguments.get("mode", "run")
+            if mode not in ("run", "check"):
+                raise ValueError(f"Unknown mode: {mode}")
+
+            on_output = _output_streamer() if arguments.get("stream") else None
+            result = await docker_manager.execute_transient(
+                code,
+                on_output=on_output,
+                stop_on_error=bool(arguments.get("stop_on_error")),
+                check_only=mode == "check",
+            )
+            if mode == "check":
+                return [types.TextContent(type="text", text=json.dumps(result, indent=2))]
 
             # Format text result
             formatted_text = _format_execution_result(result)
 
             return [types.TextContent(type="text", text=formatted_text)]
 
+        elif name == "execute-lean-batch":
+            codes = arguments.get("codes")
+            header = arguments.get("header")
+
+            if not isinstance(codes, list) or not codes:
+                raise ValueError("Missing codes")
+            if not all(isinstance(code, str) for code in codes):
+                raise ValueError("Every item in codes must be a string")
+            if header is not None and not isinstance(header, str):
+                raise ValueError("Header must be a string")
+            max_items = config.docker.batch_max_items
+            if len(codes) > max_items:
+                raise ValueError(f"Batch of {len(codes)} snippets exceeds the limit of {max_items}")
+
+            on_result = _batch_progress_reporter(len(codes), bool(arguments.get("stream")))
+            results = await docker_manager.execute_batch(
+                codes,
+                max_parallel=arguments.get("max_parallel"),
+                on_result=on_result,
+                header=header,
+            )
+
+            succeeded = sum(1 for result in results if result.get("status") == "success")
+            summary = {"total": len(results), "succeeded": succeeded, "failed": len(results) - succeeded}
+            return [types.TextContent(type="text", text=json.dumps({"summary": summary, "results": results}, indent=2))]
+
         elif name == "execute-lean-persistent":
             code = arguments.get("code")
             session_id = arguments.get("session_id")
@@ -153,6 +302,50 @@ async def handle_call_tool(name: str, arguments: dict | None) -> list[types.Text
 
             return [types.TextContent(type="text", text=formatted_text)]
 
+        elif name == "execute-lean-repl":
+            code = arguments.get("code")
+            session_id = arguments.get("session_id")
+            env = arguments.get("env")
+
+            if not code:
+                raise ValueError("Missing code")
+            if env is not None and (not isinstance(env, int) or isinstance(env, bool)):
+                raise ValueError("env must be an integer")
+
+            if not session_id:
+                session_id = str(uuid.uuid4())
+                sessions[session_id] = {"created_at": asyncio.get_event_loop().time()}
+
+            result = await docker_manager.execute_repl_command(session_id, code, env=env)
+            return [types.TextContent(type="text", text=json.dumps(result, indent=2))]
+
+        elif name == "execute-lean-tactic":
+            session_id = arguments.get("session_id")
+            proof_state = arguments.get("proof_state")
+            tactic = arguments.get("tactic")
+
+            if not session_id:
+                raise ValueError("Missing session ID")
+            if not isinstance(proof_state, int) or isinstance(proof_state, bool):
+                raise ValueError("proof_state must be an integer")
+            if not tactic:
+                raise ValueError("Missing tactic")
+
+            result = await docker_manager.execute_tactic(session_id, proof_state, tactic)
+            return [types.TextContent(type="text", text=json.dumps(result, indent=2))]
+
+        elif name == "register-preamble":
+            preamble_name = arguments.get("name")
+            code = arguments.get("code")
+
+            if not preamble_name or not isinstance(preamble_name, str):
+                raise ValueError("Missing preamble name")
+            if not code:
+                raise ValueError("Missing code")
+
+            result = await docker_manager.register_preamble(preamble_name, code)
+            return [types.TextContent(type="text", text=json.dumps(result, indent=2))]
+
         elif name == "cleanup-session":
             session_id = arguments.get("session_id")
 
@@ -183,6 +376,75 @@ async def handle_call_tool(name: str, arguments: dict | None) -> list[types.Text
         return [types.TextContent(type="text", text=error_message)]
 
 
+def _current_request_context() -> Optional[Any]:
+    """Return the context of the tool call being handled, or None outside a request."""
+    try:
+        return server.request_context
+    except LookupError:
+        return None
+
+
+def _output_streamer() -> Optional[Callable[[str], Awaitable[None]]]:
+    """Build the callback that forwards Lean output lines to the client while code runs.
+
+    Each line is sent as a log notification; when the client supplied a progress token
+    a progress notification counting the lines is sent as well.
+
+    Returns:
+        A coroutine function for DockerManager.execute_transient, or None outside a request
+    """
+    ctx = _current_request_context()
+    if ctx is None:
+        return None
+
+    progress_token = ctx.meta.progressToken if ctx.meta is not None else None
+    lines = 0
+
+    async def forward(line: str) -> None:
+        nonlocal lines
+        lines += 1
+        level = "error" if ": error" in line else "warning" if ": warning" in line else "info"
+        await ctx.session.send_log_message(level=level, data=line, logger="lean-docker-mcp.output")
+        if progress_token is not None:
+            await ctx.session.send_progress_notification(progress_token, lines)
+
+    return forward
+
+
+def _batch_progress_reporter(total: int, stream: bool) -> Optional[Callable[[int, Dict[str, Any]], Awaitable[None]]]:
+    """Build the per-item callback that reports batch progress to the client.
+
+    Progress notifications are sent when the client supplied a progress token; with
+    ``stream`` each completed result is also sent as a log notification.
+
+    Args:
+        total: Number of items in the batch
+        stream: Whether to send every result as it completes
+
+    Returns:
+        A coroutine function for DockerManager.execute_batch, or None if there is nothing to report
+    """
+    ctx = _current_request_context()
+    if ctx is None:
+        return None
+
+    progress_token = ctx.meta.progressToken if ctx.meta is not None else None
+    if progress_token is None and not stream:
+        return None
+
+    completed = 0
+
+    async def report(index: int, result: Dict[str, Any]) -> None:
+        nonlocal completed
+        completed += 1
+        if progress_token is not None:
+            await ctx.session.send_progress_notification(progress_token, completed, total)
+        if stream:
+            await ctx.session.send_log_message(level="info", data={"index": index, "result": result}, logger="lean-docker-mcp.batch")
+
+    return report
+
+
 def _format_execution_result(result: Dict[str, Any], session_id: Optional[str] = None) -> str:
     """Format execution result for display."""
     # Extract relevant information from the result
@@ -195,12 +457,16 @@ def _format_execution_result(result: Dict[str, Any], session_id: Optional[str] =
     session_text = f"Session ID: {session_id}\n\n" if session_id else ""
     status_text = f"Status: {status}\n"
     exit_code_text = f"Exit Code: {exit_code}\n\n" if exit_code is not None else ""
+    summary = result.get("diagnostic_summary")
+    diagnostics_text = (
+        f"Diagnostics: {summary['errors']} errors, {summary['warnings']} warnings, {summary['sorries']} sorries\n\n" if summary else ""
+    )
     
     output_text = f"Output:\n{stdout}" if stdout else "No output"
     
     error_text = f"\n\nError: {error}" if error else ""
     
-    return f"{session_text}{status_text}{exit_code_text}{output_text}{error_text}"
+    return f"{session_text}{status_text}{exit_code_text}{diagnostics_text}{output_text}{error_text}"
 
 
 async def main() -> None:
@@ -258,6 +524,7 @@ async def main() -> None:
                 logger.error(f"Error cleaning up session {session_id}: {e}")
         
         # Don't attempt pool cleanup for now
+        docker_manager.shutdown()
         logger.info("Server shutdown complete")
 
 
@@ -0,0 +1,62 @@
+"""Tests for the container pool autoscaler."""
+
+from lean_docker_mcp.autoscaler import PoolAutoscaler, parse_memory_limit
+
+MB = 1024 * 1024
+
+
+class TestParseMemoryLimit:
+    """Tests for parse_memory_limit."""
+
+    def test_docker_suffixes(self):
+        """Test the unit suffixes Docker accepts."""
+        assert parse_memory_limit("256m") == 256 * MB
+        assert parse_memory_limit("1g") == 1024 * MB
+        assert parse_memory_limit("512k") == 512 * 1024
+        assert parse_memory_limit(1024) == 1024
+        assert parse_memory_limit("lots") is None
+
+
+class TestPoolAutoscaler:
+    """Tests for PoolAutoscaler."""
+
+    def _loaded(self, rate: float, service_time: float, wait: float = 0.0) -> PoolAutoscaler:
+        """Create an autoscaler that observed ``rate`` requests per second for ten seconds."""
+        autoscaler = PoolAutoscaler(min_size=2, max_size=64, smoothing=1.0)
+        autoscaler.target_size(8, now=0.0)
+        for _ in range(int(rate * 10)):
+            autoscaler.record_arrival()
+            autoscaler.record_acquire(wait)
+            autoscaler.record_release(service_time)
+        return autoscaler
+
+    def test_sizes_pool_from_arrival_rate_and_hold_time(self):
+        """Test that the target follows Little's law with headroom."""
+        autoscaler = self._loaded(rate=4, service_time=5)
+        # 4 requests/s held for 5s keep 20 containers busy, plus 25% headroom
+        assert autoscaler.target_size(30, now=10.0) == 27
+        assert autoscaler.target_size(25, now=20.0) == 23  # idle interval: shrink a step at a time
+
+    def test_grows_when_requests_wait(self):
+        """Test that waiting for containers grows the pool beyond the Little's law estimate."""
+        autoscaler = self._loaded(rate=1, service_time=1, wait=2.0)
+        assert autoscaler.target_size(8, now=10.0) == 10
+
+    def test_bounds_and_idle_shrink(self):
+        """Test that an idle pool shrinks gradually down to the minimum."""
+        autoscaler = PoolAutoscaler(min_size=2, max_size=64)
+        size = 20
+        for second in range(100):
+            size = autoscaler.target_size(size, now=float(second))
+        assert size == 2
+        assert autoscaler.clamp(100) == 64
+
+    def test_growth_limited_by_available_memory(self):
+        """Test that growth stops when the host would run short of memory."""
+        autoscaler = self._loaded(rate=4, service_time=5)
+        autoscaler.container_memory_bytes = 256 * MB
+        autoscaler.min_free_memory_bytes = 512 * MB
+        # Room for four more containers
+        assert autoscaler.target_size(8, now=10.0, available_memory=1536 * MB) == 12
+        # Already below the free memory floor
+        assert autoscaler.target_size(12, now=20.0, available_memory=256 * MB) == 11
@@ -0,0 +1,104 @@
+"""Tests for the execution result cache."""
+
+from lean_docker_mcp.cache import DISK_PRUNE_INTERVAL, ResultCache, is_cacheable, is_deterministic, make_cache_key
+
+LIMITS = {"memory_limit": "256m", "cpu_limit": 0.5, "timeout": 30}
+
+
+class TestCacheKey:
+    """Tests for make_cache_key."""
+
+    def test_key_depends_on_all_inputs(self):
+        """Test that code, image, Lean version and limits all change the key."""
+        base = make_cache_key("#eval 1", "sha256:a", "4.0.0", LIMITS)
+        assert base == make_cache_key("#eval 1", "sha256:a", "4.0.0", dict(LIMITS))
+        assert base != make_cache_key("#eval 2", "sha256:a", "4.0.0", LIMITS)
+        assert base != make_cache_key("#eval 1", "sha256:b", "4.0.0", LIMITS)
+        assert base != make_cache_key("#eval 1", "sha256:a", "4.1.0", LIMITS)
+        assert base != make_cache_key("#eval 1", "sha256:a", "4.0.0", {**LIMITS, "timeout": 60})
+
+    def test_only_lean_outcomes_are_cacheable(self):
+        """Test that environment failures are not cached."""
+        assert is_cacheable({"stdout": "2", "exit_code": 0, "status": "success"})
+        assert is_cacheable({"stdout": "error", "exit_code": 1, "status": "error", "error_info": {}})
+        assert not is_cacheable({"stdout": "", "error_type": "docker_unavailable", "status": "error"})
+
+
+    def test_io_during_elaboration_is_not_deterministic(self):
+        """Test that programs and #eval commands are excluded from caching."""
+        assert is_deterministic("theorem t : 1 = 1 := rfl")
+        assert is_deterministic("#check Nat.add_comm")
+        assert not is_deterministic("#eval IO.rand 0 100")
+        assert not is_deterministic("open IO in\n#eval! monoMsNow")
+        assert not is_deterministic("run_cmd Lean.logInfo \"hi\"")
+        assert not is_deterministic("def main : IO Unit := pure ()")
+        assert is_deterministic("def main : IO Unit := pure ()", check_only=True)
+
+
+class TestResultCache:
+    """Tests for ResultCache."""
+
+    def test_lru_eviction_and_counters(self):
+        """Test that the memory tier evicts the least recently used entry."""
+        cache = ResultCache(max_entries=2)
+        cache.put("a", {"stdout": "a"})
+        cache.put("b", {"stdout": "b"})
+        assert cache.get("a") == {"stdout": "a"}
+        cache.put("c", {"stdout": "c"})
+
+        assert cache.get("b") is None
+        assert cache.get("c") == {"stdout": "c"}
+
+        stats = cache.stats()
+        assert stats["hits"] == 2
+        assert stats["misses"] == 1
+        assert stats["evictions"] == 1
+        assert stats["memory_entries"] == 2
+
+    def test_returned_results_are_copies(self):
+        """Test that callers cannot mutate cached entries."""
+        cache = ResultCache()
+        cache.put("a", {"stdout": "a"})
+        cache.get("a")["stdout"] = "changed"
+        assert cache.get("a") == {"stdout": "a"}
+
+    def test_disk_tier_survives_restart(self, tmp_path):
+        """Test that results stored on disk are found by a new cache instance."""
+        path = str(tmp_path / "cache" / "results.sqlite")
+        cache = ResultCache(path=path)
+        cache.put("a", {"stdout": "a", "exit_code": 0})
+        cache.close()
+
+        reopened = ResultCache(path=path)
+        assert reopened.get("a") == {"stdout": "a", "exit_code": 0}
+        stats = reopened.stats()
+        assert stats["disk_hits"] == 1
+        assert stats["disk_entries"] == 1
+        reopened.close()
+
+    def test_disk_tier_is_pruned(self, tmp_path):
+        """Test that the oldest on-disk results are deleted beyond max_disk_entries."""
+        cache = ResultCache(max_entries=1, path=str(tmp_path / "results.sqlite"), max_disk_entries=10)
+        for index in range(DISK_PRUNE_INTERVAL):
+            cache.put(str(index), {"stdout": str(index)})
+
+        stats = cache.stats()
+        assert stats["disk_entries"] == 10
+        assert stats["disk_evictions"] == DISK_PRUNE_INTERVAL - 10
+        assert cache.get(str(DISK_PRUNE_INTERVAL - 1)) is not None
+        assert cache.get("0") is None
+        cache.close()
+
+    def test_memory_only_lookup_skips_disk(self, tmp_path):
+        """Test that a memory-only lookup neither reads the disk tier nor counts a miss."""
+        path = str(tmp_path / "results.sqlite")
+        writer = ResultCache(path=path)
+        writer.put("a", {"stdout": "a"})
+        writer.close()
+        cache = ResultCache(path=path)
+
+        assert cache.get("a", memory_only=True) is None
+        assert cache.stats()["misses"] == 0
+        assert cache.get("a") == {"stdout": "a"}
+        assert cache.get("a", memory_only=True) == {"stdout": "a"}
+        cache.close()
@@ -0,0 +1,101 @@
+"""Tests for structured Lean diagnostics."""
+
+import json
+
+from lean_docker_mcp.diagnostics import classify_message, make_diagnostic, parse_json_message, parse_lean_output, summarize_diagnostics
+
+
+def _message(severity, line, column, data, end=None):
+    """Build a message as printed by ``lean --json``."""
+    message = {"severity": severity, "pos": {"line": line, "column": column}, "endPos": end, "fileName": "Script.lean", "data": data}
+    return json.dumps(message)
+
+
+class TestParseLeanOutput:
+    """Tests for parse_lean_output."""
+
+    def test_messages_and_program_output(self):
+        """Test that messages become diagnostics and program output is kept in order."""
+        output = "\n".join([
+            _message("warning", 2, 8, "declaration uses 'sorry'", end={"line": 2, "column": 13}),
+            "error: this line is printed by the program",
+            _message("error", 5, 2, "type mismatch\n  42\nexpected type\n  IO Unit"),
+        ])
+
+        text, diagnostics = parse_lean_output(output)
+
+        assert text.splitlines()[0] == "Script.lean:2:8: warning: declaration uses 'sorry'"
+        assert text.splitlines()[1] == "error: this line is printed by the program"
+        assert text.splitlines()[2] == "Script.lean:5:2: error: type mismatch"
+        assert diagnostics == [
+            {
+                "severity": "warning", "kind": "sorry", "line": 2, "column": 8, "end_line": 2, "end_column": 13,
+                "message": "declaration uses 'sorry'",
+            },
+            {
+                "severity": "error", "kind": "type_mismatch", "line": 5, "column": 2, "end_line": None, "end_column": None,
+                "message": "type mismatch\n  42\nexpected type\n  IO Unit",
+            },
+        ]
+
+    def test_eval_output_is_info(self):
+        """Test that #eval results are reported as info diagnostics and rendered as plain text."""
+        text, diagnostics = parse_lean_output(_message("information", 1, 0, "error: not really"))
+
+        assert text == "error: not really"
+        assert diagnostics[0]["severity"] == "info"
+
+    def test_ignores_json_that_is_not_a_message(self):
+        """Test that JSON printed by a program is treated as program output."""
+        assert parse_json_message('{"result": 1}') is None
+        assert parse_json_message("{not json") is None
+        assert parse_lean_output('{"result": 1}') == ('{"result": 1}', [])
+
+
+class TestMakeDiagnostic:
+    """Tests for make_diagnostic."""
+
+    def test_line_offset(self):
+        """Test that the line offset is applied to both positions."""
+        message = {"severity": "error", "pos": {"line": 1, "column": 3}, "endPos": {"line": 2, "column": 0}, "data": "oops"}
+
+        diagnostic = make_diagnostic(message, line_offset=10)
+
+        assert (diagnostic["line"], diagnostic["end_line"]) == (11, 12)
+
+
+class TestClassification:
+    """Tests for classify_message and summarize_diagnostics."""
+
+    def test_message_kinds(self):
+        """Test the kinds assigned to common Lean messages."""
+        assert classify_message("error", "unknown identifier 'foo'") == "unknown_identifier"
+        assert classify_message("error", "unsolved goals\n⊢ 1 = 2") == "unsolved_goals"
+        assert classify_message("error", "unexpected token 'at'; expected term") == "syntax_error"
+        assert classify_message("error", "failed to synthesize\n  Add Foo") == "error"
+        assert classify_message("warning", "declaration uses 'sorry'") == "sorry"
+        unused = "unused variable `h`\nnote: this linter can be disabled with `set_option linter.unusedVariables false`"
+        assert classify_message("warning", unused) == "linter"
+        assert classify_message("warning", "deprecated") == "warning"
+        assert classify_message("info", "42") == "info"
+
+    def test_summary(self):
+        """Test that the summary counts every message and records where sorry is used."""
+        messages = [
+            {"severity": "warning", "pos": {"line": 3, "column": 8}, "data": "declaration uses 'sorry'"},
+            {"severity": "warning", "pos": {"line": 9, "column": 8}, "data": "declaration uses 'sorry'"},
+            {"severity": "error", "pos": {"line": 12, "column": 2}, "data": "unsolved goals\n⊢ False"},
+            {"severity": "information", "pos": {"line": 14, "column": 0}, "data": "2"},
+        ]
+
+        summary = summarize_diagnostics([make_diagnostic(message) for message in messages])
+
+        assert summary == {
+            "errors": 1,
+            "warnings": 2,
+            "infos": 1,
+            "sorries": 2,
+            "linter_warnings": 0,
+            "kinds": {"sorry": 2, "unsolved_goals": 1, "info": 1},
+            "sorry_positions": [{"line": 3, "column": 8}, {"line": 9, "column": 8}],
+        }
@@ -1,15 +1,32 @@
 """Test suite for Docker execution of Lean code."""
 
 import asyncio
+import base64
 import os
+import threading
+import time
 import pytest
 import pytest_asyncio
 from unittest.mock import AsyncMock, MagicMock, patch
 
 from lean_docker_mcp.config import Configuration, DockerConfig, LeanConfig
-from lean_docker_mcp.docker_manager import DockerManager
+from lean_docker_mcp.docker_manager import NATIVE_CACHE_DIR, PACKAGES_DIR, PREAMBLE_DIR, RUNNER_PATH, STORE_DIR, DockerManager
+from lean_docker_mcp.exec_stream import ExecOutput
 from lean_docker_mcp.server import Server
 
+SUCCESS_OUTPUT = b"""---LEAN_OUTPUT_START---
+ok
+---LEAN_OUTPUT_END---
+---LEAN_EXIT_CODE_START---
+0
+---LEAN_EXIT_CODE_END---"""
+
+# A message as printed by `lean --json`
+ERROR_MESSAGE_JSON = (
+    b'{"severity": "error", "pos": {"line": 1, "column": 4}, "endPos": {"line": 1, "column": 5}, '
+    b'"keepFullRange": false, "fileName": "Script.lean", "data": "unknown identifier \'x\'"}'
+)
+
 
 @pytest.fixture
 def test_config():
@@ -123,6 +140,23 @@ but given type
         assert "error_info" in result
         assert result["error_info"]["error_type"] == "type_mismatch"
 
+    @pytest.mark.asyncio
+    async def test_unpooled_execution_uses_image_runner(self, docker_manager, mock_docker_client):
+        """Test that a one-off container runs the image's runner on the mounted source."""
+        docker_manager.pool_enabled = False
+        docker_manager.image_id = "sha256:test"
+        docker_manager._lean_version = "Lean (version 4.0.0)"
+        mock_docker_client.containers.run.return_value = SUCCESS_OUTPUT
+
+        result = await docker_manager.execute_transient("#eval 1")
+
+        assert result["status"] == "success"
+        call_args = mock_docker_client.containers.run.call_args[1]
+        assert call_args["command"][:4] == ["timeout", "-k", "2", "30"]
+        assert RUNNER_PATH in call_args["command"][6]
+        assert call_args["command"][7] == "/app/Script.lean"
+        assert call_args["environment"] == {"LEAN_TIMEOUT": "30"}
+
     @pytest.mark.asyncio
     async def test_validation_error(self, docker_manager):
         """Test code that fails validation."""
@@ -162,34 +196,19 @@ class TestPersistentExecution:
     @pytest.mark.asyncio
     async def test_successful_persistent_execution(self, docker_manager, mock_docker_client, mock_container):
         """Test executing valid Lean code in a persistent container."""
-        # Configure the exec_run mocks for the session
-        exec_run_calls = []
-        
-        def mock_exec_run(*args, **kwargs):
-            exec_run_calls.append((args, kwargs))
-            call_index = len(exec_run_calls) - 1
-            
-            # Return different responses based on the call
-            if call_index == 2:  # The call to execute the wrapper script
-                return type('ExecResult', (), {
-                    'exit_code': 0,
-                    'output': b"""---LEAN_OUTPUT_START---
+        output = b"""---LEAN_OUTPUT_START---
 Hello from persistent container
 ---LEAN_OUTPUT_END---
 ---LEAN_EXIT_CODE_START---
 0
 ---LEAN_EXIT_CODE_END---"""
-                })()
-            else:
-                # Other calls (script creation, cleanup) return empty success
-                return type('ExecResult', (), {'exit_code': 0, 'output': b''})()
-        
-        mock_container.exec_run.side_effect = mock_exec_run
         
         # Test code for persistent execution
         code = 'def main : IO Unit := IO.println "Hello from persistent container"'
         session_id = "test-session"
-        result = await docker_manager.execute_persistent(session_id, code)
+        with patch("lean_docker_mcp.docker_manager.exec_with_stdin",
+                   return_value=ExecOutput(exit_code=0, output=output)) as mock_exec:
+            result = await docker_manager.execute_persistent(session_id, code)
         
         # Check the result
         assert result["status"] == "success"
@@ -200,42 +219,34 @@ Hello from persistent container
         # Check that container was created correctly
         mock_docker_client.containers.run.assert_called_once()
         
-        # Verify the expected number of exec_run calls (create script, create wrapper, execute, cleanup)
-        assert len(exec_run_calls) == 4
+        # The source goes to the image's runner on stdin in a single exec
+        mock_exec.assert_called_once()
+        args, kwargs = mock_exec.call_args
+        assert args[1] == docker_manager.persistent_containers[session_id]
+        assert args[2] == [RUNNER_PATH]
+        assert args[3] == code.encode("utf-8")
+        assert kwargs["user"] == "leanuser"
+        assert kwargs["environment"] == {"LEAN_TIMEOUT": str(docker_manager.config.docker.timeout)}
+        mock_container.exec_run.assert_not_called()
 
     @pytest.mark.asyncio
     async def test_persistent_execution_error(self, docker_manager, mock_docker_client, mock_container):
         """Test error handling in persistent execution."""
-        # Configure the exec_run mocks for the session with an error
-        exec_run_calls = []
-        
-        def mock_exec_run(*args, **kwargs):
-            exec_run_calls.append((args, kwargs))
-            call_index = len(exec_run_calls) - 1
-            
-            # Return different responses based on the call
-            if call_index == 2:  # The call to execute the wrapper script
-                return type('ExecResult', (), {
-                    'exit_code': 1,
-                    'output': b"""---LEAN_OUTPUT_START---
-/home/leanuser/project/Script_abcdef.lean:1:22: error: unknown identifier 'nonexistent'
+        output = b"""---LEAN_OUTPUT_START---
+Script.lean:1:22: error: unknown identifier 'nonexistent'
   IO.println nonexistent
             ^
 ---LEAN_OUTPUT_END---
 ---LEAN_EXIT_CODE_START---
 1
 ---LEAN_EXIT_CODE_END---"""
-                })()
-            else:
-                # Other calls (script creation, cleanup) return empty success
-                return type('ExecResult', (), {'exit_code': 0, 'output': b''})()
-        
-        mock_container.exec_run.side_effect = mock_exec_run
         
         # Test code with an error
         code = 'def main : IO Unit := IO.println nonexistent'
         session_id = "test-session"
-        result = await docker_manager.execute_persistent(session_id, code)
+        with patch("lean_docker_mcp.docker_manager.exec_with_stdin",
+                   return_value=ExecOutput(exit_code=1, output=output)) as mock_exec:
+            result = await docker_manager.execute_persistent(session_id, code)
         
         # Check the result
         assert result["status"] == "error"
@@ -243,9 +254,19 @@ Hello from persistent container
         assert result["exit_code"] == 1
         assert "error_info" in result
         assert result["error_info"]["error_type"] == "unknown_identifier"
-        
-        # Verify the expected number of exec_run calls were made
-        assert len(exec_run_calls) == 4
+        mock_exec.assert_called_once()
+
+    @pytest.mark.asyncio
+    async def test_persistent_large_source(self, docker_manager, mock_container):
+        """Test that a multi-megabyte source with quotes is delivered unchanged."""
+        code = "\n".join(f"def x{i} : String := \"it's {i}\"" for i in range(100000))
+        assert len(code) > 2 ** 21
+        with patch("lean_docker_mcp.docker_manager.exec_with_stdin",
+                   return_value=ExecOutput(exit_code=0, output=SUCCESS_OUTPUT)) as mock_exec:
+            result = await docker_manager.execute_persistent("big-session", code)
+
+        assert result["status"] == "success"
+        assert mock_exec.call_args[0][3] == code.encode("utf-8")
 
     @pytest.mark.asyncio
     async def test_persistent_validation_error(self, docker_manager):
@@ -273,7 +294,7 @@ Hello from persistent container
         # Add a fake session ID to the persistent containers
         docker_manager.persistent_containers["test-session"] = "nonexistent-id"
         
-        # Make the container.get raise NotFound
+        # Make the exec against the vanished container raise NotFound
         mock_docker_client.containers.get.side_effect = NotFound("Container not found")
         
         # Execute code with the session ID
@@ -281,8 +302,9 @@ Hello from persistent container
         
         # Should raise DockerExecutionError
         from lean_docker_mcp.docker_manager import DockerExecutionError
-        with pytest.raises(DockerExecutionError) as excinfo:
-            await docker_manager.execute_persistent("test-session", code)
+        with patch("lean_docker_mcp.docker_manager.exec_with_stdin", side_effect=NotFound("Container not found")):
+            with pytest.raises(DockerExecutionError) as excinfo:
+                await docker_manager.execute_persistent("test-session", code)
         
         # Check the exception
         assert "Session test-session has expired or was deleted" in str(excinfo.value)
@@ -307,6 +329,87 @@ Hello from persistent container
         # Verify the session was removed from tracking
         assert "test-session" not in docker_manager.persistent_containers
         
+    @pytest.mark.asyncio
+    async def test_repl_command_branches_from_env(self, docker_manager):
+        """Test that REPL commands return env and proof state ids and can continue from an earlier env."""
+        worker = MagicMock(alive=True)
+        worker.run_command.return_value = {
+            "env": 0,
+            "sorries": [{"pos": {"line": 1, "column": 28}, "goal": "n : Nat\n⊢ n + 0 = n", "proofState": 0}],
+            "messages": [{"severity": "warning", "pos": {"line": 1, "column": 8}, "data": "declaration uses 'sorry'"}],
+        }
+        worker.send.return_value = {"env": 2}
+
+        with patch("lean_docker_mcp.docker_manager.LeanReplWorker", return_value=worker) as mock_worker:
+            first = await docker_manager.execute_repl_command("search", "theorem t (n : Nat) : n + 0 = n := by sorry")
+            second = await docker_manager.execute_repl_command("search", "theorem u : True := trivial", env=first["env"])
+
+        mock_worker.assert_called_once()
+        assert mock_worker.call_args[0][1] == docker_manager.persistent_containers["search"]
+        assert first["env"] == 0
+        assert first["proof_states"] == [{"proof_state": 0, "goal": "n : Nat\n⊢ n + 0 = n", "line": 1, "column": 28}]
+        assert first["diagnostic_summary"]["sorries"] == 1
+        worker.send.assert_called_once_with({"cmd": "theorem u : True := trivial", "env": 0}, timeout=docker_manager.config.docker.timeout)
+        assert second["status"] == "success"
+        assert second["env"] == 2
+        assert second["session_id"] == "search"
+
+        await docker_manager.cleanup_session("search")
+        worker.close.assert_called_once()
+        assert "search" not in docker_manager.session_repls
+
+    @pytest.mark.asyncio
+    async def test_tactic_step_returns_structured_goals(self, docker_manager):
+        """Test that a tactic runs against a proof state and returns the remaining goals."""
+        worker = MagicMock(alive=True)
+        worker.send.side_effect = [
+            {"proofState": 1, "goals": ["n : Nat\n⊢ n + 0 = n"]},
+            {"proofState": 2, "goals": []},
+            {"message": "Lean error:\nunknown tactic"},
+        ]
+        docker_manager.persistent_containers["search"] = "test-container-id"
+        docker_manager.session_repls["search"] = worker
+
+        step = await docker_manager.execute_tactic("search", 0, "intro n")
+        done = await docker_manager.execute_tactic("search", 1, "simp")
+        failed = await docker_manager.execute_tactic("search", 1, "frobnicate")
+
+        worker.send.assert_any_call({"tactic": "intro n", "proofState": 0}, timeout=docker_manager.config.docker.timeout)
+        assert step["status"] == "success"
+        assert step["proof_state"] == 1
+        assert step["goals"][0]["hypotheses"] == [{"names": ["n"], "type": "Nat", "value": None}]
+        assert step["goals"][0]["target"] == "n + 0 = n"
+        assert step["proved"] is False
+        assert done["proved"] is True
+        assert failed["status"] == "error"
+        assert failed["proved"] is False
+        assert failed["proof_state"] is None
+
+    @pytest.mark.asyncio
+    async def test_tactic_step_closed_by_sorry_is_not_proved(self, docker_manager):
+        """Test that a tactic step leaving no goals only through sorry is not reported as proved."""
+        worker = MagicMock(alive=True)
+        worker.send.return_value = {
+            "proofState": 3,
+            "goals": [],
+            "sorries": [{"pos": {"line": 1, "column": 0}, "goal": "⊢ False", "proofState": 4}],
+        }
+        docker_manager.persistent_containers["search"] = "test-container-id"
+        docker_manager.session_repls["search"] = worker
+
+        result = await docker_manager.execute_tactic("search", 0, "sorry")
+
+        assert result["status"] == "success"
+        assert result["proved"] is False
+        assert result["diagnostic_summary"]["sorries"] == 1
+
+    @pytest.mark.asyncio
+    async def test_tactic_step_needs_session_repl(self, docker_manager):
+        """Test that proof state ids are rejected for a session without a REPL."""
+        result = await docker_manager.execute_tactic("no-repl", 0, "simp")
+
+        assert result["error_type"] == "unknown_proof_state"
+
     @pytest.mark.asyncio
     async def test_cleanup_nonexistent_session(self, docker_manager):
         """Test cleanup of a session that doesn't exist."""
@@ -318,6 +421,732 @@ Hello from persistent container
         assert "nonexistent-session" in result["message"]
 
 
+class TestPooledExecution:
+    """Test pooled execution of Lean code."""
+
+    @pytest_asyncio.fixture
+    async def pooled_manager(self, test_config, mock_docker_client, mock_container):
+        """Create a DockerManager with pooling enabled and a small pool."""
+        test_config.docker.pool_size = 4
+        mock_docker_client.containers.run.return_value = mock_container
+        with patch("lean_docker_mcp.docker_manager.docker") as mock_docker:
+            mock_docker.from_env.return_value = mock_docker_client
+            manager = DockerManager(test_config)
+            manager.image_id = "sha256:test-image"
+            manager._lean_version = "Lean (version 4.0.0)"
+            yield manager
+            manager.shutdown()
+
+    @pytest.mark.asyncio
+    async def test_concurrent_executions_overlap(self, pooled_manager):
+        """Test that concurrent executions do not block each other on the event loop."""
+
+        def slow_exec(*args, **kwargs):
+            # Simulate a slow, blocking Lean compile
+            time.sleep(0.3)
+            return ExecOutput(exit_code=0, output=SUCCESS_OUTPUT)
+
+        with patch("lean_docker_mcp.docker_manager.exec_with_stdin", side_effect=slow_exec):
+            start = time.monotonic()
+            results = await asyncio.gather(*[
+                pooled_manager.execute_transient(f"#eval {i}") for i in range(4)
+            ])
+            elapsed = time.monotonic() - start
+
+        assert all(result["status"] == "success" for result in results)
+        # Serialized execution would take at least 4 * 0.3s
+        assert elapsed < 0.9
+
+    @pytest.mark.asyncio
+    async def test_single_exec_with_source_on_stdin(self, pooled_manager, mock_container):
+        """Test that a pooled run is one exec that receives the source on stdin."""
+        code = '#eval "stdin"'
+        with patch("lean_docker_mcp.docker_manager.exec_with_stdin",
+                   return_value=ExecOutput(exit_code=0, output=SUCCESS_OUTPUT)) as mock_exec:
+            result = await pooled_manager.execute_transient(code)
+
+        assert result["status"] == "success"
+        assert result["stdout"] == "ok"
+        mock_exec.assert_called_once()
+        args, kwargs = mock_exec.call_args
+        assert args[3] == code.encode("utf-8")
+        assert kwargs["user"] == "leanuser"
+        # The runner baked into the image is invoked directly
+        assert args[2] == [RUNNER_PATH]
+        # No upload, setup or reset execs are issued around the run
+        mock_container.exec_run.assert_not_called()
+        mock_container.put_archive.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_diagnostics_from_json_messages(self, pooled_manager):
+        """Test that success is decided by Lean's messages, not by the text of #eval output."""
+        info = b'{"severity": "information", "pos": {"line": 1, "column": 0}, "endPos": null, "data": "\\"error: none\\""}'
+        output = b"---LEAN_OUTPUT_START---\n" + info + b"\n---LEAN_OUTPUT_END---\n---LEAN_EXIT_CODE_START---\n0\n---LEAN_EXIT_CODE_END---\n"
+        with patch("lean_docker_mcp.docker_manager.exec_with_stdin", return_value=ExecOutput(exit_code=0, output=output)):
+            result = await pooled_manager.execute_transient('#eval "error: none"')
+
+        assert result["status"] == "success"
+        assert result["stdout"] == '"error: none"'
+        assert result["diagnostics"] == [
+            {"severity": "info", "kind": "info", "line": 1, "column": 0, "end_line": None, "end_column": None, "message": '"error: none"'}
+        ]
+        assert result["diagnostic_summary"]["errors"] == 0
+        assert result["diagnostic_summary"]["infos"] == 1
+
+    @pytest.mark.asyncio
+    async def test_check_only_returns_verdict(self, pooled_manager):
+        """Test that check mode never runs main and reports the axioms of each theorem."""
+        code = "theorem t : True := trivial\ndef main : IO Unit := pure ()"
+        axioms = b'{"severity": "information", "pos": {"line": 4, "column": 0}, "endPos": null, "data": "\'t\' does not depend on any axioms"}'
+        output = b"---LEAN_OUTPUT_START---\n" + axioms + b"\n---LEAN_OUTPUT_END---\n---LEAN_EXIT_CODE_START---\n0\n---LEAN_EXIT_CODE_END---\n"
+        with patch("lean_docker_mcp.docker_manager.exec_with_stdin", return_value=ExecOutput(exit_code=0, output=output)) as mock_exec:
+            result = await pooled_manager.execute_transient(code, check_only=True)
+
+        assert result["verdict"] == "proved"
+        assert result["theorems"] == [{"name": "t", "axioms": [], "uses_sorry": False}]
+        args, kwargs = mock_exec.call_args
+        assert args[3].decode("utf-8").endswith("#print axioms t\n")
+        assert kwargs["environment"]["LEAN_CHECK_ONLY"] == "1"
+
+    @pytest.mark.asyncio
+    async def test_native_compile_keys_programs_by_source(self, pooled_manager, mock_docker_client):
+        """Test that programs get a stable native cache key and containers mount the cache read-only."""
+        pooled_manager.native_compile = True
+        program = 'def main : IO Unit := IO.println "hi"'
+
+        with patch("lean_docker_mcp.docker_manager.exec_with_stdin",
+                   return_value=ExecOutput(exit_code=0, output=SUCCESS_OUTPUT)) as mock_exec:
+            await pooled_manager.execute_transient(program)
+            await pooled_manager.execute_transient(program)
+            await pooled_manager.execute_transient(program + "\n")
+            await pooled_manager.execute_transient("#eval 1")
+
+        environments = [call[1]["environment"] for call in mock_exec.call_args_list if call[0][2] == [RUNNER_PATH]]
+        keys = [environment.get("LEAN_NATIVE_KEY") for environment in environments]
+        assert keys[0] is not None and keys[0] == keys[1]
+        assert keys[2] not in (None, keys[0])
+        assert keys[3] is None
+        assert environments[0]["LEAN_NATIVE_CACHE"] == NATIVE_CACHE_DIR
+        volumes = mock_docker_client.containers.run.call_args[1]["volumes"]
+        assert volumes == {"lean-docker-mcp-native-cache": {"bind": NATIVE_CACHE_DIR, "mode": "ro"}}
+
+    @pytest.mark.asyncio
+    async def test_native_binary_stored_outside_execution_container(self, pooled_manager, mock_docker_client):
+        """Test that a newly compiled executable is taken from the runner's output and written to the cache by a separate root container."""
+        pooled_manager.native_compile = True
+        binary = b"\x7fELF binary"
+        output = SUCCESS_OUTPUT + b"---LEAN_BUILD_OUTPUT_START---\n" + base64.b64encode(binary) + b"\n---LEAN_BUILD_OUTPUT_END---\n"
+
+        with patch("lean_docker_mcp.docker_manager.exec_with_stdin",
+                   return_value=ExecOutput(exit_code=0, output=output)) as mock_exec, \
+                patch("lean_docker_mcp.docker_manager._write_file") as mock_write:
+            result = await pooled_manager.execute_transient('def main : IO Unit := IO.println "hi"')
+            await asyncio.gather(*pooled_manager._background_tasks)
+
+        # The executable is collected from the runner's own exec, not from the container afterwards
+        assert mock_exec.call_count == 1
+        assert "LEAN_BUILD_OUTPUT" not in result["stdout"]
+        key = mock_exec.call_args[1]["environment"]["LEAN_NATIVE_KEY"]
+        assert mock_write.call_args[0][1] == binary
+
+        store = mock_docker_client.containers.run.call_args[1]
+        assert store["user"] == "root"
+        assert store["command"][3:5] == [key, "755"]
+        assert store["volumes"]["lean-docker-mcp-native-cache"] == {"bind": STORE_DIR, "mode": "rw"}
+        incoming = [volume for volume, mount in store["volumes"].items() if mount["bind"] == "/incoming"]
+        assert incoming and store["volumes"][incoming[0]]["mode"] == "ro"
+
+    @pytest.mark.asyncio
+    async def test_packages_volume_shared_read_only(self, pooled_manager, mock_docker_client):
+        """Test that the package workspace is mounted read-only and put on the runner's search path."""
+        pooled_manager.packages_volume = "mathlib-packages"
+        with patch("lean_docker_mcp.docker_manager.exec_with_stdin",
+                   return_value=ExecOutput(exit_code=0, output=SUCCESS_OUTPUT)) as mock_exec:
+            await pooled_manager.execute_transient("import Mathlib\n#eval 1")
+            await pooled_manager.execute_persistent("packages-session", "#eval 1")
+
+        for call in mock_docker_client.containers.run.call_args_list:
+            assert call[1]["volumes"] == {"mathlib-packages": {"bind": PACKAGES_DIR, "mode": "ro"}}
+        for call in mock_exec.call_args_list:
+            assert call[1]["environment"]["LEAN_PACKAGES"] == PACKAGES_DIR
+
+        with patch("lean_docker_mcp.docker_manager.LeanReplWorker") as mock_worker:
+            await pooled_manager._get_repl_worker("container")
+        assert mock_worker.call_args[1]["command"] == f"{RUNNER_PATH} --exec repl"
+        assert mock_worker.call_args[1]["environment"]["LEAN_PACKAGES"] == PACKAGES_DIR
+
+    @pytest.mark.asyncio
+    async def test_register_preamble(self, pooled_manager, mock_docker_client):
+        """Test that a preamble is compiled once by content and can then be imported."""
+        pooled_manager.preambles_enabled = True
+        pooled_manager.config.docker.preambles_enabled = True
+        preamble = "import Mathlib\nopen Nat\nlemma helper : 1 = 1 := rfl"
+        with patch("lean_docker_mcp.docker_manager.exec_with_stdin",
+                   return_value=ExecOutput(exit_code=0, output=SUCCESS_OUTPUT)) as mock_exec:
+            first = await pooled_manager.register_preamble("Common", preamble)
+            second = await pooled_manager.register_preamble("Common", preamble)
+            used = await pooled_manager.execute_transient("import Preamble.Common\n#check helper")
+
+        assert first["status"] == "success"
+        assert first["import_line"] == "import Preamble.Common"
+        assert first["key"] == second["key"]
+        assert pooled_manager.preambles == {"Common": first["key"]}
+        assert used["status"] == "success"
+        environment = mock_exec.call_args_list[0][1]["environment"]
+        assert environment["LEAN_PREAMBLE_MODULE"] == "Common"
+        assert environment["LEAN_PREAMBLE_KEY"] == first["key"]
+        assert environment["LEAN_PREAMBLES"].startswith(f"{PREAMBLE_DIR}/")
+        runs = [call for call in mock_exec.call_args_list if call[0][2] == [RUNNER_PATH]]
+        assert "LEAN_PREAMBLE_MODULE" not in runs[2][1]["environment"]
+        started = [call[1] for call in mock_docker_client.containers.run.call_args_list]
+        execution, store = started[0], next(run for run in started if run.get("user") == "root")
+        assert execution["volumes"] == {"lean-docker-mcp-preambles": {"bind": PREAMBLE_DIR, "mode": "ro"}}
+        # The olean is written and linked by a separate root container
+        root = environment["LEAN_PREAMBLES"][len(PREAMBLE_DIR) + 1:]
+        assert store["user"] == "root"
+        assert store["volumes"]["lean-docker-mcp-preambles"] == {"bind": STORE_DIR, "mode": "rw"}
+        assert store["command"][3:] == [
+            f"{root}/objects/{first['key']}/Preamble/Common.olean",
+            "644",
+            f"{root}/lib/Preamble/Common.olean",
+            f"../../objects/{first['key']}/Preamble/Common.olean",
+        ]
+
+        invalid = await pooled_manager.register_preamble("Not A Name", preamble)
+        assert invalid["error_type"] == "validation_error"
+
+    @pytest.mark.asyncio
+    async def test_preambles_only_key_code_importing_them(self, pooled_manager):
+        """Test that registering a preamble only changes the cache keys of code that imports it."""
+        pooled_manager.preambles_enabled = True
+        pooled_manager._preambles_loaded = True
+        unrelated = await pooled_manager._result_cache_key("#check 1")
+        importing = await pooled_manager._result_cache_key("import Preamble.Common\n#check helper")
+
+        pooled_manager.preambles = {"Common": "key-1", "Other": "key-2"}
+        assert await pooled_manager._result_cache_key("#check 1") == unrelated
+        changed = await pooled_manager._result_cache_key("import Preamble.Common\n#check helper")
+        assert changed != importing
+
+        pooled_manager.preambles["Other"] = "key-3"
+        assert await pooled_manager._result_cache_key("import Preamble.Common\n#check helper") == changed
+        pooled_manager.preambles["Common"] = "key-4"
+        assert await pooled_manager._result_cache_key("import Preamble.Common\n#check helper") != changed
+
+    @pytest.mark.asyncio
+    async def test_preambles_registered_before_restart_are_loaded(self, pooled_manager, mock_docker_client):
+        """Test that preambles linked on the volume by an earlier run are keyed like fresh registrations."""
+        pooled_manager.preambles_enabled = True
+        pooled_manager.preambles = {"Other": "key-9"}
+        mock_docker_client.containers.run.return_value = (
+            b"Common.olean ../../objects/key-1/Preamble/Common.olean\n"
+            b"Other.olean ../../objects/key-2/Preamble/Other.olean\n"
+        )
+
+        key = await pooled_manager._result_cache_key("import Preamble.Common\n#check helper")
+        await pooled_manager._result_cache_key("import Preamble.Other\n#check helper")
+
+        # Looked up once; registrations made by this run win over the volume
+        assert mock_docker_client.containers.run.call_count == 1
+        assert pooled_manager.preambles == {"Common": "key-1", "Other": "key-9"}
+        lookup = mock_docker_client.containers.run.call_args[1]
+        assert lookup["volumes"] == {"lean-docker-mcp-preambles": {"bind": PREAMBLE_DIR, "mode": "ro"}}
+        pooled_manager.preambles["Common"] = "key-3"
+        assert await pooled_manager._result_cache_key("import Preamble.Common\n#check helper") != key
+
+    @pytest.mark.asyncio
+    async def test_repeated_code_served_from_cache(self, pooled_manager):
+        """Test that identical check-only code runs once and is then served from the cache."""
+        with patch("lean_docker_mcp.docker_manager.exec_with_stdin",
+                   return_value=ExecOutput(exit_code=0, output=SUCCESS_OUTPUT)) as mock_exec:
+            first = await pooled_manager.execute_transient("#check 1")
+            second = await pooled_manager.execute_transient("#check 1")
+
+        assert mock_exec.call_count == 1
+        assert "cached" not in first
+        assert second["cached"] is True
+        assert second["stdout"] == first["stdout"]
+        assert pooled_manager.get_stats()["cache"]["hits"] == 1
+
+    @pytest.mark.asyncio
+    async def test_eval_results_are_not_cached(self, pooled_manager):
+        """Test that code evaluating expressions during elaboration runs every time."""
+        with patch("lean_docker_mcp.docker_manager.exec_with_stdin",
+                   return_value=ExecOutput(exit_code=0, output=SUCCESS_OUTPUT)) as mock_exec:
+            await pooled_manager.execute_transient("#eval IO.monoMsNow")
+            second = await pooled_manager.execute_transient("#eval IO.monoMsNow")
+
+        assert mock_exec.call_count == 2
+        assert "cached" not in second
+        assert pooled_manager.get_stats()["cache"]["stores"] == 0
+
+    @pytest.mark.asyncio
+    async def test_identical_inflight_executions_coalesce(self, pooled_manager):
+        """Test that identical concurrent requests share a single execution."""
+        pooled_manager.result_cache = None
+
+        def slow_exec(*args, **kwargs):
+            time.sleep(0.2)
+            return ExecOutput(exit_code=0, output=SUCCESS_OUTPUT)
+
+        with patch("lean_docker_mcp.docker_manager.exec_with_stdin", side_effect=slow_exec) as mock_exec:
+            results = await asyncio.gather(*[
+                pooled_manager.execute_transient("#check 1") for _ in range(4)
+            ])
+
+        assert mock_exec.call_count == 1
+        assert all(result["stdout"] == "ok" for result in results)
+        assert sum(1 for result in results if result.get("coalesced")) == 3
+        assert pooled_manager.get_stats()["inflight"] == {"executing": 0, "coalesced": 3}
+
+    @pytest.mark.asyncio
+    async def test_coalesced_waiters_see_leader_errors(self, pooled_manager):
+        """Test that a failed execution is reported to every coalesced caller."""
+        from lean_docker_mcp.docker_manager import DockerExecutionError
+
+        def failing_exec(*args, **kwargs):
+            time.sleep(0.1)
+            raise RuntimeError("exec failed")
+
+        with patch("lean_docker_mcp.docker_manager.exec_with_stdin", side_effect=failing_exec) as mock_exec:
+            results = await asyncio.gather(*[
+                pooled_manager.execute_transient("#check 1") for _ in range(3)
+            ], return_exceptions=True)
+
+        # One run, plus the background reset of the container it left dirty
+        runs = [call for call in mock_exec.call_args_list if call.kwargs["user"] == "leanuser"]
+        assert len(runs) == 1
+        assert all(isinstance(result, DockerExecutionError) for result in results)
+
+    @pytest.mark.asyncio
+    async def test_programs_with_main_are_not_cached(self, pooled_manager):
+        """Test that programs with a main function always run."""
+        code = 'def main : IO Unit := IO.println "hi"'
+        with patch("lean_docker_mcp.docker_manager.exec_with_stdin",
+                   return_value=ExecOutput(exit_code=0, output=SUCCESS_OUTPUT)) as mock_exec:
+            await pooled_manager.execute_transient(code)
+            await pooled_manager.execute_transient(code)
+
+        assert mock_exec.call_count == 2
+
+    @pytest.mark.asyncio
+    async def test_repl_worker_used_for_code_without_main(self, pooled_manager, mock_container):
+        """Test that code without a main function is elaborated by the container's REPL."""
+        worker = MagicMock(alive=True, commands_run=1)
+        worker.run_command.return_value = {
+            "env": 1,
+            "messages": [{"severity": "info", "pos": {"line": 1, "column": 0}, "data": "2"}],
+        }
+        pooled_manager.repl_enabled = True
+        pooled_manager.repl_workers[mock_container.id] = worker
+
+        with patch("lean_docker_mcp.docker_manager.exec_with_stdin") as mock_exec:
+            result = await pooled_manager.execute_transient("#eval 1 + 1")
+
+        assert result["status"] == "success"
+        assert result["stdout"] == "2"
+        worker.run_command.assert_called_once()
+        mock_exec.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_repl_failure_falls_back_to_runner(self, pooled_manager, mock_container):
+        """Test that a broken REPL is discarded and the lean runner is used instead."""
+        from lean_docker_mcp.repl import LeanReplError
+
+        worker = MagicMock(alive=True, commands_run=1)
+        worker.run_command.side_effect = LeanReplError("Lean REPL process exited")
+        pooled_manager.repl_enabled = True
+        pooled_manager.repl_workers[mock_container.id] = worker
+
+        with patch("lean_docker_mcp.docker_manager.exec_with_stdin",
+                   return_value=ExecOutput(exit_code=0, output=SUCCESS_OUTPUT)) as mock_exec:
+            result = await pooled_manager.execute_transient("#eval 1 + 1")
+
+        assert result["status"] == "success"
+        mock_exec.assert_called_once()
+        worker.close.assert_called_once_with(kill=True)
+        assert mock_container.id not in pooled_manager.repl_workers
+
+    @pytest.mark.asyncio
+    async def test_repl_start_failure_only_affects_its_container(self, pooled_manager):
+        """Test that a REPL that fails to start disables the REPL for its container only."""
+        from lean_docker_mcp.repl import LeanReplTimeout, LeanReplUnavailable
+
+        pooled_manager.repl_enabled = True
+        with patch("lean_docker_mcp.docker_manager.LeanReplWorker") as mock_worker:
+            mock_worker.return_value.start.side_effect = LeanReplTimeout("Timed out importing Mathlib")
+            assert await pooled_manager._get_repl_worker("slow-container") is None
+            assert await pooled_manager._get_repl_worker("slow-container") is None
+
+            assert pooled_manager.repl_enabled
+            # The failed container is not retried on every request
+            assert mock_worker.return_value.start.call_count == 1
+
+            mock_worker.return_value.start.side_effect = LeanReplUnavailable("exec: repl: not found")
+            assert await pooled_manager._get_repl_worker("other-container") is None
+            assert not pooled_manager.repl_enabled
+
+    @pytest.mark.asyncio
+    async def test_runner_timeout_reported(self, pooled_manager):
+        """Test that Lean stopped by the in-container timeout yields a distinct, uncached error."""
+        pooled_manager.config.docker.timeout = 0
+        timed_out = SUCCESS_OUTPUT.replace(b"\n0\n", b"\n124\n")
+        with patch("lean_docker_mcp.docker_manager.exec_with_stdin",
+                   return_value=ExecOutput(exit_code=124, output=timed_out)) as mock_exec:
+            first = await pooled_manager.execute_transient("#eval loop 0")
+            second = await pooled_manager.execute_transient("#eval loop 0")
+
+        assert first["error_type"] == "timeout"
+        assert first["status"] == "error"
+        assert "cached" not in second
+        assert mock_exec.call_count == 2
+        assert mock_exec.call_args.kwargs["environment"] == {"LEAN_TIMEOUT": "0"}
+
+    @pytest.mark.asyncio
+    async def test_unresponsive_exec_times_out(self, pooled_manager, mock_container):
+        """Test that an exec past its deadline returns a timeout and the container is reset."""
+        from lean_docker_mcp.exec_stream import ExecTimeoutError
+
+        with patch("lean_docker_mcp.docker_manager.exec_with_stdin",
+                   side_effect=ExecTimeoutError("Timed out waiting for exec output")):
+            result = await pooled_manager.execute_transient("#eval 1")
+
+        assert result["error_type"] == "timeout"
+        assert pooled_manager._dirty_containers.qsize() == 1
+
+    @pytest.mark.asyncio
+    async def test_repl_timeout_does_not_fall_back(self, pooled_manager, mock_container):
+        """Test that a REPL timeout kills the REPL and is reported instead of re-running the code."""
+        from lean_docker_mcp.repl import LeanReplTimeout
+
+        worker = MagicMock()
+        worker.alive = True
+        worker.run_command.side_effect = LeanReplTimeout("Timed out after 30s waiting for the Lean REPL")
+        pooled_manager.repl_enabled = True
+        pooled_manager.repl_workers[mock_container.id] = worker
+
+        with patch("lean_docker_mcp.docker_manager.exec_with_stdin") as mock_exec:
+            result = await pooled_manager.execute_transient("#eval 1 + 1")
+
+        assert result["error_type"] == "timeout"
+        mock_exec.assert_not_called()
+        worker.close.assert_called_once_with(kill=True)
+
+    @pytest.mark.asyncio
+    async def test_batch_results_in_order_with_bounded_parallelism(self, pooled_manager):
+        """Test that a batch runs at most max_parallel items at once and keeps input order."""
+        running = 0
+        peak = 0
+        lock = threading.Lock()
+
+        def counting_exec(api, container_id, cmd, stdin_data, **kwargs):
+            nonlocal running, peak
+            with lock:
+                running += 1
+                peak = max(peak, running)
+            time.sleep(0.05)
+            with lock:
+                running -= 1
+            if b"bad" in stdin_data:
+                raise RuntimeError("exec failed")
+            return ExecOutput(exit_code=0, output=SUCCESS_OUTPUT)
+
+        reported = []
+
+        async def on_result(index, result):
+            reported.append(index)
+
+        codes = [f"#eval {i}" for i in range(5)] + ["#eval bad"]
+        with patch("lean_docker_mcp.docker_manager.exec_with_stdin", side_effect=counting_exec):
+            results = await pooled_manager.execute_batch(codes, max_parallel=2, on_result=on_result)
+
+        assert peak <= 2
+        assert [result["index"] for result in results] == list(range(6))
+        assert all(result["status"] == "success" for result in results[:5])
+        assert results[5]["error_type"] == "execution_error"
+        assert sorted(reported) == list(range(6))
+
+    @pytest.mark.asyncio
+    async def test_header_batch_checks_open_proof_as_tactics(self, pooled_manager, mock_container):
+        """Test that a header ending in an open proof is elaborated once and candidates run as tactics."""
+        worker = MagicMock()
+        worker.alive = True
+        worker.commands_run = 0
+        sorry_warning = {"severity": "warning", "pos": {"line": 2, "column": 8}, "data": "declaration uses 'sorry'"}
+        worker.run_command.return_value = {
+            "env": 7,
+            "messages": [sorry_warning],
+            "sorries": [{"proofState": 3, "pos": {"line": 2, "column": 28}, "goal": "⊢ 2 + 2 = 4"}],
+        }
+        worker.send.side_effect = [
+            {"proofState": 4, "goals": []},
+            {"proofState": 5, "goals": [], "messages": [
+                {"severity": "error", "pos": {"line": 1, "column": 6}, "data": "type mismatch"}]},
+            {"proofState": 6, "goals": ["⊢ 4 = 4"]},
+        ]
+        pooled_manager.repl_enabled = True
+        pooled_manager.repl_workers[mock_container.id] = worker
+
+        header = "import Mathlib\ntheorem t : 2 + 2 = 4 := by"
+        with patch("lean_docker_mcp.docker_manager.exec_with_stdin") as mock_exec:
+            results = await pooled_manager.execute_batch(["  norm_num", "  exact 5", "  simp only []"], header=header)
+
+        worker.run_command.assert_called_once_with(header + " sorry", timeout=30)
+        assert [call.args[0] for call in worker.send.call_args_list] == [
+            {"tactic": "norm_num", "proofState": 3},
+            {"tactic": "exact 5", "proofState": 3},
+            {"tactic": "simp only []", "proofState": 3},
+        ]
+        mock_exec.assert_not_called()
+        assert results[0]["status"] == "success"
+        # Positions refer to the combined header + candidate file
+        assert results[1]["stdout"] == "Script.lean:3:6: error: type mismatch"
+        assert results[2]["status"] == "error"
+        assert "unsolved goals" in results[2]["stdout"]
+
+    @pytest.mark.asyncio
+    async def test_header_batch_branches_from_complete_header(self, pooled_manager, mock_container):
+        """Test that a header of complete commands is elaborated once and candidates branch from its env."""
+        worker = MagicMock()
+        worker.alive = True
+        worker.commands_run = 0
+        worker.run_command.return_value = {"env": 7}
+        worker.send.side_effect = [{"env": 8}, {"env": 9}]
+        pooled_manager.repl_enabled = True
+        pooled_manager.repl_workers[mock_container.id] = worker
+
+        header = "import Mathlib\ndef double (n : Nat) := 2 * n"
+        bodies = ["theorem a : double 2 = 4 := rfl", "theorem b : double 3 = 6 := by simp [double]"]
+        with patch("lean_docker_mcp.docker_manager.exec_with_stdin") as mock_exec:
+            results = await pooled_manager.execute_batch(bodies, header=header)
+
+        worker.run_command.assert_called_once_with(header, timeout=30)
+        assert [call.args[0] for call in worker.send.call_args_list] == [{"cmd": body, "env": 7} for body in bodies]
+        mock_exec.assert_not_called()
+        assert [result["status"] for result in results] == ["success", "success"]
+
+    @pytest.mark.asyncio
+    async def test_header_batch_without_repl_prepends_header(self, pooled_manager):
+        """Test that without REPL workers each candidate runs with the header prepended."""
+        with patch("lean_docker_mcp.docker_manager.exec_with_stdin",
+                   return_value=ExecOutput(exit_code=0, output=SUCCESS_OUTPUT)) as mock_exec:
+            results = await pooled_manager.execute_batch(["#eval x"], header="def x := 1")
+
+        assert results[0]["status"] == "success"
+        assert mock_exec.call_args.args[3] == b"def x := 1\n#eval x"
+
+    @pytest.mark.asyncio
+    async def test_streaming_forwards_lines_as_they_arrive(self, pooled_manager):
+        """Test that Lean output lines are forwarded from the exec stream while it runs."""
+        chunks = [b"---LEAN_OUTPUT_START---\nfir", b"st\nsecond\n", b"---LEAN_OUTPUT_END---\n"]
+
+        def streaming_exec(api, container_id, cmd, stdin_data, on_output=None, **kwargs):
+            for chunk in chunks:
+                on_output(chunk)
+            return ExecOutput(exit_code=0, output=b"".join(chunks) + b"---LEAN_EXIT_CODE_START---\n0\n---LEAN_EXIT_CODE_END---\n")
+
+        lines = []
+
+        async def on_output(line):
+            lines.append(line)
+
+        with patch("lean_docker_mcp.docker_manager.exec_with_stdin", side_effect=streaming_exec):
+            result = await pooled_manager.execute_transient("#eval 1", on_output=on_output)
+
+        assert lines == ["first", "second"]
+        assert result["status"] == "success"
+        assert result["stdout"] == "first\nsecond"
+
+    @pytest.mark.asyncio
+    async def test_stop_on_error_returns_before_lean_finishes(self, pooled_manager):
+        """Test that a streamed run stops at the first error and the container is reset."""
+        release = threading.Event()
+
+        def slow_exec(api, container_id, cmd, stdin_data, on_output=None, **kwargs):
+            # Program output that merely mentions an error does not stop the run
+            on_output(b"---LEAN_OUTPUT_START---\nlog: error: retrying\n")
+            on_output(ERROR_MESSAGE_JSON + b"\n")
+            release.wait(timeout=5)
+            return ExecOutput(exit_code=1, output=b"")
+
+        lines = []
+
+        async def on_output(line):
+            lines.append(line)
+
+        with patch("lean_docker_mcp.docker_manager.exec_with_stdin", side_effect=slow_exec):
+            result = await asyncio.wait_for(
+                pooled_manager.execute_transient("#eval x", on_output=on_output, stop_on_error=True),
+                timeout=2,
+            )
+            release.set()
+
+        assert result["error_type"] == "stopped_on_error"
+        assert "unknown identifier" in result["error"]
+        assert lines == ["log: error: retrying", "Script.lean:1:4: error: unknown identifier 'x'"]
+        assert result["diagnostics"][0]["line"] == 1
+        # The container went to the reset worker instead of straight back to the pool
+        assert pooled_manager._reset_task is not None
+
+class TestPoolMaintenance:
+    """Test background replenishment and retirement of pooled containers."""
+
+    @pytest_asyncio.fixture
+    async def maintained_manager(self, test_config, mock_docker_client):
+        """Create a DockerManager whose pool creates distinct containers."""
+        test_config.docker.pool_size = 3
+        test_config.docker.pool_maintenance_interval = 0.05
+        created = []
+
+        def create_container(**kwargs):
+            container = MagicMock()
+            container.id = f"container-{len(created)}"
+            created.append(container)
+            return container
+
+        mock_docker_client.containers.run.side_effect = create_container
+        with patch("lean_docker_mcp.docker_manager.docker") as mock_docker:
+            mock_docker.from_env.return_value = mock_docker_client
+            manager = DockerManager(test_config)
+            manager.image_id = "sha256:test-image"
+            manager._lean_version = "Lean (version 4.0.0)"
+            yield manager
+            await manager.stop_pool_maintenance()
+            manager.shutdown()
+
+    @pytest.mark.asyncio
+    async def test_initialize_starts_maintenance(self, maintained_manager):
+        """Test that the pool is filled and maintenance keeps running afterwards."""
+        await maintained_manager.initialize_pool()
+
+        assert len(maintained_manager.container_pool) == 3
+        assert maintained_manager._pool_maintenance_running()
+
+    @pytest.mark.asyncio
+    async def test_acquire_makes_no_docker_calls(self, maintained_manager, mock_docker_client):
+        """Test that taking a container from a warm pool doesn't touch Docker."""
+        await maintained_manager.initialize_pool()
+        mock_docker_client.reset_mock()
+
+        container_id = await maintained_manager._get_container_from_pool()
+
+        assert container_id in maintained_manager.in_use_containers
+        mock_docker_client.containers.run.assert_not_called()
+        mock_docker_client.containers.get.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_aged_containers_replaced(self, maintained_manager, mock_docker_client):
+        """Test that aged containers are retired and replacements are created in the background."""
+        await maintained_manager.initialize_pool()
+        aged = list(maintained_manager.container_pool)
+        for container_id in aged:
+            maintained_manager.container_creation_timestamps[container_id] -= maintained_manager.pool_max_age + 1
+
+        await asyncio.sleep(0.3)
+
+        assert len(maintained_manager.container_pool) == 3
+        assert not set(aged) & set(maintained_manager.container_pool)
+        assert maintained_manager.retired_count == 3
+
+    @pytest.mark.asyncio
+    async def test_empty_pool_waits_for_returned_container(self, maintained_manager, mock_docker_client):
+        """Test that a request finding the pool exhausted gets the next returned container."""
+        await maintained_manager.initialize_pool()
+        held = [await maintained_manager._get_container_from_pool() for _ in range(3)]
+        mock_docker_client.containers.run.reset_mock()
+
+        waiter = asyncio.create_task(maintained_manager._get_container_from_pool())
+        await asyncio.sleep(0.1)
+        assert not waiter.done()
+
+        await maintained_manager._return_container_to_pool(held[0])
+        assert await asyncio.wait_for(waiter, timeout=1) == held[0]
+        mock_docker_client.containers.run.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_failed_execution_reset_in_background(self, maintained_manager):
+        """Test that a container from a failed run is reset off the request path before reuse."""
+        await maintained_manager.initialize_pool()
+        reset_started = asyncio.Event()
+        release_reset = asyncio.Event()
+        calls = []
+
+        def fake_exec(api, container_id, cmd, stdin_data, user="", **kwargs):
+            calls.append((container_id, user))
+            if user == "root":
+                loop.call_soon_threadsafe(reset_started.set)
+                asyncio.run_coroutine_threadsafe(release_reset.wait(), loop).result()
+                return ExecOutput(exit_code=0, output=b"")
+            raise ConnectionError("exec stream closed")
+
+        loop = asyncio.get_running_loop()
+        with patch("lean_docker_mcp.docker_manager.exec_with_stdin", side_effect=fake_exec):
+            with pytest.raises(Exception):
+                await maintained_manager.execute_transient("#eval 1")
+
+            # The request failed without waiting for the reset
+            await asyncio.wait_for(reset_started.wait(), timeout=1)
+            container_id = calls[0][0]
+            assert container_id not in maintained_manager.container_pool
+            assert container_id in maintained_manager.in_use_containers
+
+            release_reset.set()
+            await asyncio.sleep(0.1)
+
+        assert calls[1] == (container_id, "root")
+        assert container_id in maintained_manager.container_pool
+        assert maintained_manager.get_stats()["pool"]["reset"] == 1
+
+    @pytest.mark.asyncio
+    async def test_autoscaler_shrinks_idle_pool(self, maintained_manager):
+        """Test that scaling down retires the oldest idle containers."""
+        from lean_docker_mcp.autoscaler import PoolAutoscaler
+
+        await maintained_manager.initialize_pool()
+        await maintained_manager.stop_pool_maintenance()
+        oldest = maintained_manager.container_pool[0]
+        maintained_manager.autoscaler = PoolAutoscaler(min_size=1, max_size=3)
+
+        await maintained_manager._maintain_pool()
+
+        assert maintained_manager.pool_size == 2
+        assert len(maintained_manager.container_pool) == 2
+        assert oldest not in maintained_manager.container_pool
+
+    @pytest.mark.asyncio
+    async def test_autoscaler_grows_idle_pool_for_waiting_request(self, maintained_manager):
+        """Test that a request arriving at a pool scaled down to zero doesn't wait out the timeout."""
+        from lean_docker_mcp.autoscaler import PoolAutoscaler
+
+        maintained_manager.autoscaler = PoolAutoscaler(min_size=0, max_size=5)
+        maintained_manager.pool_size = 0
+        maintained_manager.pool_wait_timeout = 5.0
+        maintained_manager.start_pool_maintenance()
+
+        started = time.monotonic()
+        container_id = await asyncio.wait_for(maintained_manager._get_container_from_pool(), timeout=2)
+        assert time.monotonic() - started < 1
+        assert maintained_manager.pool_size == 1
+
+        await maintained_manager._return_container_to_pool(container_id)
+        assert maintained_manager.container_pool == [container_id]
+
+    @pytest.mark.asyncio
+    async def test_autoscaler_keeps_containers_created_on_demand(self, maintained_manager):
+        """Test that containers created for a burst are returned to the pool while it grows."""
+        from lean_docker_mcp.autoscaler import PoolAutoscaler
+
+        maintained_manager.autoscaler = PoolAutoscaler(min_size=0, max_size=5)
+        maintained_manager.pool_size = 0
+
+        held = await asyncio.gather(*[maintained_manager._get_container_from_pool() for _ in range(5)])
+        for container_id in held:
+            await maintained_manager._return_container_to_pool(container_id)
+
+        assert maintained_manager.pool_size == 5
+        assert sorted(maintained_manager.container_pool) == sorted(held)
+
+
 class TestServerIO:
     """Test the server I/O functions."""
     
@@ -0,0 +1,65 @@
+"""Tests for the low-level exec helpers."""
+
+import socket
+import struct
+import threading
+from unittest.mock import MagicMock
+
+import pytest
+
+from lean_docker_mcp.exec_stream import ExecTimeoutError, exec_with_stdin
+
+
+def _frame(stream: int, payload: bytes) -> bytes:
+    """Encode a payload as a Docker multiplexed stream frame."""
+    return struct.pack(">BxxxL", stream, len(payload)) + payload
+
+
+class TestExecWithStdin:
+    """Tests for exec_with_stdin."""
+
+    def test_sends_stdin_and_collects_output(self):
+        """Test that stdin is delivered with EOF and both output streams are collected."""
+        client_sock, daemon_sock = socket.socketpair()
+        received = []
+
+        def fake_daemon():
+            # Read stdin until the client half-closes, then reply with framed output
+            chunks = []
+            while True:
+                data = daemon_sock.recv(4096)
+                if not data:
+                    break
+                chunks.append(data)
+            received.append(b"".join(chunks))
+            daemon_sock.sendall(_frame(1, b"hello ") + _frame(2, b"world"))
+            daemon_sock.close()
+
+        daemon = threading.Thread(target=fake_daemon)
+        daemon.start()
+
+        api = MagicMock()
+        api.exec_create.return_value = {"Id": "exec-1"}
+        api.exec_start.return_value = client_sock
+        api.exec_inspect.return_value = {"ExitCode": 3}
+
+        result = exec_with_stdin(api, "container-1", ["cat"], b"source code", user="leanuser")
+        daemon.join(timeout=5)
+
+        assert received == [b"source code"]
+        assert result.output == b"hello world"
+        assert result.exit_code == 3
+        api.exec_create.assert_called_once()
+        assert api.exec_create.call_args[1]["stdin"] is True
+        assert api.exec_create.call_args[1]["user"] == "leanuser"
+
+    def test_timeout_when_no_output_arrives(self):
+        """Test that a silent exec raises ExecTimeoutError at the deadline."""
+        client_sock, daemon_sock = socket.socketpair()
+        api = MagicMock()
+        api.exec_create.return_value = {"Id": "exec-1"}
+        api.exec_start.return_value = client_sock
+
+        with pytest.raises(ExecTimeoutError):
+            exec_with_stdin(api, "container-1", ["sleep", "100"], b"", timeout=0.2)
+        daemon_sock.close()
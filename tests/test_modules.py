@@ -128,6 +128,19 @@ class TestInit:
                 assert mock_info.call_count == 2
                 mock_info.assert_any_call("Docker image test-image:latest not found. Please build it manually using the provided Dockerfile.")
                 
+    def test_ensure_docker_image_rebuilds_without_mathlib(self):
+        """Test that an image lacking the requested Mathlib workspace is rebuilt with it."""
+        with patch("lean_docker_mcp.check_docker_image_exists", return_value=True), \
+                patch("lean_docker_mcp.get_docker_image_label", return_value=None) as mock_label, \
+                patch("lean_docker_mcp.os.path.exists", return_value=True), \
+                patch("lean_docker_mcp.cleanup_old_images"), \
+                patch("lean_docker_mcp.subprocess.run") as mock_run:
+            ensure_docker_image("test-image:latest", mathlib_ref="v4.15.0")
+
+        mock_label.assert_called_once_with("test-image:latest", "lean_docker_mcp.mathlib_ref")
+        build_command = mock_run.call_args_list[0][0][0]
+        assert build_command[-2:] == ["--mathlib", "v4.15.0"]
+
     def test_ensure_docker_image_default(self):
         """Test ensure_docker_image with default image name."""
         with patch("lean_docker_mcp.check_docker_image_exists") as mock_check:
@@ -0,0 +1,146 @@
+"""Tests for check-only execution helpers."""
+
+from lean_docker_mcp.diagnostics import make_diagnostic, summarize_diagnostics
+from lean_docker_mcp.proof_check import append_axiom_queries, declared_theorems, parse_axioms_message, proof_verdict
+
+
+def _result(messages, status="success"):
+    """Build an execution result from REPL-style messages."""
+    diagnostics = [make_diagnostic(message) for message in messages]
+    return {"status": status, "stdout": "", "diagnostics": diagnostics, "diagnostic_summary": summarize_diagnostics(diagnostics)}
+
+
+def _info(line, data):
+    return {"severity": "info", "pos": {"line": line, "column": 0}, "data": data}
+
+
+CODE = """namespace Foo
+theorem add_zero' (n : Nat) : n + 0 = n := rfl
+
+section
+lemma bar : True := trivial
+end
+end Foo
+
+@[simp] theorem _root_.baz : 1 = 1 := rfl
+private theorem qux : 2 = 2 := by sorry"""
+
+
+class TestDeclaredTheorems:
+    """Tests for declared_theorems and append_axiom_queries."""
+
+    def test_names_are_qualified_by_namespace(self):
+        """Test that namespaces qualify names and sections don't."""
+        assert declared_theorems(CODE) == ["Foo.add_zero'", "Foo.bar", "baz", "qux"]
+
+    def test_queries_follow_the_source(self):
+        """Test that one #print axioms command per theorem is appended."""
+        checked = append_axiom_queries("theorem t : True := trivial\n", ["t"])
+
+        assert checked == "theorem t : True := trivial\n\n#print axioms t\n"
+        assert append_axiom_queries("#eval 1", []) == "#eval 1"
+
+
+class TestProofVerdict:
+    """Tests for parse_axioms_message and proof_verdict."""
+
+    def test_parse_axioms_message(self):
+        """Test both forms of Lean's answer to #print axioms."""
+        assert parse_axioms_message("'Foo.t' depends on axioms: [propext, Classical.choice]") == ("Foo.t", ["propext", "Classical.choice"])
+        assert parse_axioms_message("'t' does not depend on any axioms") == ("t", [])
+        assert parse_axioms_message("42") is None
+
+    def test_proved(self):
+        """Test a file whose theorems check without sorry."""
+        code = "theorem t : True := trivial"
+        result = _result([_info(3, "'t' does not depend on any axioms")])
+
+        verdict = proof_verdict(result, code, ["t"])
+
+        assert verdict["verdict"] == "proved"
+        assert verdict["status"] == "success"
+        assert verdict["theorems"] == [{"name": "t", "axioms": [], "uses_sorry": False}]
+        assert verdict["diagnostics"] == []
+
+    def test_sorry(self):
+        """Test that a theorem depending on sorryAx is reported as incomplete."""
+        code = "theorem t : 1 = 2 := by sorry"
+        result = _result([
+            {"severity": "warning", "pos": {"line": 1, "column": 8}, "data": "declaration uses 'sorry'"},
+            _info(3, "'t' depends on axioms: [sorryAx]"),
+        ])
+
+        verdict = proof_verdict(result, code, ["t"])
+
+        assert verdict["verdict"] == "sorry"
+        assert verdict["theorems"][0]["uses_sorry"] is True
+        assert verdict["diagnostic_summary"]["sorry_positions"] == [{"line": 1, "column": 8}]
+
+    def test_user_axiom_is_not_proved(self):
+        """Test that a proof relying on an axiom declared by the user is not reported as proved."""
+        code = "axiom cheat : False\ntheorem t : 1 = 2 := cheat.elim"
+        result = _result([_info(4, "'t' depends on axioms: [cheat]")])
+
+        verdict = proof_verdict(result, code, ["t"])
+
+        assert verdict["verdict"] == "nonstandard_axioms"
+        assert verdict["status"] == "success"
+        assert verdict["theorems"] == [{"name": "t", "axioms": ["cheat"], "uses_sorry": False}]
+
+    def test_standard_axioms_are_proved(self):
+        """Test that Lean's standard axioms don't prevent a proved verdict."""
+        code = "theorem t (p : Prop) : p ∨ ¬p := Classical.em p"
+        result = _result([_info(3, "'t' depends on axioms: [propext, Classical.choice, Quot.sound]")])
+
+        assert proof_verdict(result, code, ["t"])["verdict"] == "proved"
+
+    def test_failed_query_is_unchecked(self):
+        """Test that a theorem without an answer to its axiom query is not reported as proved."""
+        code = "theorem t : True := trivial\ntheorem u : True := trivial"
+        result = _result([
+            _info(4, "'t' does not depend on any axioms"),
+            {"severity": "error", "pos": {"line": 5, "column": 14}, "data": "unknown constant 'u'"},
+        ], status="error")
+
+        verdict = proof_verdict(result, code, ["t", "u"])
+
+        assert verdict["verdict"] == "unchecked"
+        assert verdict["theorems"][1] == {"name": "u", "axioms": None, "uses_sorry": False}
+
+    def test_unrecognized_theorem_is_unchecked(self):
+        """Test that a theorem whose name was not found is not silently skipped."""
+        code = "theorem t : True := trivial\ntheorem\n  u : 1 = 2 := cheat.elim"
+        result = _result([_info(5, "'t' does not depend on any axioms")])
+
+        verdict = proof_verdict(result, code, declared_theorems(code))
+
+        assert verdict["verdict"] == "unchecked"
+
+    def test_no_theorems_is_unchecked(self):
+        """Test that a file declaring no theorems proves nothing."""
+        assert proof_verdict(_result([]), "def x := 1", [])["verdict"] == "unchecked"
+
+    def test_error_ignores_failed_queries(self):
+        """Test that errors in the source decide the verdict and errors from the queries are dropped."""
+        code = "theorem t : 1 = 2 := rfl"
+        result = _result([
+            {"severity": "error", "pos": {"line": 1, "column": 21}, "data": "type mismatch"},
+            {"severity": "error", "pos": {"line": 3, "column": 14}, "data": "unknown constant 't'"},
+        ], status="error")
+        result["error"] = "type mismatch"
+
+        verdict = proof_verdict(result, code, ["t"])
+
+        assert verdict["verdict"] == "error"
+        assert verdict["error"] == "type mismatch"
+        assert [diagnostic["line"] for diagnostic in verdict["diagnostics"]] == [1]
+        assert verdict["theorems"] == [{"name": "t", "axioms": None, "uses_sorry": False}]
+
+    def test_timeout_is_an_error(self):
+        """Test that a run that did not finish is never reported as proved."""
+        result = {"status": "error", "stdout": "", "error": "Execution timed out", "error_type": "timeout", "diagnostics": []}
+
+        verdict = proof_verdict(result, "theorem t : True := trivial", ["t"])
+
+        assert verdict["verdict"] == "error"
+        assert verdict["error_type"] == "timeout"
@@ -0,0 +1,175 @@
+"""Tests for the Lean REPL worker."""
+
+import json
+import socket
+import struct
+import threading
+from unittest.mock import MagicMock
+
+import pytest
+
+from lean_docker_mcp.repl import (
+    LeanReplError,
+    LeanReplTimeout,
+    LeanReplUnavailable,
+    LeanReplWorker,
+    format_repl_messages,
+    parse_goal,
+    split_imports,
+)
+
+
+def _frame(payload: bytes, stream: int = 1) -> bytes:
+    """Encode a payload as a Docker multiplexed stream frame."""
+    return struct.pack(">BxxxL", stream, len(payload)) + payload
+
+
+class FakeRepl:
+    """A fake REPL process on the daemon side of a socket pair."""
+
+    def __init__(self, responses):
+        self.client_sock, self.daemon_sock = socket.socketpair()
+        self.responses = list(responses)
+        self.requests = []
+        self.thread = threading.Thread(target=self._serve, daemon=True)
+        self.thread.start()
+
+    def _serve(self):
+        self.daemon_sock.sendall(_frame(b"4242\n"))
+        buffer = b""
+        while self.responses:
+            data = self.daemon_sock.recv(4096)
+            if not data:
+                break
+            buffer += data
+            while b"\n\n" in buffer and self.responses:
+                request, buffer = buffer.split(b"\n\n", 1)
+                self.requests.append(json.loads(request))
+                response = self.responses.pop(0)
+                if response is None:
+                    # Simulate the process dying
+                    self.daemon_sock.close()
+                    return
+                # Send the pretty-printed response split across two frames
+                payload = json.dumps(response, indent=2).encode() + b"\n\n"
+                self.daemon_sock.sendall(_frame(payload[:5]) + _frame(b"noise", stream=2) + _frame(payload[5:]))
+
+    def api(self):
+        api = MagicMock()
+        api.exec_create.return_value = {"Id": "exec-1"}
+        api.exec_start.return_value = self.client_sock
+        return api
+
+
+class TestSplitImports:
+    """Tests for split_imports."""
+
+    def test_imports_are_blanked_to_keep_positions(self):
+        """Test that import lines are removed but line numbers are preserved."""
+        code = "-- header\nimport Mathlib\nimport Std.Data\n\ntheorem foo : True := trivial"
+        imports, body = split_imports(code)
+        assert imports == ["Mathlib", "Std.Data"]
+        assert body.split("\n")[4] == "theorem foo : True := trivial"
+        assert "import" not in body
+
+    def test_no_imports(self):
+        """Test code without imports is returned unchanged."""
+        imports, body = split_imports("#eval 1 + 1")
+        assert imports == []
+        assert body == "#eval 1 + 1"
+
+
+class TestFormatReplMessages:
+    """Tests for format_repl_messages."""
+
+    def test_formats_like_lean_cli(self):
+        """Test that errors get a position prefix and info messages are printed plainly."""
+        messages = [
+            {"severity": "info", "pos": {"line": 1, "column": 0}, "data": "2"},
+            {"severity": "error", "pos": {"line": 3, "column": 4}, "data": "unknown identifier 'x'"},
+        ]
+        assert format_repl_messages(messages) == "2\nScript.lean:3:4: error: unknown identifier 'x'"
+
+
+class TestParseGoal:
+    """Tests for parse_goal."""
+
+    def test_hypotheses_and_target(self):
+        """Test grouped names, continued lines, let values and the case tag."""
+        goal = "case succ\nn m : Nat\nh :\n  0 < n\nf : Nat → Nat := fun x => x\n⊢ 0 < n +\n    1"
+
+        parsed = parse_goal(goal)
+
+        assert parsed["case"] == "succ"
+        assert parsed["hypotheses"] == [
+            {"names": ["n", "m"], "type": "Nat", "value": None},
+            {"names": ["h"], "type": "0 < n", "value": None},
+            {"names": ["f"], "type": "Nat → Nat", "value": "fun x => x"},
+        ]
+        assert parsed["target"] == "0 < n +\n    1"
+        assert parsed["pretty"] == goal
+
+    def test_goal_without_hypotheses(self):
+        """Test a goal that is only a target."""
+        assert parse_goal("⊢ True") == {"case": None, "hypotheses": [], "target": "True", "pretty": "⊢ True"}
+
+
+class TestLeanReplWorker:
+    """Tests for LeanReplWorker."""
+
+    def test_start_preloads_imports(self):
+        """Test that starting the worker elaborates the preloaded imports once."""
+        fake = FakeRepl([{"env": 0}])
+        worker = LeanReplWorker(fake.api(), "container-1", preload_imports=["Mathlib"])
+        worker.start(timeout=5)
+
+        assert worker.pid == 4242
+        assert worker.base_env == 0
+        assert fake.requests == [{"cmd": "import Mathlib"}]
+
+    def test_run_command_branches_from_base_env(self):
+        """Test that commands with preloaded imports reuse the base environment."""
+        fake = FakeRepl([{"env": 0}, {"env": 1, "messages": []}, {"env": 2}])
+        worker = LeanReplWorker(fake.api(), "container-1", preload_imports=["Mathlib"])
+        worker.start(timeout=5)
+
+        worker.run_command("import Mathlib\ntheorem t : 1 = 1 := rfl", timeout=5)
+        worker.run_command("import Lean\n#eval 1", timeout=5)
+
+        assert fake.requests[1] == {"cmd": "\ntheorem t : 1 = 1 := rfl", "env": 0}
+        # Imports that are not preloaded need a fresh environment
+        assert fake.requests[2] == {"cmd": "import Lean\n#eval 1"}
+        assert worker.commands_run == 3
+
+    def test_process_exit_raises(self):
+        """Test that a dead REPL process surfaces as LeanReplError."""
+        fake = FakeRepl([None])
+        worker = LeanReplWorker(fake.api(), "container-1")
+        worker.start(timeout=5)
+
+        with pytest.raises(LeanReplError):
+            worker.run_command("#eval 1", timeout=5)
+
+    def test_unresponsive_repl_times_out(self):
+        """Test that a command without a response raises LeanReplTimeout."""
+        fake = FakeRepl([])
+        worker = LeanReplWorker(fake.api(), "container-1")
+        worker.start(timeout=5)
+
+        with pytest.raises(LeanReplTimeout):
+            worker.run_command("#eval (List.range 100000000).length", timeout=0.2)
+
+    @pytest.mark.parametrize("preload_imports", [["Mathlib"], []])
+    def test_missing_repl_binary_is_unavailable(self, preload_imports):
+        """Test that a REPL command the shell can't find is told apart from other failures."""
+        client_sock, daemon_sock = socket.socketpair()
+        daemon_sock.sendall(_frame(b"4242\n") + _frame(b"bash: line 1: exec: repl: not found\n", stream=2))
+        daemon_sock.close()
+        api = MagicMock()
+        api.exec_create.return_value = {"Id": "exec-1"}
+        api.exec_start.return_value = client_sock
+        worker = LeanReplWorker(api, "container-1", preload_imports=preload_imports)
+
+        with pytest.raises(LeanReplUnavailable):
+            worker.start(timeout=5)
+            worker.run_command("#eval 1", timeout=5)